@@ -2,10 +2,10 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
 from flask_login import LoginManager
-from flask_apscheduler import APScheduler
 from flask_migrate import Migrate
 from flask_wtf import CSRFProtect
 from flask_wtf.csrf import generate_csrf
+from collections.abc import Mapping
 import logging
 from logging.handlers import RotatingFileHandler
 import os  # Import os for accessing environment variables
@@ -14,62 +14,144 @@ from dotenv import load_dotenv  # Import load_dotenv
 # Load environment variables from .env file
 load_dotenv() 
 
-# Initialize Flask app
-app = Flask(__name__)
-
-# configure secret key and database URI from environment variables
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')  # Access SECRET_KEY from environment
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('SQLALCHEMY_DATABASE_URI')  # Access DB URI
-app.config['OPENAI_API_KEY'] = os.getenv('OPENAI_API_KEY')
-app.config['WTF_CSRF_HEADERS'] = ['X-CSRFToken', 'X-CSRF-Token']
-
-# Initialize extensions
-db = SQLAlchemy(app)
-scheduler = APScheduler()
-scheduler.init_app(app)
-scheduler.start()
-migrate = Migrate(app, db)
-bcrypt = Bcrypt(app) # provides password hashing utilites
-login_manager = LoginManager(app) # manages user sessions
-login_manager.login_view = 'login' # redirects unauthorized users to login page
+# Initialize extensions; they are bound to an app in create_app
+db = SQLAlchemy()
+migrate = Migrate()
+bcrypt = Bcrypt() # provides password hashing utilites
+login_manager = LoginManager() # manages user sessions
+login_manager.login_view = 'main.login' # redirects unauthorized users to login page
 login_manager.login_message_category = 'info' # flash message category
-csrf = CSRFProtect(app)
+csrf = CSRFProtect()
 
+# Builds the application. config (a mapping or config object) overrides the
+# settings read from the environment.
+#
+# Only what serving pages needs is imported here. The feed fetcher (newspaper,
+# feedparser), the LLM client (openai) and the scheduler are imported by the
+# worker and quiz code paths that use them.
+def create_app(config=None):
+    app = Flask(__name__)
 
-from app.news_fetcher import fetch_articles
+    # configure secret key and database URI from environment variables
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')  # Access SECRET_KEY from environment
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('SQLALCHEMY_DATABASE_URI')  # Access DB URI
+    app.config['OPENAI_API_KEY'] = os.getenv('OPENAI_API_KEY')
+    app.config['WTF_CSRF_HEADERS'] = ['X-CSRFToken', 'X-CSRF-Token']
 
-# Runs fetch articles script every hour
-@scheduler.task('interval', id='fetch_articles_job', hours=1)
-def scheduled_fetch_articles():
-    with app.app_context():
-        fetch_articles()
+    # news fetcher tuning: size of the download/parse worker pool and per-article timeout (seconds)
+    app.config['FETCH_MAX_WORKERS'] = int(os.getenv('FETCH_MAX_WORKERS', 8))
+    app.config['FETCH_ARTICLE_TIMEOUT'] = float(os.getenv('FETCH_ARTICLE_TIMEOUT', 20))
+    # number of new articles written per bulk insert statement
+    app.config['FETCH_INSERT_CHUNK_SIZE'] = int(os.getenv('FETCH_INSERT_CHUNK_SIZE', 100))
+    # how many entry GUIDs to remember per feed when looking for already-seen entries
+    app.config['FEED_SEEN_GUIDS_LIMIT'] = int(os.getenv('FEED_SEEN_GUIDS_LIMIT', 500))
+    # feed registry (comma separated URLs, more can be added with `flask feeds add`), default poll interval,
+    # +/- fraction of jitter, cap on the backoff of failing feeds and how many feeds are polled at once
+    app.config['FEEDS'] = [url.strip() for url in os.getenv('FEEDS', 'https://feeds.bbci.co.uk/news/world/rss.xml').split(',') if url.strip()]
+    app.config['FEED_INTERVAL_MINUTES'] = int(os.getenv('FEED_INTERVAL_MINUTES', 60))
+    app.config['FEED_JITTER'] = float(os.getenv('FEED_JITTER', 0.1))
+    app.config['FEED_MAX_BACKOFF_MINUTES'] = int(os.getenv('FEED_MAX_BACKOFF_MINUTES', 24 * 60))
+    app.config['FEED_MAX_CONCURRENCY'] = int(os.getenv('FEED_MAX_CONCURRENCY', 8))
+    # seconds a feed poll may take, connecting and reading included
+    app.config['FEED_TIMEOUT'] = float(os.getenv('FEED_TIMEOUT', 20))
+    # how many of the 64 SimHash bits a new article's body may differ in from a stored one and still be
+    # skipped as a near-duplicate (-1 turns the check off), see app/near_duplicates.py
+    app.config['NEAR_DUPLICATE_MAX_DISTANCE'] = int(os.getenv('NEAR_DUPLICATE_MAX_DISTANCE', 6))
 
-# if not app.debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
-#     scheduler.init_app(app)
-#     scheduler.start()
+    # article listing: 'auto' switches from numbered pages to cursor pagination above ARTICLES_NUMBERED_MAX articles,
+    # 'numbered' and 'cursor' force one mode
+    app.config['ARTICLES_PAGINATION'] = os.getenv('ARTICLES_PAGINATION', 'auto')
+    app.config['ARTICLES_NUMBERED_MAX'] = int(os.getenv('ARTICLES_NUMBERED_MAX', 1200))
+    app.config['ARTICLE_COUNT_CACHE_SECONDS'] = int(os.getenv('ARTICLE_COUNT_CACHE_SECONDS', 300))
+    # rendered /articles pages kept for anonymous visitors; the stamp file marks when they go stale
+    app.config['ARTICLES_PAGE_CACHE'] = os.getenv('ARTICLES_PAGE_CACHE', '1') == '1'
+    app.config['ARTICLES_PAGE_CACHE_SIZE'] = int(os.getenv('ARTICLES_PAGE_CACHE_SIZE', 256))
+    app.config['LISTING_STAMP_PATH'] = os.getenv('LISTING_STAMP_PATH')
+    # comments rendered per "load more" page on an article
+    app.config['COMMENTS_PER_PAGE'] = int(os.getenv('COMMENTS_PER_PAGE', 20))
+    # search results per page
+    app.config['SEARCH_PER_PAGE'] = int(os.getenv('SEARCH_PER_PAGE', 10))
 
-from app.helpers import user_has_passed_quiz
-@app.context_processor
-def utility_processor():
-    return dict(user_has_passed_quiz=user_has_passed_quiz)
+    # background quiz generation queue: worker threads, jobs per run, retry policy and poll interval
+    app.config['QUIZ_QUEUE_MAX_WORKERS'] = int(os.getenv('QUIZ_QUEUE_MAX_WORKERS', 2))
+    app.config['QUIZ_QUEUE_BATCH_SIZE'] = int(os.getenv('QUIZ_QUEUE_BATCH_SIZE', 20))
+    app.config['QUIZ_QUEUE_MAX_ATTEMPTS'] = int(os.getenv('QUIZ_QUEUE_MAX_ATTEMPTS', 5))
+    app.config['QUIZ_QUEUE_BACKOFF_SECONDS'] = int(os.getenv('QUIZ_QUEUE_BACKOFF_SECONDS', 30))
+    app.config['QUIZ_QUEUE_STALE_SECONDS'] = int(os.getenv('QUIZ_QUEUE_STALE_SECONDS', 600))
+    app.config['QUIZ_QUEUE_POLL_SECONDS'] = int(os.getenv('QUIZ_QUEUE_POLL_SECONDS', 30))
 
-def create_app():
-    app = Flask(__name__)
+    # ingest worker (flask ingest-worker): seconds between checks for due feeds and how long the fetch lease
+    # outlives a worker that stopped renewing it
+    app.config['FEED_CHECK_SECONDS'] = int(os.getenv('FEED_CHECK_SECONDS', 60))
+    app.config['INGEST_LEASE_SECONDS'] = int(os.getenv('INGEST_LEASE_SECONDS', 300))
 
-    # Logging configuration
-    if not os.path.exists('logs'):
-        os.mkdir('logs')
-    file_handler = RotatingFileHandler('logs/app.log', maxBytes=10240, backupCount=10)
-    file_handler.setFormatter(logging.Formatter(
-        '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
-    ))
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-
-    app.logger.setLevel(logging.INFO)
-    app.logger.info('App startup')
+    # LLM response cache limits
+    app.config['QUIZ_CACHE_MAX_ENTRIES'] = int(os.getenv('QUIZ_CACHE_MAX_ENTRIES', 5000))
+    app.config['QUIZ_CACHE_MAX_AGE_DAYS'] = int(os.getenv('QUIZ_CACHE_MAX_AGE_DAYS', 90))
 
-    return app
+    # Static asset fingerprinting (precompressed copies go to ASSET_BUILD_DIR, default instance/assets)
+    # and compression of dynamic responses
+    app.config['ASSET_FINGERPRINTING'] = os.getenv('ASSET_FINGERPRINTING', '1') == '1'
+    app.config['ASSET_BUILD_DIR'] = os.getenv('ASSET_BUILD_DIR')
+    app.config['COMPRESS_MIN_SIZE'] = int(os.getenv('COMPRESS_MIN_SIZE', 500))
+    app.config['COMPRESS_LEVEL'] = int(os.getenv('COMPRESS_LEVEL', 6))
+
+    # Card thumbnails made at ingest (THUMBNAIL_DIR defaults to instance/thumbnails)
+    app.config['THUMBNAIL_DIR'] = os.getenv('THUMBNAIL_DIR')
+    app.config['THUMBNAIL_WIDTH'] = int(os.getenv('THUMBNAIL_WIDTH', 640))
+    app.config['THUMBNAIL_TIMEOUT'] = float(os.getenv('THUMBNAIL_TIMEOUT', 10.0))
+    app.config['THUMBNAIL_MAX_BYTES'] = int(os.getenv('THUMBNAIL_MAX_BYTES', 10 * 1024 * 1024))
+
+    # Number of parsed quiz answer keys kept in memory for scoring
+    app.config['ANSWER_KEY_CACHE_SIZE'] = int(os.getenv('ANSWER_KEY_CACHE_SIZE', 1024))
+
+    # Password hashing policy; existing hashes are upgraded on login when these change
+    app.config['PASSWORD_HASHER'] = os.getenv('PASSWORD_HASHER', 'bcrypt')
+    app.config['BCRYPT_LOG_ROUNDS'] = int(os.getenv('BCRYPT_LOG_ROUNDS', 12))
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
 
-from app import routes, models
+    # Logged-in user identity cache (0 seconds disables it)
+    app.config['USER_CACHE_SECONDS'] = int(os.getenv('USER_CACHE_SECONDS', 60))
+    app.config['USER_CACHE_MAX_ENTRIES'] = int(os.getenv('USER_CACHE_MAX_ENTRIES', 10000))
 
+    if isinstance(config, Mapping):
+        app.config.from_mapping(config)
+    elif config is not None:
+        app.config.from_object(config)
+
+    db.init_app(app)
+    migrate.init_app(app, db)
+    bcrypt.init_app(app)
+    login_manager.init_app(app)
+    csrf.init_app(app)
+
+    # importing these registers the user loader and the ORM event hooks
+    from app import models, identity, page_cache, search
+    from app.routes import main
+    from app.assets import init_assets
+    from app.worker import ingest_worker
+    from app.feeds import feeds_cli
+    from app.near_duplicates import fingerprint_articles
+    from app.quiz_queue import regenerate_quiz
+    app.register_blueprint(main)
+    init_assets(app)
+    app.cli.add_command(ingest_worker)
+    app.cli.add_command(feeds_cli)
+    app.cli.add_command(fingerprint_articles)
+    app.cli.add_command(regenerate_quiz)
+
+    # Logging configuration
+    if not app.debug and not app.testing:
+        if not os.path.exists('logs'):
+            os.mkdir('logs')
+        file_handler = RotatingFileHandler('logs/app.log', maxBytes=10240, backupCount=10)
+        file_handler.setFormatter(logging.Formatter(
+            '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
+        ))
+        file_handler.setLevel(logging.INFO)
+        app.logger.addHandler(file_handler)
+
+        app.logger.setLevel(logging.INFO)
+        app.logger.info('App startup')
+
+    return app
@@ -0,0 +1,141 @@
+from app import db
+from app.models import Quiz
+from collections import namedtuple, OrderedDict
+from flask import current_app
+from sqlalchemy import bindparam, select
+import json
+import threading
+
+# Cached answer keys for quiz scoring
+# Scoring a submission only needs each question's options and the index of the
+# correct one. Those are parsed out of Quiz.questions once and kept in a bounded
+# LRU keyed by quiz ID. The quiz's date_generated acts as the version, so a key
+# built before a regeneration is never used to score against new questions.
+
+AnswerKey = namedtuple('AnswerKey', ['quiz_id', 'version', 'questions', 'options', 'correct'])
+
+# built once; on a cache hit this small lookup is the only database work
+_version_query = select(Quiz.id, Quiz.date_generated).where(Quiz.article_id == bindparam('article_id'))
+
+_keys = OrderedDict()
+_keys_lock = threading.Lock()
+
+# Parses a quiz's questions JSON into an AnswerKey; raises ValueError if it is corrupted
+def build_answer_key(quiz_id, version, questions_json):
+    questions = json.loads(questions_json)
+    if not isinstance(questions, list):
+        raise ValueError('quiz questions are not a list')
+    options = tuple(tuple(q.get('options') or ()) for q in questions)
+    correct = tuple(
+        opts.index(q.get('correct_answer')) if q.get('correct_answer') in opts else -1
+        for q, opts in zip(questions, options)
+    )
+    return AnswerKey(quiz_id, version, tuple(q.get('question') for q in questions), options, correct)
+
+# Returns the answer key for an article's quiz, or None if it has no quiz.
+# Only (id, date_generated) is read on a cache hit; the questions JSON is parsed on a miss.
+def get_answer_key(article_id):
+    row = db.session.execute(_version_query, {'article_id': article_id}).first()
+    if not row:
+        return None
+    quiz_id, version = row
+
+    with _keys_lock:
+        key = _keys.get(quiz_id)
+        if key is not None and key.version == version:
+            _keys.move_to_end(quiz_id)
+            return key
+
+    questions_json = db.session.query(Quiz.questions).filter_by(id=quiz_id).scalar()
+    key = build_answer_key(quiz_id, version, questions_json)
+
+    max_size = current_app.config.get('ANSWER_KEY_CACHE_SIZE', 1024)
+    with _keys_lock:
+        _keys[quiz_id] = key
+        _keys.move_to_end(quiz_id)
+        while len(_keys) > max_size:
+            _keys.popitem(last=False)
+    return key
+
+def invalidate_answer_key(quiz_id):
+    with _keys_lock:
+        _keys.pop(quiz_id, None)
+
+# Scores responses ({'question_<i>': chosen option text}) against a key.
+# Returns (score, chosen option indexes with -1 for unanswered/unknown, per-question correctness).
+def score_responses(key, responses):
+    chosen = []
+    results = []
+    for i, (options, correct) in enumerate(zip(key.options, key.correct)):
+        answer = responses.get(f'question_{i}')
+        index = options.index(answer) if answer in options else -1
+        chosen.append(index)
+        results.append(index != -1 and index == correct)
+    return sum(results), chosen, results
+
+# Compact quiz results
+# UserQuiz.results_json stores only the chosen option index for each question
+# (-1 when unanswered) and a bitmask of the questions answered correctly, e.g.
+# {"c":[1,0,-1,3,1],"m":19,"v":"2024-12-09T10:00:00"}. "v" is the version
+# (date_generated) of the quiz they were scored against. Question text and answers
+# are rebuilt from the quiz when the results are shown, unless it has been
+# regenerated since. Rows written before this format hold the full feedback list
+# and are still read as is.
+
+def _version_tag(version):
+    return version.isoformat() if version else None
+
+def encode_results(chosen, results, version=None):
+    mask = sum(1 << i for i, is_correct in enumerate(results) if is_correct)
+    data = {'c': chosen, 'm': mask}
+    if version:
+        data['v'] = _version_tag(version)
+    return json.dumps(data, separators=(',', ':'))
+
+# Returns (chosen indexes, per-question correctness) for a compact record,
+# or None for legacy and unreadable ones
+def decode_results(results_json):
+    try:
+        data = json.loads(results_json)
+        chosen = [int(index) for index in data['c']]
+        mask = int(data['m'])
+    except (TypeError, ValueError, KeyError):
+        return None
+    return chosen, [bool(mask >> i & 1) for i in range(len(chosen))]
+
+def _option(options, index):
+    return options[index] if 0 <= index < len(options) else None
+
+# Feedback items ({question, your_answer, correct_answer, is_correct}) for
+# scored responses, used by submit_quiz and when showing stored results
+def build_feedback(key, chosen, results):
+    return [
+        {
+            'question': question,
+            'your_answer': _option(options, index),
+            'correct_answer': _option(options, correct),
+            'is_correct': is_correct
+        }
+        for question, options, correct, index, is_correct
+        in zip(key.questions, key.options, key.correct, chosen, results)
+    ]
+
+# True if results_json was scored against an earlier version of the key's quiz.
+# Records that don't say which version they were scored against are taken as current.
+def results_outdated(key, results_json):
+    try:
+        version = json.loads(results_json).get('v')
+    except (TypeError, ValueError, AttributeError):
+        return False
+    return bool(key and version and version != _version_tag(key.version))
+
+# Feedback for a stored results_json; [] if there is nothing usable or the quiz has changed since
+def stored_feedback(key, results_json):
+    decoded = decode_results(results_json)
+    if decoded:
+        return build_feedback(key, *decoded) if key and not results_outdated(key, results_json) else []
+    try:
+        legacy = json.loads(results_json)
+    except (TypeError, ValueError):
+        return []
+    return legacy if isinstance(legacy, list) else []
@@ -0,0 +1,143 @@
+from flask import current_app, request, send_file, send_from_directory
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+
+try:
+    import brotli  # optional; gzip is always available
+except ImportError:
+    brotli = None
+
+# Fingerprinted static assets and response compression
+# At startup every file under static/ gets a content-hashed name
+# (css/style.css -> css/style.<hash>.css), and url_for('static', ...) hands
+# out that name. A fingerprinted URL never changes its content, so it is served
+# with an immutable, year-long Cache-Control. Compressible assets are
+# precompressed once into ASSET_BUILD_DIR. Dynamic HTML/JSON responses are
+# compressed per request in after_request.
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_TYPES = {'text/html', 'text/css', 'text/plain', 'text/javascript', 'application/javascript',
+                      'application/json', 'image/svg+xml'}
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+_manifest = {}  # original path -> fingerprinted path
+_originals = {}  # fingerprinted path -> original path
+_encodings = {}  # original path -> {encoding: precompressed file}
+
+def _build_dir(app):
+    return app.config.get('ASSET_BUILD_DIR') or os.path.join(app.instance_path, 'assets')
+
+# encoding -> (file suffix, compress function)
+def _compressors():
+    compressors = {'gzip': ('gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))}
+    if brotli:
+        compressors['br'] = ('br', lambda data: brotli.compress(data, quality=11))
+    return compressors
+
+# Hashes every static file and writes precompressed copies of the compressible ones
+def build_assets(app):
+    manifest, originals, encodings = {}, {}, {}
+    static_folder = app.static_folder
+    build_dir = _build_dir(app)
+    for root, _, files in os.walk(static_folder):
+        for name in files:
+            path = os.path.join(root, name)
+            original = os.path.relpath(path, static_folder).replace(os.sep, '/')
+            with open(path, 'rb') as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()[:12]
+            stem, ext = os.path.splitext(original)
+            fingerprinted = f'{stem}.{digest}{ext}'
+            manifest[original] = fingerprinted
+            originals[fingerprinted] = original
+
+            if mimetypes.guess_type(original)[0] not in COMPRESSIBLE_TYPES:
+                continue
+            encodings[original] = {}
+            for encoding, (suffix, compress) in _compressors().items():
+                target = os.path.join(build_dir, f'{fingerprinted}.{suffix}')
+                if not os.path.exists(target):
+                    compressed = compress(data)
+                    # not worth serving if it barely shrinks
+                    if len(compressed) > len(data) * 0.9:
+                        continue
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    with open(f'{target}.{os.getpid()}.tmp', 'wb') as f:
+                        f.write(compressed)
+                    os.replace(f'{target}.{os.getpid()}.tmp', target)
+                encodings[original][encoding] = target
+
+    _manifest.clear()
+    _manifest.update(manifest)
+    _originals.clear()
+    _originals.update(originals)
+    _encodings.clear()
+    _encodings.update(encodings)
+    logger.info(f"Fingerprinted {len(manifest)} static files, {len(encodings)} precompressed")
+
+# url_for('static', filename='css/style.css') -> /static/css/style.<hash>.css
+def _fingerprint_static_urls(endpoint, values):
+    if endpoint == 'static' and current_app.config.get('ASSET_FINGERPRINTING', True):
+        filename = values.get('filename')
+        if filename in _manifest:
+            values['filename'] = _manifest[filename]
+
+def _accepted_encoding(available):
+    for encoding in ('br', 'gzip'):
+        if encoding in available and request.accept_encodings[encoding]:
+            return encoding
+    return None
+
+def serve_static(filename):
+    original = _originals.get(filename)
+    if original is None:
+        # plain (unfingerprinted) URL, served as Flask normally would
+        return current_app.send_static_file(filename)
+
+    available = _encodings.get(original, {})
+    encoding = _accepted_encoding(available)
+    if encoding:
+        response = send_file(available[encoding], mimetype=mimetypes.guess_type(original)[0])
+        response.headers.pop('Content-Disposition', None)
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = send_from_directory(current_app.static_folder, original)
+    if available:
+        response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = IMMUTABLE
+    return response
+
+# Compresses dynamic text responses for clients that accept it
+def compress_response(response):
+    if (response.direct_passthrough or response.is_streamed or response.status_code != 200
+            or response.mimetype not in COMPRESSIBLE_TYPES or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < current_app.config.get('COMPRESS_MIN_SIZE', 500):
+        return response
+
+    if brotli and request.accept_encodings['br']:
+        encoding, compressed = 'br', brotli.compress(data, quality=current_app.config.get('COMPRESS_BROTLI_QUALITY', 5))
+    elif request.accept_encodings['gzip']:
+        encoding, compressed = 'gzip', gzip.compress(data, compresslevel=current_app.config.get('COMPRESS_LEVEL', 6))
+    else:
+        return response
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    # the compressed bytes differ from the identity ones, so a strong validator becomes weak
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+def init_assets(app):
+    build_assets(app)
+    app.url_defaults(_fingerprint_static_urls)
+    app.view_functions['static'] = serve_static
+    app.after_request(compress_response)
@@ -0,0 +1,115 @@
+from app import db
+from app.models import FeedState
+from datetime import datetime, timedelta
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import event, nullsfirst, or_
+import click
+import random
+
+# Feed registry and schedules
+# Every feed is a row in feed_state. Feeds listed in the FEEDS config are added
+# on the next fetch run; more can be added and removed with `flask feeds`.
+# Removing a URL from FEEDS does not unregister it, `flask feeds remove` does.
+# Each feed is polled every interval_minutes (FEED_INTERVAL_MINUTES unless set
+# on the row), spread by +/- FEED_JITTER so feeds added together drift apart.
+# A feed that errors or returns a malformed document waits twice as long after
+# each consecutive failure, up to FEED_MAX_BACKOFF_MINUTES.
+
+# FEEDS entries are URLs or dicts with 'url' and optionally 'interval_minutes'
+def configured_feeds():
+    feeds = []
+    for feed in current_app.config.get('FEEDS') or []:
+        feeds.append({'url': feed} if isinstance(feed, str) else dict(feed))
+    return feeds
+
+# Returns the state rows for the given feed URLs, adding any that are missing.
+# The caller commits; session.info['feeds_registered'] says whether there is anything new.
+def feed_states(urls):
+    urls = list(dict.fromkeys(urls))
+    states = {state.feed_url: state for state in FeedState.query.filter(FeedState.feed_url.in_(urls))} if urls else {}
+    for url in urls:
+        if url not in states:
+            states[url] = FeedState(feed_url=url, enabled=True, consecutive_failures=0)
+            db.session.add(states[url])
+            db.session.info['feeds_registered'] = True
+    return [states[url] for url in urls]
+
+@event.listens_for(db.session, 'after_commit')
+@event.listens_for(db.session, 'after_rollback')
+def _registration_done(session):
+    session.info.pop('feeds_registered', None)
+
+# Adds configured feeds the registry doesn't have yet and applies configured intervals
+def sync_feed_registry():
+    configured = configured_feeds()
+    for feed, state in zip(configured, feed_states(feed['url'] for feed in configured)):
+        if feed.get('interval_minutes'):
+            state.interval_minutes = feed['interval_minutes']
+
+# Enabled feeds whose next poll is due, the most overdue first
+def due_feeds(now=None):
+    now = now or datetime.utcnow()
+    sync_feed_registry()
+    return FeedState.query.filter(FeedState.enabled.is_(True),
+                                  or_(FeedState.next_run_at.is_(None), FeedState.next_run_at <= now)) \
+        .order_by(nullsfirst(FeedState.next_run_at), FeedState.id).all()
+
+def feed_interval(state):
+    return state.interval_minutes or current_app.config.get('FEED_INTERVAL_MINUTES', 60)
+
+def _jittered(minutes):
+    jitter = current_app.config.get('FEED_JITTER', 0.1)
+    return timedelta(minutes=minutes * random.uniform(1 - jitter, 1 + jitter))
+
+# Schedules the next poll after a successful one (including 304 Not Modified)
+def schedule_success(state, now=None):
+    now = now or datetime.utcnow()
+    state.consecutive_failures = 0
+    state.last_error = None
+    state.next_run_at = now + _jittered(feed_interval(state))
+
+# Schedules the next poll after a failed one, backing off exponentially
+def schedule_failure(state, error, now=None):
+    now = now or datetime.utcnow()
+    state.consecutive_failures = (state.consecutive_failures or 0) + 1
+    state.last_error = str(error)[:1000]
+    delay = min(feed_interval(state) * 2 ** state.consecutive_failures,
+                current_app.config.get('FEED_MAX_BACKOFF_MINUTES', 24 * 60))
+    state.next_run_at = now + _jittered(delay)
+
+feeds_cli = AppGroup('feeds', help='Manage the RSS feed registry.')
+
+@feeds_cli.command('list')
+def list_feeds():
+    """Show every feed with its schedule."""
+    sync_feed_registry()
+    db.session.commit()
+    for state in FeedState.query.order_by(FeedState.feed_url):
+        status = 'enabled' if state.enabled else 'disabled'
+        failures = f', {state.consecutive_failures} failures' if state.consecutive_failures else ''
+        click.echo(f"{state.feed_url} [{status}, every {feed_interval(state)} min, "
+                   f"next {state.next_run_at or 'now'}{failures}]")
+
+@feeds_cli.command('add')
+@click.argument('url')
+@click.option('--interval', type=int, help='Minutes between polls (default FEED_INTERVAL_MINUTES).')
+def add_feed(url, interval):
+    """Add a feed, or re-enable it, and poll it on the next run."""
+    state = feed_states([url])[0]
+    state.enabled = True
+    state.interval_minutes = interval or state.interval_minutes
+    state.next_run_at = None
+    db.session.commit()
+    click.echo(f"Added {url}")
+
+@feeds_cli.command('remove')
+@click.argument('url')
+def remove_feed(url):
+    """Stop polling a feed. Its state is kept so it can be added back."""
+    state = FeedState.query.filter_by(feed_url=url).first()
+    if state is None:
+        raise click.ClickException(f"Unknown feed {url}")
+    state.enabled = False
+    db.session.commit()
+    click.echo(f"Removed {url}")
@@ -1,35 +1,61 @@
-from venv import logger
+from collections import namedtuple
+from flask import g, has_app_context
+from sqlalchemy import and_
 from app.models import UserQuiz, Quiz
 from app import db
+import logging
 
-def user_has_passed_quiz(user_id, article_id):
-    # grab quiz for associated article
-    quiz = Quiz.query.filter_by(article_id = article_id).first()
-    
-    # check that quiz exists
-    if not quiz:
-        logger.info(f"No quiz found for Article ID {article_id}")
-        return False
-    
-    # query user_quiz table to see if the user has passed the quiz
-    user_quiz_entry = UserQuiz.query.filter_by(user_id=user_id, quiz_id=quiz.id).first()
-
-    if user_quiz_entry and user_quiz_entry.passed:
-        logger.info(f"User {user_id} has passed quiz {quiz.id}")
-        return True
-    
-    logger.info(f"User {user_id} has not passed quiz {quiz.id}")
-    return False
+logger = logging.getLogger(__name__)
 
+# A user's standing on an article's quiz; quiz_id is None when the article has no quiz yet
+QuizAccess = namedtuple('QuizAccess', ['quiz_id', 'attempted', 'passed', 'score'])
+NO_QUIZ = QuizAccess(None, False, False, None)
 
-def user_has_attempted_quiz(user_id, article_id):
-    quiz = Quiz.query.filter_by(article_id=article_id).first()
-    if not quiz:
-        return False
+# Per-request memo of QuizAccess by (user_id, article_id).
+# Lives on flask.g, so templates, views and helpers share one lookup per request.
+def _quiz_access_memo():
+    if not has_app_context():
+        return {}
+    if '_quiz_access' not in g:
+        g._quiz_access = {}
+    return g._quiz_access
+
+# Quiz standing for several articles at once: one joined query for everything not memoized yet
+def quiz_access_batch(user_id, article_ids):
+    memo = _quiz_access_memo()
+    result = {}
+    missing = []
+    for article_id in article_ids:
+        access = memo.get((user_id, article_id))
+        if access is None:
+            missing.append(article_id)
+        else:
+            result[article_id] = access
+
+    if missing:
+        fetched = dict.fromkeys(missing, NO_QUIZ)
+        rows = db.session.query(Quiz.article_id, Quiz.id, UserQuiz.attempted, UserQuiz.passed, UserQuiz.score) \
+            .outerjoin(UserQuiz, and_(UserQuiz.quiz_id == Quiz.id, UserQuiz.user_id == user_id)) \
+            .filter(Quiz.article_id.in_(missing)).all()
+        for article_id, quiz_id, attempted, passed, score in rows:
+            fetched[article_id] = QuizAccess(quiz_id, bool(attempted), bool(passed), score)
+
+        for article_id, access in fetched.items():
+            memo[(user_id, article_id)] = access
+        result.update(fetched)
+        logger.debug(f"Loaded quiz access for User {user_id} on {len(missing)} articles")
 
-    user_quiz_entry = UserQuiz.query.filter_by(
-        user_id=user_id,
-        quiz_id=quiz.id
-    ).first()
+    return result
 
-    return user_quiz_entry is not None and user_quiz_entry.attempted
\ No newline at end of file
+def quiz_access(user_id, article_id):
+    return quiz_access_batch(user_id, [article_id])[article_id]
+
+# Drops the memoized standing after it changes (e.g. a quiz submission)
+def forget_quiz_access(user_id, article_id):
+    _quiz_access_memo().pop((user_id, article_id), None)
+
+def user_has_passed_quiz(user_id, article_id):
+    return quiz_access(user_id, article_id).passed
+
+def user_has_attempted_quiz(user_id, article_id):
+    return quiz_access(user_id, article_id).attempted
@@ -0,0 +1,72 @@
+from app import db, login_manager
+from app.models import User
+from collections import OrderedDict
+from flask import current_app
+from flask_login import UserMixin
+from sqlalchemy import event
+import threading
+import time
+
+# Cached identities for Flask-Login
+# Every authenticated request loads its user before the view runs. Request
+# handling only needs the user's id and username, so those are kept in a small
+# TTL cache and current_user is a lightweight UserIdentity instead of a User row.
+# Updates and deletes made through the ORM drop the cached entry right away;
+# changes made by other processes are picked up once USER_CACHE_SECONDS pass.
+
+class UserIdentity(UserMixin):
+    def __init__(self, id, username):
+        self.id = id
+        self.username = username
+
+    def __repr__(self):
+        return f"UserIdentity({self.id}, '{self.username}')"
+
+_identities = OrderedDict()
+_identities_lock = threading.Lock()
+
+def _fetch_identity(user_id):
+    row = db.session.query(User.id, User.username).filter_by(id=user_id).first()
+    return UserIdentity(*row) if row else None
+
+@login_manager.user_loader  # Flask-Login Decorator
+def load_user(user_id):
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+
+    ttl = current_app.config.get('USER_CACHE_SECONDS', 60)
+    if ttl <= 0:
+        return _fetch_identity(user_id)
+
+    now = time.monotonic()
+    with _identities_lock:
+        cached = _identities.get(user_id)
+        if cached and cached[0] > now:
+            _identities.move_to_end(user_id)
+            return cached[1]
+
+    identity = _fetch_identity(user_id)
+    if identity is None:
+        return None
+
+    with _identities_lock:
+        _identities[user_id] = (now + ttl, identity)
+        _identities.move_to_end(user_id)
+        while len(_identities) > current_app.config.get('USER_CACHE_MAX_ENTRIES', 10000):
+            _identities.popitem(last=False)
+    return identity
+
+def forget_identity(user_id):
+    with _identities_lock:
+        _identities.pop(user_id, None)
+
+def clear_identities():
+    with _identities_lock:
+        _identities.clear()
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _user_changed(mapper, connection, target):
+    forget_identity(target.id)
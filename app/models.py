@@ -1,14 +1,12 @@
 from datetime import datetime, timezone
-from app import db, login_manager
+from app import db
 from flask_login import UserMixin
+from markupsafe import Markup, escape
+from sqlalchemy import event
+from sqlalchemy.orm import load_only
 from sqlalchemy.sql import expression
 import json
 
-@login_manager.user_loader  # Flask-Login Decorator
-def load_user(user_id):
-    # Fetches user object from User table
-    return User.query.get(int(user_id))
-
 # User Entity - db.Model maps to database table, UserMixin is Flask-Login mixin
 class User(db.Model, UserMixin):
     __tablename__ = 'user'
@@ -27,33 +25,82 @@ class User(db.Model, UserMixin):
     def __repr__(self):
         return f"User('{self.username}', '{self.email}')"
 
+# Article body as HTML: one escaped <p> per non-blank line.
+# Done once when an article is stored, so views don't split and escape the body per request.
+def render_paragraphs(content):
+    return ''.join(f'<p>{escape(line)}</p>' for line in (content or '').split('\n') if line.strip())
+
 # Article Entity 
 class Article(db.Model):
     __tablename__ = 'article'
+    __table_args__ = (
+        # newest-first listing and keyset pagination on (date_posted, id)
+        db.Index('ix_article_date_posted_id', 'date_posted', 'id'),
+    )
 
     # define attributes 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(250), nullable=False, unique=True)
-    content = db.Column(db.Text, nullable=False)
+    content = db.deferred(db.Column(db.Text, nullable=False))  # large body, only loaded when accessed
+    content_html = db.deferred(db.Column(db.Text, nullable=True))  # content rendered by render_paragraphs()
     source = db.Column(db.String(200), nullable=False)
     date_posted = db.Column(db.DateTime, nullable=False, default=datetime.now(timezone.utc))
     image_url = db.Column(db.String(500), nullable=True)  # New field for main image
+    thumbnail_key = db.Column(db.String(64), nullable=True)  # content key of the card thumbnail, see app/thumbnails.py
 
     # relationships 
     quiz = db.relationship('Quiz', uselist=False, backref='article')  # uselist=False indicates a 1-to-1 relationship with quiz
     comments = db.relationship('Comment', backref='article', lazy=True)
 
+    # query for list pages: loads only the columns an article card renders,
+    # and raises instead of lazily loading anything else per row
+    @classmethod
+    def card_query(cls):
+        return cls.query.options(
+            load_only(cls.id, cls.title, cls.source, cls.date_posted, cls.image_url, cls.thumbnail_key, raiseload=True)
+        )
+
+    # rendered body, falling back to rendering content for rows stored before content_html existed
+    @property
+    def body_html(self):
+        return Markup(self.content_html if self.content_html is not None else render_paragraphs(self.content))
+
     # string representation for Article object
     def __repr__(self):
         return f"Article('{self.title}', '{self.source}')"
 
+# keeps content_html in step with content for articles written through the ORM
+@event.listens_for(Article, 'before_insert')
+@event.listens_for(Article, 'before_update')
+def _render_content_html(mapper, connection, target):
+    state = db.inspect(target)
+    if state.attrs.content.history.has_changes() or (not state.persistent and state.dict.get('content_html') is None):
+        target.content_html = render_paragraphs(target.content)
+
+# SimHash of an article's body, for near-duplicate detection (see app/near_duplicates.py)
+# Each 16-bit band is indexed, so articles close to a new one are found without a scan
+class ArticleFingerprint(db.Model):
+    __tablename__ = 'article_fingerprint'
+
+    # attributes
+    article_id = db.Column(db.Integer, db.ForeignKey('article.id', name="fk_article_fingerprint_article"), primary_key=True)
+    simhash = db.Column(db.BigInteger, nullable=False)  # stored signed
+    band0 = db.Column(db.Integer, nullable=False, index=True)
+    band1 = db.Column(db.Integer, nullable=False, index=True)
+    band2 = db.Column(db.Integer, nullable=False, index=True)
+    band3 = db.Column(db.Integer, nullable=False, index=True)
+
+    # string representation of ArticleFingerprint object
+    def __repr__(self):
+        return f"ArticleFingerprint(Article ID: {self.article_id}, SimHash: {self.simhash})"
+
 # Quiz Entity
 class Quiz(db.Model):
     __tablename__ = 'quiz'
 
     # attributes
     id = db.Column(db.Integer, primary_key=True)
-    article_id = db.Column(db.Integer, db.ForeignKey('article.id', name="fk_quiz_article"), nullable=False)
+    article_id = db.Column(db.Integer, db.ForeignKey('article.id', name="fk_quiz_article"), nullable=False, unique=True, index=True)  # one quiz per article
     questions = db.Column(db.Text, nullable=False)  # store as JSON string
     date_generated = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
@@ -72,8 +119,8 @@ class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     date_posted = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id', name="fk_comment_user"), nullable=False)
-    article_id = db.Column(db.Integer, db.ForeignKey('article.id', name="fk_comment_article"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', name="fk_comment_user"), nullable=False, index=True)
+    article_id = db.Column(db.Integer, db.ForeignKey('article.id', name="fk_comment_article"), nullable=False, index=True)
 
     # string representation of Comment object
     def __repr__(self):
@@ -96,4 +143,86 @@ class UserQuiz(db.Model):
 
     # string representation of UserQuiz object
     def __repr__(self):
-        return f"UserQuiz(User ID: {self.user_id}, Quiz ID: {self.quiz_id}, Passed: {self.passed})"
\ No newline at end of file
+        return f"UserQuiz(User ID: {self.user_id}, Quiz ID: {self.quiz_id}, Passed: {self.passed})"
+
+# Cached LLM quiz output, keyed by a hash of (model, prompt version, normalized article text)
+# Lets identical article bodies reuse validated questions instead of paying for a new completion
+class QuizCache(db.Model):
+    __tablename__ = 'quiz_cache'
+
+    # attributes
+    key = db.Column(db.String(64), primary_key=True)  # sha256 hex digest
+    model = db.Column(db.String(50), nullable=False)
+    questions = db.Column(db.Text, nullable=False)  # validated JSON string
+    hits = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    # string representation of QuizCache object
+    def __repr__(self):
+        return f"QuizCache('{self.key[:12]}', Model: {self.model}, Hits: {self.hits})"
+
+# Quiz generation job, one row per article waiting for (or done with) a quiz
+# Processed in the background by app.quiz_queue so page views never wait on the LLM
+class QuizJob(db.Model):
+    __tablename__ = 'quiz_job'
+
+    # attributes
+    id = db.Column(db.Integer, primary_key=True)
+    article_id = db.Column(db.Integer, db.ForeignKey('article.id', name="fk_quiz_job_article"), unique=True, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # string representation of QuizJob object
+    def __repr__(self):
+        return f"QuizJob(Article ID: {self.article_id}, Status: {self.status}, Attempts: {self.attempts})"
+
+# Feed registry and fetch state, one row per RSS feed
+# Remembers HTTP validators and recently seen entries so polling can skip unchanged feeds,
+# and when the feed is next due; failing feeds are polled less and less often
+class FeedState(db.Model):
+    __tablename__ = 'feed_state'
+
+    # attributes
+    id = db.Column(db.Integer, primary_key=True)
+    feed_url = db.Column(db.String(500), unique=True, nullable=False)
+    enabled = db.Column(db.Boolean, nullable=False, default=True, server_default=expression.true())
+    interval_minutes = db.Column(db.Integer, nullable=True)  # None uses FEED_INTERVAL_MINUTES
+    next_run_at = db.Column(db.DateTime, nullable=True, index=True)  # None means due now
+    consecutive_failures = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    last_error = db.Column(db.Text, nullable=True)
+    etag = db.Column(db.String(250), nullable=True)
+    last_modified = db.Column(db.String(100), nullable=True)
+    seen_guids = db.Column(db.Text, nullable=True)  # JSON list, newest first
+    last_status = db.Column(db.Integer, nullable=True)  # HTTP status of the last poll
+    last_run_at = db.Column(db.DateTime, nullable=True)
+    last_duration = db.Column(db.Float, nullable=True)  # seconds
+
+    def get_seen_guids(self):
+        return json.loads(self.seen_guids) if self.seen_guids else []
+
+    def set_seen_guids(self, guids):
+        self.seen_guids = json.dumps(guids)
+
+    # string representation of FeedState object
+    def __repr__(self):
+        return f"FeedState('{self.feed_url}', Last run: {self.last_run_at})"
+
+# Named lease held by one background worker at a time
+# The holder renews expires_at while it runs; once that passes, another worker may take over
+class WorkerLease(db.Model):
+    __tablename__ = 'worker_lease'
+
+    # attributes
+    name = db.Column(db.String(100), primary_key=True)
+    owner = db.Column(db.String(200), nullable=False)
+    acquired_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    # string representation of WorkerLease object
+    def __repr__(self):
+        return f"WorkerLease('{self.name}', Owner: {self.owner}, Expires: {self.expires_at})"
@@ -0,0 +1,155 @@
+from app import db
+from app.models import Article, ArticleFingerprint
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import or_, select
+import click
+import hashlib
+import re
+
+# Near-duplicate articles
+# Every stored article gets a 64-bit SimHash of its cleaned body: each 3-word
+# shingle is hashed, and a bit of the fingerprint is set when most shingles set
+# it. Bodies that share most of their text get fingerprints that differ in only
+# a few bits, however they are titled. Fingerprints live in article_fingerprint,
+# split into four 16-bit bands with an index each. Two fingerprints d bits apart
+# have a band that differs in at most d // 4 bits, so a lookup probes each band
+# index for the new article's band values with up to d // 4 bits flipped (17
+# values a band for d up to 7) and only scores the articles found there, instead
+# of scanning the archive.
+#
+# fetch_articles() skips an entry whose body is within NEAR_DUPLICATE_MAX_DISTANCE
+# bits of an article already stored (or stored earlier in the same run), so a
+# retitled or syndicated story isn't stored again and never gets a quiz of its own.
+
+SHINGLE_WORDS = 3
+MIN_WORDS = 20  # shorter bodies (video pages, stubs) say too little to compare
+BANDS = 4
+BAND_BITS = 16
+_BAND_MASK = (1 << BAND_BITS) - 1
+_LOWEST_BIT = (1).to_bytes(8, 'little')  # bit 0 of one 64-bit hash
+
+# SimHash of text, or None if it is too short to fingerprint
+def simhash(text):
+    words = re.findall(r'\w+', (text or '').lower())
+    if len(words) < MIN_WORDS:
+        return None
+    shingles = {' '.join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+    # Counting each bit position shingle by shingle is the slow part, so the hashes are
+    # laid end to end in one big integer and each position is counted with one popcount
+    hashes = int.from_bytes(b''.join([hashlib.blake2b(shingle.encode(), digest_size=8).digest()
+                                      for shingle in shingles]), 'little')
+    lowest_bits = int.from_bytes(_LOWEST_BIT * len(shingles), 'little')
+    half = len(shingles) / 2
+    fingerprint = 0
+    for bit in range(64):
+        if ((hashes >> bit) & lowest_bits).bit_count() > half:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+def hamming_distance(a, b):
+    return (a ^ b).bit_count()
+
+def fingerprint_bands(fingerprint):
+    return [(fingerprint >> (band * BAND_BITS)) & _BAND_MASK for band in range(BANDS)]
+
+# Band values to look up for fingerprints within distance bits: each band of fingerprint
+# with up to distance // BANDS of its bits flipped
+def band_probes(fingerprint, distance):
+    probes = []
+    for value in fingerprint_bands(fingerprint):
+        values = {value}
+        for _ in range(distance // BANDS):
+            values |= {v ^ (1 << bit) for v in values for bit in range(BAND_BITS)}
+        probes.append(values)
+    return probes
+
+# The database column is a signed 64-bit integer
+def _to_signed(fingerprint):
+    return fingerprint - (1 << 64) if fingerprint >= 1 << 63 else fingerprint
+
+def _to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+def max_distance():
+    return current_app.config.get('NEAR_DUPLICATE_MAX_DISTANCE', 6)
+
+def _row(article_id, fingerprint):
+    row = {'article_id': article_id, 'simhash': _to_signed(fingerprint)}
+    for band, value in enumerate(fingerprint_bands(fingerprint)):
+        row[f'band{band}'] = value
+    return row
+
+# Stores fingerprints ({article ID: fingerprint}) in the caller's transaction; the caller commits
+def store_fingerprints(fingerprints):
+    rows = [_row(article_id, fingerprint) for article_id, fingerprint in fingerprints.items() if fingerprint is not None]
+    if rows:
+        db.session.execute(ArticleFingerprint.__table__.insert(), rows)
+
+# Returns (article ID, distance) of the closest stored article within distance bits of fingerprint, or None
+def find_near_duplicate(fingerprint, distance=None):
+    distance = max_distance() if distance is None else distance
+    if fingerprint is None or distance < 0:
+        return None
+    columns = [ArticleFingerprint.band0, ArticleFingerprint.band1, ArticleFingerprint.band2, ArticleFingerprint.band3]
+    candidates = db.session.execute(
+        select(ArticleFingerprint.article_id, ArticleFingerprint.simhash)
+        .where(or_(*[column.in_(values) for column, values in zip(columns, band_probes(fingerprint, distance))]))
+    )
+    return _closest(((article_id, _to_unsigned(value)) for article_id, value in candidates), fingerprint, distance)
+
+def _closest(candidates, fingerprint, distance):
+    best = None
+    for key, other in candidates:
+        d = hamming_distance(fingerprint, other)
+        if d <= distance and (best is None or d < best[1]):
+            best = (key, d)
+    return best
+
+# Banded index of the fingerprints stored during one fetch run, before they are committed
+class FingerprintIndex:
+    def __init__(self):
+        self.fingerprints = {}  # key -> fingerprint
+        self.bands = [{} for _ in range(BANDS)]  # band value -> keys
+
+    def add(self, key, fingerprint):
+        if fingerprint is None:
+            return
+        self.fingerprints[key] = fingerprint
+        for band, value in enumerate(fingerprint_bands(fingerprint)):
+            self.bands[band].setdefault(value, []).append(key)
+
+    # (key, distance) of the closest fingerprint within distance bits, or None
+    def find(self, fingerprint, distance):
+        if fingerprint is None or distance < 0:
+            return None
+        keys = {key for band, values in enumerate(band_probes(fingerprint, distance))
+                for value in values for key in self.bands[band].get(value, ())}
+        return _closest(((key, self.fingerprints[key]) for key in keys), fingerprint, distance)
+
+# Fingerprints every article that has none yet, e.g. the archive stored before fingerprints existed
+def rebuild_fingerprints(batch_size=1000):
+    stored = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(Article.id, Article.content)
+            .outerjoin(ArticleFingerprint, ArticleFingerprint.article_id == Article.id)
+            .where(Article.id > last_id, ArticleFingerprint.article_id.is_(None))
+            .order_by(Article.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        fingerprints = {article_id: simhash(content) for article_id, content in rows}
+        store_fingerprints(fingerprints)
+        db.session.commit()
+        stored += sum(fingerprint is not None for fingerprint in fingerprints.values())
+        last_id = rows[-1][0]
+    return stored
+
+@click.command('fingerprint-articles')
+@with_appcontext
+def fingerprint_articles():
+    """Fingerprint stored articles for near-duplicate detection."""
+    click.echo(f"Fingerprinted {rebuild_fingerprints()} articles")
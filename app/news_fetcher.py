@@ -1,84 +1,493 @@
 import feedparser
 from app import db
-from app.models import Article
+from app.feeds import due_feeds, feed_states, schedule_success, schedule_failure
+from app.models import Article, ArticleFingerprint, render_paragraphs
+from app.near_duplicates import FingerprintIndex, find_near_duplicate, simhash, store_fingerprints
+from app.pagination import invalidate_article_count
+from app.pipeline import Pipeline
+from app.page_cache import touch_listing_stamp
+from app.quiz_queue import enqueue_quiz_jobs
+from app.search import index_articles
+from app.thumbnails import thumbnail_stage
 from datetime import datetime, timezone
 from dateutil import parser as date_parser
+from flask import current_app
+from functools import partial
 from newspaper import Article as NewsArticle
+from sqlalchemy.exc import IntegrityError
+import requests
 import ssl
+import time
 
 # Bypass SSL certificate errors, if any
 ssl._create_default_https_context = ssl._create_unverified_context
 
-def fetch_articles():
-    # List of RSS feed URLs
-    feeds = [
-        'https://feeds.bbci.co.uk/news/world/rss.xml'
-    ]
+# Ingestion pipeline
+# A fetch run streams through seven stages (see app/pipeline.py):
+#   fetch      polls due feeds concurrently (conditional GET), with a per-feed timeout
+#   normalize  turns feed entries into Entry objects, stopping at the first one seen last run
+#   dedup      drops entries whose title is already stored, one batched lookup per feed
+#   download   downloads full text concurrently, with a per-article timeout
+#   clean      strips captions and the repeated title, renders the paragraphs, fingerprints the body
+#              and looks for a near-duplicate already stored (see app/near_duplicates.py)
+#   thumbnail  makes card thumbnails concurrently for entries that will be stored, with a timeout
+#              of its own; a slow or broken image only costs the thumbnail, never the article
+#   persist    skips near-duplicates, including ones of articles stored earlier in the run,
+#              bulk inserts each feed's articles and commits the feed in one transaction
+# Only fetch, download and thumbnail leave the calling thread; everything touching the
+# database runs on it.
+
+# One feed's share of a fetch run, from its poll until its new articles are committed
+class FeedRun:
+    def __init__(self, state):
+        self.state = state
+        # what the fetch workers need, copied so they never touch the ORM object
+        self.feed_url = state.feed_url
+        self.etag = state.etag
+        self.modified = state.last_modified
+        self.seen_guids = state.get_seen_guids()
+        self.run_at = datetime.utcnow()
+        self.feed = None
+        self.feed_time = 0.0  # seconds spent fetching and parsing the feed
+        self.candidates = {}  # title -> Entry, in feed order
+        self.new_entries = []
+        self.rows = []  # downloaded articles waiting to be inserted
+        self.stored = []  # entries written by the feed's commit
+        self.taken = FingerprintIndex()  # fingerprints of the stored entries, until the feed commits
+        self.unfinished = set()  # titles whose download failed or timed out
+        self.pending = 0  # new entries still on their way to persist
+
+# One article on its way through the pipeline
+class Entry:
+    def __init__(self, run, title, link, published_date, guid):
+        self.run = run
+        self.title = title
+        self.link = link
+        self.published_date = published_date
+        self.guid = guid
+        self.text = None
+        self.content_html = None
+        self.top_image = None
+        self.thumbnail_key = None
+        self.fingerprint = None  # SimHash of the cleaned body
+        self.duplicate_of = None  # where the story is already stored, if this is a near-duplicate
+        self.make_thumbnail = True  # cleared by clean for near-duplicates
+        self.error = None  # 'timeout' or the exception that stopped the download
+
+# A feed answered with an HTTP error or a document that didn't parse
+class FeedError(Exception):
+    pass
+
+def fetch_articles(feeds=None):
+    # feeds: URLs to poll right now; by default every registered feed that is due
+    states = due_feeds() if feeds is None else feed_states(feeds)
+    if db.session.info.pop('feeds_registered', False):
+        # newly registered feeds get their own transaction, so a failing feed can't roll them back
+        db.session.commit()
+
+    # pool and batch settings
+    feed_workers = current_app.config.get('FEED_MAX_CONCURRENCY', 8)
+    feed_timeout = current_app.config.get('FEED_TIMEOUT', 20)
+    max_workers = current_app.config.get('FETCH_MAX_WORKERS', 8)
+    article_timeout = current_app.config.get('FETCH_ARTICLE_TIMEOUT', 20)
+    thumbnail_timeout = current_app.config.get('THUMBNAIL_TIMEOUT', 10)
+    chunk_size = current_app.config.get('FETCH_INSERT_CHUNK_SIZE', 100)
+    seen_limit = current_app.config.get('FEED_SEEN_GUIDS_LIMIT', 500)
+
+    run_start = time.perf_counter()
+    stats = {'feeds': len(states), 'feed_errors': 0, 'added': 0, 'existing': 0, 'near_duplicates': 0, 'failed': 0,
+             'timed_out': 0, 'not_modified': 0}
+
+    pipeline = Pipeline()
+    runs = (FeedRun(state) for state in states)
+    polled = fetch_stage(pipeline, runs, feed_workers, feed_timeout, stats)
+    runs = normalize_stage(pipeline, polled, stats)
+    entries = dedup_stage(pipeline, runs, stats, chunk_size, seen_limit)
+    entries = download_stage(pipeline, entries, max_workers, article_timeout)
+    # articles committed earlier in this run, checked in memory as well as in the database
+    taken = FingerprintIndex()
+    entries = clean_stage(pipeline, entries, taken)
+    entries = image_stage(pipeline, entries, max_workers, thumbnail_timeout, thumbnail_stage())
+    for _ in persist_stage(pipeline, entries, stats, chunk_size, seen_limit, taken):
+        pass
+
+    # listing pages (and the article total they show) are out of date now
+    if stats['added']:
+        invalidate_article_count()
+        touch_listing_stamp()
+
+    stats['duration'] = time.perf_counter() - run_start
+    stats['stages'] = pipeline.report()
+    print(f"Fetch run finished in {stats['duration']:.2f}s: {stats['feeds']} feeds ({stats['feed_errors']} errors), "
+          f"{stats['added']} added, {stats['existing']} existing, {stats['near_duplicates']} near-duplicates, "
+          f"{stats['failed']} failed, "
+          f"{stats['timed_out']} timed out")
+    for metrics in pipeline.metrics.values():
+        print(f"  {metrics}")
+    return stats
+
+# fetch: polls each feed on a worker thread, sending the stored validators.
+# A feed that takes longer than timeout fails like any other and is retried after its backoff.
+def fetch_stage(pipeline, runs, workers, timeout, stats):
+    return pipeline.concurrent('fetch', runs, partial(poll_feed, timeout=timeout), workers=workers, timeout=timeout,
+                               on_error=lambda run, e: poll_failed(run, e, stats))
+
+def poll_feed(run, timeout=None):
+    feed_start = time.perf_counter()
+    run.feed = download_feed(run.feed_url, etag=run.etag, modified=run.modified, timeout=timeout)
+    run.feed_time = time.perf_counter() - feed_start
+
+    status = run.feed.get('status')
+    if status is not None and status >= 400:
+        raise FeedError(f'HTTP {status}')
+    if status != 304 and run.feed.bozo:
+        raise FeedError(f"malformed feed ({run.feed.get('bozo_exception')})")
+    return run
+
+# Fetches and parses a feed with a conditional GET. feedparser's own fetching has no
+# timeout, so the request is made here and feedparser only parses the body.
+def download_feed(url, etag=None, modified=None, timeout=None):
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if modified:
+        headers['If-Modified-Since'] = modified
+    response = requests.get(url, headers=headers, timeout=timeout)
+
+    if response.status_code == 304 or response.status_code >= 400:
+        feed = feedparser.FeedParserDict(bozo=False, entries=[])
+    else:
+        response_headers = {name.lower(): value for name, value in response.headers.items()}
+        response_headers.setdefault('content-location', response.url)
+        feed = feedparser.parse(response.content, response_headers=response_headers)
+    feed['status'] = response.status_code
+    feed['href'] = response.url
+    if response.headers.get('ETag'):
+        feed['etag'] = response.headers['ETag']
+    if response.headers.get('Last-Modified'):
+        feed['modified'] = response.headers['Last-Modified']
+    return feed
+
+def poll_failed(run, error, stats):
+    record_poll(run.state, run.feed.get('status') if run.feed is not None else None, run.feed_time)
+    feed_failed(run.state, error, stats)
+    return []
+
+# normalize: reads a polled feed's entries, newest first, up to the first one seen last run
+def normalize_stage(pipeline, runs, stats):
+    return pipeline.serial('normalize', runs, lambda run: normalize_entries(run, stats),
+                           on_error=lambda run, e: run_failed(run, e, stats))
+
+def normalize_entries(run, stats):
+    # feed unchanged since the last poll, nothing to do
+    if run.feed.get('status') == 304:
+        record_poll(run.state, 304, run.feed_time)
+        schedule_success(run.state)
+        db.session.commit()
+        stats['not_modified'] += 1
+        print(f"Feed not modified: {run.feed_url}")
+        return []
+
+    seen = set(run.seen_guids)
+    for item in run.feed.entries:
+        # Extract relevant data from RSS feed structure
+        title = item.title
+        link = item.link
+        guid = item.get('id') or link
+        if guid in seen:
+            break
+        # summary = item.summary if 'summary' in item else ''
+
+        # Handle different date formats
+        if 'published' in item:
+            date_str = item.published
+        elif 'updated' in item:
+            date_str = item.updated
+        else:
+            date_str = datetime.now(timezone.utc).isoformat()  # Current time
 
-    # Loop through RSS feeds
-    for feed_url in feeds:
         try:
-            feed = feedparser.parse(feed_url)
-
-            # Check for parsing errors
-            if feed.bozo:
-                print(f"Error parsing feed: {feed_url}")
-                continue  # Skips to next feed
-
-            # Cycle through individual articles
-            for entry in feed.entries:
-                # Extract relevant data from RSS feed structure
-                title = entry.title
-                link = entry.link
-                # summary = entry.summary if 'summary' in entry else ''
-
-                # Handle different date formats
-                if 'published' in entry:
-                    date_str = entry.published
-                elif 'updated' in entry:
-                    date_str = entry.updated
-                else:
-                    date_str = datetime.now(timezone.utc).isoformat()  # Current time
-
-                try:
-                    published_date = date_parser.parse(date_str)
-                except (ValueError, TypeError) as e:
-                    print(f"Date parsing error for entry '{title}': {e}")
-                    published_date = datetime.now(timezone.utc)
-
-                # Check if article already exists in database
-                existing_article = Article.query.filter_by(title=title).first()
-
-                # If new article
-                if not existing_article:
-                    article_text, top_image = get_full_article_content(link, title)  # Pass both link and title
-
-                    # Create new article object
-                    article = Article(
-                        title=title,
-                        content=article_text,
-                        source=link,
-                        date_posted=published_date,
-                        image_url=top_image  # Save the main image URL
-                    )
-
-                    # Add to database session, then commit to save
-                    db.session.add(article)
-                    db.session.commit()
-                    print(f"Added article: {title}")
-                else:
-                    print(f"Article already exists: {title}")
-
-        except Exception as e:
-            print(f"Exception occurred while fetching feed {feed_url}: {e}")
-
-# Grab entire article content and main image URL
-def get_full_article_content(url, title):
-    article = NewsArticle(url)
+            published_date = date_parser.parse(date_str)
+        except (ValueError, TypeError) as e:
+            print(f"Date parsing error for entry '{title}': {e}")
+            published_date = datetime.now(timezone.utc)
+
+        # first occurrence wins if a feed repeats a title
+        if title not in run.candidates:
+            run.candidates[title] = Entry(run, title, link, published_date, guid)
+    return [run]
+
+# dedup: keeps the entries whose title isn't stored yet, or taken by another feed in this run
+def dedup_stage(pipeline, runs, stats, chunk_size, seen_limit):
+    claimed = set()
+    return pipeline.serial('dedup', runs, lambda run: new_entries(run, claimed, stats, chunk_size, seen_limit),
+                           on_error=lambda run, e: run_failed(run, e, stats))
+
+def new_entries(run, claimed, stats, chunk_size, seen_limit):
+    # Check which articles already exist in the database with one batched lookup
+    existing = article_ids_by_title(run.candidates.keys())
+    for title, entry in run.candidates.items():
+        if title in existing or title in claimed:
+            stats['existing'] += 1
+            print(f"Article already exists: {title}")
+        else:
+            claimed.add(title)
+            run.new_entries.append(entry)
+
+    run.pending = len(run.new_entries)
+    if not run.new_entries:
+        # nothing to download; just remember the entries and schedule the next poll
+        finish_feed_run(run, stats, chunk_size, seen_limit)
+    return run.new_entries
+
+# download: full text of each new entry on a worker thread.
+# Failed and timed out entries carry on with entry.error set, so persist can account for them.
+def download_stage(pipeline, entries, workers, timeout):
+    return pipeline.concurrent('download', entries, partial(download_entry, timeout=timeout),
+                               workers=workers, queue_size=workers * 4, timeout=timeout, on_error=download_failed)
+
+def download_entry(entry, timeout=None):
+    entry.text, entry.top_image = get_full_article_content(entry.link, entry.title, timeout=timeout)
+    return entry
+
+def download_failed(entry, error):
+    entry.error = 'timeout' if isinstance(error, TimeoutError) else error
+    return [entry]
+
+# thumbnail: card thumbnail of each downloaded entry's top image on a worker thread, skipping
+# near-duplicates, which are never stored. An image that fails or runs past timeout just leaves
+# the entry without a thumbnail.
+def image_stage(pipeline, entries, workers, timeout, thumbnail):
+    return pipeline.concurrent('thumbnail', entries, partial(thumbnail_entry, thumbnail=thumbnail),
+                               workers=workers, queue_size=workers * 4, timeout=timeout,
+                               on_error=thumbnail_failed)
+
+def thumbnail_entry(entry, thumbnail):
+    if entry.error is None and entry.make_thumbnail and entry.top_image:
+        entry.thumbnail_key = thumbnail(entry.top_image)
+    return entry
+
+def thumbnail_failed(entry, error):
+    print(f"No thumbnail for '{entry.title}': {error}")
+    entry.thumbnail_key = None
+    return [entry]
+
+# clean: tidies the downloaded text and renders it once here, not per view, fingerprints it
+# and checks it against the stored articles before any thumbnail is made for it
+def clean_stage(pipeline, entries, taken):
+    in_flight = FingerprintIndex()  # entries cleaned earlier in the run, not necessarily stored yet
+    return pipeline.serial('clean', entries, lambda entry: clean_entry(entry, taken, in_flight))
+
+def clean_entry(entry, taken, in_flight):
+    if entry.error is None:
+        entry.text = clean_article_text(entry.text, entry.title)
+        entry.content_html = render_paragraphs(entry.text)
+        entry.fingerprint = simhash(entry.text)
+        entry.duplicate_of = near_duplicate_of(entry, taken)
+        # a copy of an entry still on its way to persist is left for persist to judge, since that
+        # entry's feed may yet fail; it gets no thumbnail meanwhile (a stored card falls back to image_url)
+        distance = current_app.config.get('NEAR_DUPLICATE_MAX_DISTANCE', 6)
+        entry.make_thumbnail = entry.duplicate_of is None and in_flight.find(entry.fingerprint, distance) is None
+        in_flight.add(entry.title, entry.fingerprint)
+    return [entry]
+
+# persist: collects each feed's articles and writes them once the feed's last entry is in
+def persist_stage(pipeline, entries, stats, chunk_size, seen_limit, taken):
+    return pipeline.serial('persist', entries, lambda entry: persist_entry(entry, stats, chunk_size, seen_limit, taken))
+
+# Where a near-duplicate entry's story is already stored, by this feed or an earlier one, or None.
+# With in_database=False only the articles of this run are checked.
+def near_duplicate_of(entry, taken, in_database=True):
+    distance = current_app.config.get('NEAR_DUPLICATE_MAX_DISTANCE', 6)
+    match = entry.run.taken.find(entry.fingerprint, distance) or taken.find(entry.fingerprint, distance)
+    if match:
+        return f"'{match[0]}' ({match[1]} bits apart)"
+    match = find_near_duplicate(entry.fingerprint, distance) if in_database else None
+    if match:
+        return f"article {match[0]} ({match[1]} bits apart)"
+    return None
+
+def persist_entry(entry, stats, chunk_size, seen_limit, taken):
+    run = entry.run
+    duplicate_of = None
+    if entry.error is None:
+        # clean checked the database; articles of this run may have been stored since
+        duplicate_of = entry.duplicate_of or near_duplicate_of(entry, taken, in_database=False)
+    run.pending -= 1
+    if entry.error == 'timeout':
+        stats['timed_out'] += 1
+        run.unfinished.add(entry.title)
+        print(f"Timed out downloading article: {entry.title}")
+    elif entry.error:
+        stats['failed'] += 1
+        run.unfinished.add(entry.title)
+        print(f"Error downloading article '{entry.title}': {entry.error}")
+    elif duplicate_of:
+        # same story under another title or from another feed: not stored, so no second quiz
+        stats['near_duplicates'] += 1
+        print(f"Article is a near-duplicate of {duplicate_of}: {entry.title}")
+    else:
+        run.rows.append({
+            'title': entry.title,
+            'content': entry.text,
+            'content_html': entry.content_html,
+            'source': entry.link,
+            'date_posted': entry.published_date,
+            'image_url': entry.top_image,  # Save the main image URL
+            'thumbnail_key': entry.thumbnail_key  # local card thumbnail, see app/thumbnails.py
+        })
+        run.stored.append(entry)
+        run.taken.add(entry.title, entry.fingerprint)
+
+    if run.pending or not finish_feed_run(run, stats, chunk_size, seen_limit, taken):
+        return []
+    return run.stored
+
+# Inserts a feed's downloaded articles in chunks, records its state and commits them
+# together, then adds their fingerprints to taken. Returns False if the feed failed and was rolled back.
+def finish_feed_run(run, stats, chunk_size, seen_limit, taken=None):
+    state = run.state
+    try:
+        new_ids = {}  # title -> ID of the rows this run inserted
+        for i in range(0, len(run.rows), chunk_size):
+            new_ids.update(insert_articles(run.rows[i:i + chunk_size]))
+
+        # remember handled entries. The next poll stops at the first seen one, so entries newer than
+        # (or as new as) the oldest failed entry stay unseen, or the failed one would never be reached again;
+        # the stored ones among them are dropped by title in dedup
+        titles = list(run.candidates)  # newest first
+        failed = [i for i, title in enumerate(titles) if title in run.unfinished]
+        handled = [run.candidates[title].guid for title in titles[failed[-1] + 1 if failed else 0:]]
+        state.set_seen_guids((handled + run.seen_guids)[:seen_limit])
+        # keep the validators only once everything was handled, so a retry isn't answered with 304
+        state.etag = None if failed else run.feed.get('etag')
+        state.last_modified = None if failed else run.feed.get('modified')
+        record_poll(state, run.feed.get('status'), run.feed_time, run.run_at)
+        schedule_success(state)
+
+        # index the new articles for search and near-duplicates, and queue their quizzes so readers never wait on them
+        if new_ids:
+            store_fingerprints({new_ids[entry.title]: entry.fingerprint for entry in run.stored
+                                if entry.title in new_ids})
+            index_articles(new_ids.values())
+            enqueue_quiz_jobs(list(new_ids.values()))
+
+        # commit the whole feed run in one transaction
+        db.session.commit()
+        stats['added'] += len(new_ids)
+        if taken is not None:
+            for title, fingerprint in run.taken.fingerprints.items():
+                taken.add(title, fingerprint)
+        print(f"Feed {run.feed_url}: parsed in {run.feed_time:.2f}s, {len(run.rows)} of "
+              f"{len(run.new_entries)} new entries downloaded")
+        return True
+    except Exception as e:
+        run_failed(run, e, stats)
+        return False
+
+# A feed whose processing raised: drop its half-done work and back it off
+def run_failed(run, error, stats):
+    db.session.rollback()
+    run.stored = []
+    feed_failed(run.state, error, stats)
+    return []
+
+def record_poll(state, status, feed_time, run_at=None):
+    state.last_status = status
+    state.last_run_at = run_at or datetime.utcnow()
+    state.last_duration = feed_time
+
+# Records a failed poll and backs the feed off. Callers roll back first if the
+# failure left database work half done.
+def feed_failed(state, error, stats):
+    stats['feed_errors'] += 1
+    print(f"Exception occurred while fetching feed {state.feed_url}: {error}")
+    try:
+        schedule_failure(state, error)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Could not record the failure of feed {state.feed_url}: {e}")
+
+# Maps the titles that are already stored to their article IDs, querying in
+# batches to stay under the database's bound-parameter limit
+def article_ids_by_title(titles, batch_size=500):
+    titles = list(titles)
+    found = {}
+    for i in range(0, len(titles), batch_size):
+        batch = titles[i:i + batch_size]
+        rows = db.session.query(Article.title, Article.id).filter(Article.title.in_(batch)).all()
+        found.update(rows)
+    return found
+
+# Builds an INSERT that silently skips rows violating the unique title constraint,
+# or returns None if the database has no such statement
+def insert_ignore_statement():
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert(Article.__table__).on_conflict_do_nothing(index_elements=['title'])
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert(Article.__table__).on_conflict_do_nothing(index_elements=['title'])
+    if dialect in ('mysql', 'mariadb'):
+        from sqlalchemy import insert
+        return insert(Article.__table__).prefix_with('IGNORE')
+    return None
+
+def supports_insert_returning():
+    return db.session.get_bind().dialect.insert_executemany_returning
+
+# Bulk inserts article rows (dicts of column values) in a single statement.
+# Titles that were inserted concurrently by someone else are skipped, not raised.
+# Returns {title: article ID} for the rows actually inserted; the caller commits.
+def insert_articles(rows):
+    if not rows:
+        return {}
+    statement = insert_ignore_statement()
+    if statement is None:
+        inserted = insert_each(rows)
+    elif supports_insert_returning():
+        # only the rows that weren't skipped come back
+        result = db.session.connection().execute(statement.returning(Article.title, Article.id), rows)
+        inserted = dict(result.all())
+    else:
+        db.session.connection().execute(statement, rows)
+        inserted = unfingerprinted_ids_by_title(row['title'] for row in rows)
+    print(f"Added {len(inserted)} of {len(rows)} articles")
+    return inserted
+
+# Fallback for other databases: one INSERT per row, each in a savepoint so a
+# duplicate title only undoes that row
+def insert_each(rows):
+    connection = db.session.connection()
+    inserted = {}
+    for row in rows:
+        try:
+            with connection.begin_nested():
+                result = connection.execute(Article.__table__.insert(), row)
+            inserted[row['title']] = result.inserted_primary_key[0]
+        except IntegrityError:
+            pass
+    return inserted
+
+# For databases whose insert-or-ignore can't return the rows it inserted: of the given
+# titles, the articles without a fingerprint yet. A row someone else inserted was committed
+# together with its fingerprint, so what is left is ours (or has no body to fingerprint).
+def unfingerprinted_ids_by_title(titles):
+    found = article_ids_by_title(titles)
+    fingerprinted = {article_id for (article_id,) in db.session.query(ArticleFingerprint.article_id)
+                     .filter(ArticleFingerprint.article_id.in_(found.values()))}
+    return {title: article_id for title, article_id in found.items() if article_id not in fingerprinted}
+
+# Grab entire article text (as extracted, see clean_article_text) and main image URL
+def get_full_article_content(url, title, timeout=None):
+    article = NewsArticle(url, request_timeout=timeout) if timeout else NewsArticle(url)
     article.download()
     article.parse()
-    content = article.text
+    return article.text, article.top_image
 
+def clean_article_text(content, title):
     # Remove the title from the content if present
     if content.startswith(title):
         content = content[len(title):].strip()
@@ -90,14 +499,15 @@ def get_full_article_content(url, title):
         # Remove lines that start with 'Watch:' or contain specific keywords
         if not line.lower().startswith('watch:') and not 'prison' in line.lower():
             cleaned_lines.append(line)
-    cleaned_content = '\n'.join(cleaned_lines)
-
-    return cleaned_content, article.top_image
+    return '\n'.join(cleaned_lines)
 
 # Allows news_fetcher to be run manually as a module
+# (python -m app.news_fetcher [feed_url ...]); with no URLs, polls the feeds that are due
 if __name__ == '__main__':
-    from app import app
+    import sys
+    from app import create_app
+    app = create_app()
 
     # Ensures that app operations will run despite Flask not being 'run'
     with app.app_context(): 
-        fetch_articles()
\ No newline at end of file
+        fetch_articles(sys.argv[1:] or None)
\ No newline at end of file
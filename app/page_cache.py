@@ -0,0 +1,121 @@
+from app import db
+from app.models import Article
+from collections import OrderedDict
+from datetime import datetime, timezone
+from flask import current_app, request, session, make_response
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+import hashlib
+import os
+import threading
+import time
+
+# Rendered listing page cache
+# Listing pages only change when articles are added, edited or removed, so the
+# rendered HTML for anonymous visitors is kept and served until that happens.
+# Changes are recorded by bumping the mtime of a stamp file
+# (LISTING_STAMP_PATH). Every process serving pages reads the same file, so a
+# fetch run in one process invalidates the cache in all of them. The stamp is
+# also the validator clients see, as ETag and Last-Modified.
+
+def _stamp_path():
+    return current_app.config.get('LISTING_STAMP_PATH') or os.path.join(current_app.instance_path, 'listing.stamp')
+
+# Current listing version (stamp mtime in ns); 0 before anything was ever stamped
+def listing_version():
+    try:
+        return os.stat(_stamp_path()).st_mtime_ns
+    except OSError:
+        return 0
+
+# Marks the listing as changed. The new mtime is always later than the old one,
+# even on filesystems with coarse timestamps.
+def touch_listing_stamp():
+    path = _stamp_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    previous = listing_version()
+    with open(path, 'a'):
+        pass
+    stamp = max(time.time_ns(), previous + 1)
+    os.utime(path, ns=(stamp, stamp))
+    return stamp
+
+# articles written through the ORM bump the stamp once their transaction commits
+@event.listens_for(Article, 'after_insert')
+@event.listens_for(Article, 'after_update')
+@event.listens_for(Article, 'after_delete')
+def _article_changed(mapper, connection, target):
+    object_session(target).info['listing_changed'] = True
+
+@event.listens_for(db.session, 'after_commit')
+def _touch_after_commit(session):
+    if session.info.pop('listing_changed', False):
+        touch_listing_stamp()
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_after_rollback(session):
+    session.info.pop('listing_changed', None)
+
+_pages = OrderedDict()
+_pages_lock = threading.Lock()
+_pages_version = {'value': None}
+
+def _lookup(version, key):
+    with _pages_lock:
+        if _pages_version['value'] != version:
+            # everything cached belongs to an older listing
+            _pages.clear()
+            _pages_version['value'] = version
+            return None
+        body = _pages.get(key)
+        if body is not None:
+            _pages.move_to_end(key)
+        return body
+
+def _store(version, key, body):
+    with _pages_lock:
+        if _pages_version['value'] != version:
+            return
+        _pages[key] = body
+        _pages.move_to_end(key)
+        while len(_pages) > current_app.config.get('ARTICLES_PAGE_CACHE_SIZE', 256):
+            _pages.popitem(last=False)
+
+def clear_page_cache():
+    with _pages_lock:
+        _pages.clear()
+        _pages_version['value'] = None
+
+# Returns the response for a listing page, rendering it with render() only when needed.
+# Signed-in users (whose pages carry their own quiz badges) and responses with
+# pending flash messages are always rendered fresh.
+def cached_listing(render):
+    if not current_app.config.get('ARTICLES_PAGE_CACHE', True) or current_user.is_authenticated or '_flashes' in session:
+        response = make_response(render())
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    version = listing_version()
+    key = ('anonymous', request.full_path)
+    etag = hashlib.sha1(f'{version}:{key}'.encode('utf-8')).hexdigest()[:20]
+    last_modified = datetime.fromtimestamp(version // 10 ** 9, timezone.utc)
+
+    # revalidation: nothing is queried or rendered
+    if request.if_none_match.contains_weak(etag):
+        return _with_validators(make_response('', 304), etag, last_modified)
+
+    body = _lookup(version, key)
+    if body is None:
+        body = render()
+        _store(version, key, body)
+    response = _with_validators(make_response(body), etag, last_modified)
+    # also answers If-Modified-Since from clients that don't send the ETag
+    return response.make_conditional(request)
+
+def _with_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'public, no-cache'
+    response.vary.add('Cookie')
+    return response
@@ -0,0 +1,89 @@
+from app import db
+from app.models import Article, Comment
+from app.page_cache import listing_version
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import joinedload
+import threading
+import time
+
+# Keyset (cursor) pagination for the article feed
+# Pages are addressed by the (date_posted, id) of the last article shown, so every
+# page is an index range scan on ix_article_date_posted_id no matter how deep it is,
+# instead of an OFFSET over everything before it.
+
+CURSOR_DATE_FORMAT = '%Y%m%d%H%M%S%f'
+
+# Cursor string for the position just after row (an Article or a Comment)
+def encode_cursor(row):
+    return f"{row.date_posted.strftime(CURSOR_DATE_FORMAT)}-{row.id}"
+
+# Parses a cursor back into (date_posted, id); returns None if it is malformed
+def decode_cursor(cursor):
+    try:
+        date_part, id_part = cursor.split('-', 1)
+        return datetime.strptime(date_part, CURSOR_DATE_FORMAT), int(id_part)
+    except (AttributeError, ValueError):
+        return None
+
+class KeysetPage:
+    def __init__(self, items, next_cursor, total):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.has_next = next_cursor is not None
+        self.total = total  # approximate for articles, see article_count(); None for comments
+
+# Returns the page of article cards that follows cursor (newest first)
+def article_keyset_page(after=None, per_page=12):
+    query = Article.card_query().order_by(Article.date_posted.desc(), Article.id.desc())
+
+    position = decode_cursor(after) if after else None
+    if position:
+        query = query.filter(tuple_(Article.date_posted, Article.id) < tuple_(*position))
+
+    # fetch one extra row to know whether there is a next page
+    items = query.limit(per_page + 1).all()
+    next_cursor = encode_cursor(items[per_page - 1]) if len(items) > per_page else None
+    return KeysetPage(items[:per_page], next_cursor, article_count())
+
+# Returns the page of an article's comments that follows cursor (oldest first),
+# with each comment's author loaded in the same query
+def comment_keyset_page(article_id, after=None, per_page=20):
+    query = Comment.query.options(joinedload(Comment.author)) \
+        .filter(Comment.article_id == article_id) \
+        .order_by(Comment.date_posted, Comment.id)
+
+    position = decode_cursor(after) if after else None
+    if position:
+        query = query.filter(tuple_(Comment.date_posted, Comment.id) > tuple_(*position))
+
+    items = query.limit(per_page + 1).all()
+    next_cursor = encode_cursor(items[per_page - 1]) if len(items) > per_page else None
+    return KeysetPage(items[:per_page], next_cursor, None)
+
+# Cached article count
+# COUNT(*) scans the whole table, so the total shown on listing pages is cached for
+# ARTICLE_COUNT_CACHE_SECONDS and reset whenever articles are added, here or in
+# another process (see listing_version()).
+_count_cache = {'value': None, 'expires': 0.0, 'version': None}
+_count_lock = threading.Lock()
+
+def article_count():
+    version = listing_version()
+    with _count_lock:
+        if _count_cache['value'] is not None and _count_cache['version'] == version \
+                and time.monotonic() < _count_cache['expires']:
+            return _count_cache['value']
+
+    value = db.session.query(func.count(Article.id)).scalar()
+    ttl = current_app.config.get('ARTICLE_COUNT_CACHE_SECONDS', 300)
+    with _count_lock:
+        _count_cache['value'] = value
+        _count_cache['expires'] = time.monotonic() + ttl
+        _count_cache['version'] = version
+    return value
+
+def invalidate_article_count():
+    with _count_lock:
+        _count_cache['value'] = None
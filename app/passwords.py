@@ -0,0 +1,95 @@
+from app import db, bcrypt
+from app.models import User
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+import logging
+import threading
+
+# Password hashing policy
+# Hashers are looked up by name; PASSWORD_HASHER picks the one new hashes use and
+# its cost comes from config (BCRYPT_LOG_ROUNDS for bcrypt). Stored hashes are
+# verified by whichever hasher recognises them, and a successful login whose
+# hash doesn't match the current policy is rehashed in the background.
+
+logger = logging.getLogger(__name__)
+
+class BcryptHasher:
+    name = 'bcrypt'
+
+    def cost(self):
+        return current_app.config.get('BCRYPT_LOG_ROUNDS', 12)
+
+    def hash(self, password):
+        return bcrypt.generate_password_hash(password, rounds=self.cost()).decode('utf-8')
+
+    def identify(self, stored):
+        return stored.startswith(('$2a$', '$2b$', '$2y$'))
+
+    def verify(self, stored, password):
+        return bcrypt.check_password_hash(stored, password)
+
+    # True if stored was made with a different work factor than the current one
+    def needs_rehash(self, stored):
+        try:
+            return int(stored.split('$')[2]) != self.cost()
+        except (IndexError, ValueError):
+            return True
+
+HASHERS = {BcryptHasher.name: BcryptHasher()}
+
+def current_hasher():
+    return HASHERS[current_app.config.get('PASSWORD_HASHER', 'bcrypt')]
+
+def _hasher_for(stored):
+    for hasher in HASHERS.values():
+        if hasher.identify(stored):
+            return hasher
+    return None
+
+def hash_password(password):
+    return current_hasher().hash(password)
+
+def verify_password(stored, password):
+    hasher = _hasher_for(stored or '')
+    return bool(hasher and hasher.verify(stored, password))
+
+def needs_rehash(stored):
+    hasher = _hasher_for(stored or '')
+    return hasher is not current_hasher() or hasher.needs_rehash(stored)
+
+# Rehashing is CPU bound but bcrypt releases the GIL, so a few worker threads
+# take it off the login request without blocking other requests
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=current_app.config.get('PASSWORD_HASH_WORKERS', 2),
+                                           thread_name_prefix='password-hash')
+        return _executor
+
+# Nobody waits on the future, so failures are logged here; the old hash keeps working and the next login retries
+def _rehash(app, user_id, old_hash, password):
+    with app.app_context():
+        try:
+            new_hash = hash_password(password)
+            # only replace the hash we checked, in case the password changed meanwhile
+            updated = User.query.filter_by(id=user_id, password=old_hash) \
+                .update({'password': new_hash}, synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            app.logger.exception(f"Rehashing the password of User {user_id} failed")
+            return False
+    if updated:
+        logger.info(f"Rehashed password for User {user_id} with the current policy")
+    return bool(updated)
+
+# Rehashes a user's password after a successful login if the stored hash is out of date.
+# Returns the background future, or None if nothing needed doing.
+def rehash_if_needed(user, password):
+    if not needs_rehash(user.password):
+        return None
+    return _get_executor().submit(_rehash, current_app._get_current_object(), user.id, user.password, password)
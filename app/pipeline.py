@@ -0,0 +1,197 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import threading
+import time
+
+# Streaming pipelines
+# A pipeline is a chain of stages, each one a generator over the output of the
+# stage before it, so items flow through one at a time instead of every stage
+# finishing before the next starts. Serial stages run on the thread consuming
+# the pipeline (the only one allowed to use the database session). Concurrent
+# stages hand items to a thread pool, and take a new item from upstream only
+# while fewer than queue_size are queued, running or waiting to be consumed.
+# That bound is the backpressure: a slow stage holds back the stages before it
+# instead of letting work pile up in memory.
+#
+# Between stages, a concurrent stage that has nothing finished yet passes an idle
+# marker down instead of blocking on its workers. A concurrent stage further down
+# takes the marker as "nothing to pull for now" and goes back to collecting its own
+# results, so a slow item upstream (one feed that takes a minute to poll) never
+# holds up work already queued downstream. Markers never leave the pipeline:
+# iterating a stage from outside skips them.
+
+POLL_INTERVAL = 0.05  # seconds a concurrent stage waits on its workers before looking upstream again
+
+_IDLE = object()
+
+# What a stage returns: iterating it gives the stage's outputs
+class Stage:
+    def __init__(self, items):
+        self._items = items
+
+    def __iter__(self):
+        return (item for item in self._items if item is not _IDLE)
+
+# The items a stage reads from its source, idle markers included when the source is another stage
+def _upstream(source):
+    return source._items if isinstance(source, Stage) else iter(source)
+
+class StageMetrics:
+    def __init__(self, name):
+        self.name = name
+        self.items_in = 0
+        self.items_out = 0
+        self.errors = 0
+        self.busy = 0.0  # total seconds spent on items
+        self.max_latency = 0.0
+        self.max_queued = 0
+        self.started = None  # first item in
+        self.finished = None  # last item done
+        self._lock = threading.Lock()
+
+    def received(self):
+        with self._lock:
+            self.items_in += 1
+            if self.started is None:
+                self.started = time.perf_counter()
+
+    def queued(self, size):
+        with self._lock:
+            self.max_queued = max(self.max_queued, size)
+
+    def record(self, latency, outputs=1, error=False):
+        with self._lock:
+            self.items_out += outputs
+            self.errors += bool(error)
+            self.busy += latency
+            self.max_latency = max(self.max_latency, latency)
+            self.finished = time.perf_counter()
+
+    def as_dict(self):
+        elapsed = (self.finished - self.started) if self.started and self.finished else 0.0
+        return {
+            'in': self.items_in,
+            'out': self.items_out,
+            'errors': self.errors,
+            'throughput': self.items_out / elapsed if elapsed else 0.0,  # items out per second
+            'avg_latency': self.busy / self.items_in if self.items_in else 0.0,
+            'max_latency': self.max_latency,
+            'max_queued': self.max_queued,
+        }
+
+    def __str__(self):
+        m = self.as_dict()
+        return (f"{self.name}: {m['in']} in, {m['out']} out, {m['errors']} errors, {m['throughput']:.1f}/s, "
+                f"latency avg {m['avg_latency'] * 1000:.0f} ms / max {m['max_latency'] * 1000:.0f} ms")
+
+class Pipeline:
+    def __init__(self):
+        self.metrics = OrderedDict()  # stage name -> StageMetrics, in pipeline order
+
+    def _stage_metrics(self, name):
+        metrics = StageMetrics(name)
+        self.metrics[name] = metrics
+        return metrics
+
+    # func(item) returns an iterable of outputs: empty to drop the item, several to fan out.
+    # If func raises, on_error(item, exc) supplies the outputs instead; without it the error propagates.
+    def serial(self, name, source, func, on_error=None):
+        return Stage(self._serial(self._stage_metrics(name), source, func, on_error))
+
+    def _serial(self, metrics, source, func, on_error):
+        for item in _upstream(source):
+            if item is _IDLE:
+                yield item
+                continue
+            metrics.received()
+            start = time.perf_counter()
+            try:
+                # collected before yielding, so latency doesn't include the stages downstream
+                outputs = list(func(item))
+                error = False
+            except Exception as e:
+                if on_error is None:
+                    raise
+                outputs = list(on_error(item, e))
+                error = True
+            metrics.record(time.perf_counter() - start, len(outputs), error)
+            yield from outputs
+
+    # func(item) runs on a pool of workers and returns the item's single output; outputs
+    # come back in completion order. An item that raises, or runs longer than timeout
+    # seconds (a TimeoutError), is passed to on_error(item, exc) for its outputs.
+    def concurrent(self, name, source, func, workers, queue_size=None, timeout=None, on_error=None):
+        # stages are registered when declared, so metrics come out in pipeline order
+        return Stage(self._concurrent(self._stage_metrics(name), source, func, workers,
+                                      queue_size or workers * 2, timeout, on_error))
+
+    def _concurrent(self, metrics, source, func, workers, queue_size, timeout, on_error):
+        name = metrics.name
+        started = {}  # item key -> time a worker picked it up
+
+        def work(key, item):
+            started[key] = time.monotonic()
+            start = time.perf_counter()
+            return func(item), time.perf_counter() - start
+
+        def failed(item, e, latency):
+            if on_error is None:
+                metrics.record(latency, 0, error=True)
+                raise e
+            outputs = list(on_error(item, e))
+            metrics.record(latency, len(outputs), error=True)
+            return outputs
+
+        source = _upstream(source)
+        exhausted = False
+        pending = {}
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'pipeline-{name}')
+        try:
+            while True:
+                # take more work only while the queue has room and upstream has something ready
+                while not exhausted and len(pending) < queue_size:
+                    try:
+                        item = next(source)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    if item is _IDLE:
+                        break
+                    metrics.received()
+                    key = metrics.items_in
+                    pending[executor.submit(work, key, item)] = (key, item)
+                metrics.queued(len(pending))
+                if not pending:
+                    if exhausted:
+                        break
+                    # upstream is still busy; let the stages below carry on meanwhile
+                    yield _IDLE
+                    continue
+
+                done, _ = wait(pending, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                if not done:
+                    yield _IDLE
+                for future in done:
+                    key, item = pending.pop(future)
+                    try:
+                        output, latency = future.result()
+                    except Exception as e:
+                        yield from failed(item, e, time.monotonic() - started.get(key, time.monotonic()))
+                        continue
+                    metrics.record(latency)
+                    yield output
+
+                # give up on items that have been running for too long
+                if timeout:
+                    now = time.monotonic()
+                    for future, (key, item) in list(pending.items()):
+                        if key in started and now - started[key] > timeout:
+                            del pending[future]
+                            future.cancel()
+                            yield from failed(item, TimeoutError(f'{name} took longer than {timeout}s'), timeout)
+        finally:
+            # don't wait on abandoned work; it is bounded by its own timeouts
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def report(self):
+        return {name: metrics.as_dict() for name, metrics in self.metrics.items()}
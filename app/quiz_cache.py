@@ -0,0 +1,88 @@
+from app import db
+from app.models import QuizCache
+from datetime import datetime, timedelta
+from flask import current_app
+import hashlib
+import logging
+import threading
+
+# Persistent cache of generated quiz questions
+# Entries are keyed by a hash of the model, the prompt version and the
+# whitespace-normalized article text, so re-ingested or syndicated copies of an
+# article reuse the validated questions instead of paying for a new completion.
+
+logger = logging.getLogger(__name__)
+
+# process-wide counters, see quiz_cache_stats()
+_stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+_stats_lock = threading.Lock()
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+def quiz_cache_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+# Collapses whitespace so formatting-only differences map to the same key
+def normalize_content(content):
+    return ' '.join(content.split())
+
+def quiz_cache_key(model, prompt_version, content):
+    digest = hashlib.sha256(f'{model}\0{prompt_version}\0'.encode('utf-8'))
+    digest.update(normalize_content(content).encode('utf-8'))
+    return digest.hexdigest()
+
+def _max_age():
+    return timedelta(days=current_app.config.get('QUIZ_CACHE_MAX_AGE_DAYS', 90))
+
+# Returns the cached questions JSON for key, or None on a miss.
+# Records the hit on the entry; the caller commits.
+def get_cached_questions(key):
+    entry = db.session.get(QuizCache, key)
+    now = datetime.utcnow()
+
+    # expired entries count as misses and are removed by prune_quiz_cache()
+    if not entry or entry.created_at < now - _max_age():
+        _count('misses')
+        return None
+
+    entry.hits += 1
+    entry.last_used_at = now
+    _count('hits')
+    return entry.questions
+
+# Adds or replaces the cached questions for key; the caller commits
+def store_questions(key, model, questions):
+    now = datetime.utcnow()
+    entry = db.session.get(QuizCache, key)
+    if entry:
+        entry.questions = questions
+        entry.created_at = now
+        entry.last_used_at = now
+    else:
+        db.session.add(QuizCache(key=key, model=model, questions=questions,
+                                 created_at=now, last_used_at=now))
+    _count('stores')
+
+# Evicts entries older than QUIZ_CACHE_MAX_AGE_DAYS, then the least recently
+# used ones beyond QUIZ_CACHE_MAX_ENTRIES. Returns the number of rows removed.
+def prune_quiz_cache():
+    max_entries = current_app.config.get('QUIZ_CACHE_MAX_ENTRIES', 5000)
+    cutoff = datetime.utcnow() - _max_age()
+
+    evicted = QuizCache.query.filter(QuizCache.created_at < cutoff).delete(synchronize_session=False)
+
+    # last_used_at of the newest entry that no longer fits
+    overflow_from = db.session.query(QuizCache.last_used_at) \
+        .order_by(QuizCache.last_used_at.desc()).offset(max_entries).limit(1).scalar()
+    if overflow_from is not None:
+        evicted += QuizCache.query.filter(QuizCache.last_used_at <= overflow_from) \
+            .delete(synchronize_session=False)
+
+    db.session.commit()
+    if evicted:
+        _count('evictions', evicted)
+        logger.info(f"Evicted {evicted} quiz cache entries")
+    return evicted
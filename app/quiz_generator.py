@@ -3,7 +3,12 @@ import os
 import json
 from app.models import Quiz, Article
 from app import db
+from app.quiz_cache import quiz_cache_key, get_cached_questions, store_questions
+from app.answer_keys import invalidate_answer_key
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
 import logging
+import threading
 import time
 
 # Configure logging
@@ -12,6 +17,11 @@ logger = logging.getLogger(__name__)
 
 openai.api_key = os.getenv('OPENAI_API_KEY')
 
+# Model used for quiz generation. Bump PROMPT_VERSION whenever the prompt changes
+# so cached quizzes from the old prompt are no longer reused.
+QUIZ_MODEL = "gpt-4o"
+PROMPT_VERSION = 1
+
 def clean_quiz_text(quiz_text):
     # Removes code fencing and extra characters from the quiz_text.
     # Remove code fencing if present
@@ -24,13 +34,21 @@ def clean_quiz_text(quiz_text):
     # Strip leading/trailing whitespace
     return quiz_text.strip()
 
-def generate_quiz(article_id, retries=3, delay=5):
+def generate_quiz(article_id, retries=3, delay=5, use_cache=True):
     # Retrieve the article from the database
     article = Article.query.get(article_id)
     if not article:
         logger.error(f"Article ID {article_id} not found.")
         return None  # Or handle the error as needed
 
+    # Reuse questions already generated for an identical article body
+    cache_key = quiz_cache_key(QUIZ_MODEL, PROMPT_VERSION, article.content)
+    if use_cache:
+        cached_questions = get_cached_questions(cache_key)
+        if cached_questions:
+            logger.info(f"Quiz cache hit for Article ID {article_id}")
+            return Quiz(article_id=article.id, questions=cached_questions)
+
     # Design the prompt
     prompt = f"""
     You are an AI that generates quizzes based strictly on the provided article. 
@@ -61,7 +79,7 @@ def generate_quiz(article_id, retries=3, delay=5):
     for attempt in range(retries):
         try:
             response = openai.ChatCompletion.create(
-            model="gpt-4o",
+            model=QUIZ_MODEL,
             messages=[
                 {"role": "system", "content": "You are a helpful assistant that generates strictly formatted quizzes. You must randomize the potiion of the correct answer in the options, it should never be always the first."},
                 {"role": "user", "content": prompt}
@@ -93,10 +111,12 @@ def generate_quiz(article_id, retries=3, delay=5):
                     logger.error(f"Quiz options not valid for Article ID {article_id}: {q}")
                     return None
 
-            # Create a new Quiz object but DO NOT commit here
+            # Cache the validated questions alongside the new Quiz object, but DO NOT commit here
+            questions_json = json.dumps(quiz_questions)
+            store_questions(cache_key, QUIZ_MODEL, questions_json)
             quiz = Quiz(
                 article_id=article.id,
-                questions=json.dumps(quiz_questions)
+                questions=questions_json
             )
 
             logger.info(f"Successfully generated quiz object for Article ID {article_id}")
@@ -114,4 +134,73 @@ def generate_quiz(article_id, retries=3, delay=5):
         except Exception as e:
             logger.error(f"Error generating quiz for Article ID {article_id}: {e}")
             db.session.rollback()  # Rollback if something failed
-            return None
\ No newline at end of file
+            return None
+
+# Single-flight quiz generation
+# Only one generation per article runs at a time in this process; concurrent callers
+# wait for it and reuse its result. The unique index on quiz.article_id covers
+# callers in other processes.
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.quiz_id = None
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+# regenerate replaces an existing quiz, with cached questions for the article's body if there are any;
+# force also skips the cache so the model is really asked again. Both are for operators, not readers.
+def ensure_quiz(article_id, regenerate=False, retries=3, force=False):
+    # join the in-flight generation for this article, or become its leader
+    with _flights_lock:
+        flight = _flights.get(article_id)
+        leader = flight is None
+        if leader:
+            flight = _flights[article_id] = _Flight()
+
+    if leader:
+        try:
+            flight.quiz_id = _create_or_update_quiz(article_id, regenerate, retries, force)
+        finally:
+            with _flights_lock:
+                del _flights[article_id]
+            flight.done.set()
+    else:
+        logger.info(f"Article ID {article_id}: waiting on quiz generation already in progress")
+        flight.done.wait()
+
+    # load the result into the caller's own session
+    return db.session.get(Quiz, flight.quiz_id) if flight.quiz_id else None
+
+# Returns the ID of the article's quiz, generating (or regenerating) it if needed
+def _create_or_update_quiz(article_id, regenerate, retries, force):
+    quiz = Quiz.query.filter_by(article_id=article_id).first()
+    if quiz and not regenerate:
+        return quiz.id
+
+    generated_quiz = generate_quiz(article_id, retries=retries, use_cache=not force)
+    if not generated_quiz:
+        return None
+    if quiz and generated_quiz.questions == quiz.questions:
+        # same questions as before (a cache hit for an unchanged body); keep the version so attempts still show
+        return quiz.id
+
+    if quiz:
+        # regenerate in place so user attempts keep pointing at the same quiz
+        quiz.questions = generated_quiz.questions
+        quiz.date_generated = datetime.utcnow()
+    else:
+        quiz = generated_quiz
+        db.session.add(quiz)
+
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # another process stored a quiz for this article first, use theirs
+        db.session.rollback()
+        logger.info(f"Article ID {article_id}: quiz already created elsewhere, reusing it")
+        quiz = Quiz.query.filter_by(article_id=article_id).first()
+    if quiz and regenerate:
+        # the version check would catch it too, but don't keep the stale key around
+        invalidate_answer_key(quiz.id)
+    return quiz.id if quiz else None
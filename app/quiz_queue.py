@@ -0,0 +1,161 @@
+from app import db
+from app.models import Quiz, QuizJob
+from app.quiz_cache import prune_quiz_cache
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import and_, or_, update
+from sqlalchemy.exc import IntegrityError
+import click
+import logging
+
+# Background quiz generation queue
+# Jobs live in the quiz_job table so they survive restarts and can be claimed
+# safely by more than one process. Articles are queued as soon as they are
+# ingested and the scheduler works through the queue, keeping LLM calls off
+# the request path.
+
+logger = logging.getLogger(__name__)
+
+# Adds a pending job for every article that has neither a job nor a quiz yet.
+# Returns the number of jobs added; the caller commits.
+def enqueue_quiz_jobs(article_ids):
+    article_ids = set(article_ids)
+    if not article_ids:
+        return 0
+
+    queued = {article_id for (article_id,) in
+              db.session.query(QuizJob.article_id).filter(QuizJob.article_id.in_(article_ids))}
+    have_quiz = {article_id for (article_id,) in
+                 db.session.query(Quiz.article_id).filter(Quiz.article_id.in_(article_ids))}
+
+    new_ids = sorted(article_ids - queued - have_quiz)
+    for article_id in new_ids:
+        db.session.add(QuizJob(article_id=article_id))
+    return len(new_ids)
+
+# Makes sure a quiz is on its way for an article that has none.
+# Returns True while generation is pending, False if it has permanently failed.
+def request_quiz(article_id):
+    job = QuizJob.query.filter_by(article_id=article_id).first()
+
+    if not job:
+        db.session.add(QuizJob(article_id=article_id))
+    elif job.status == 'done':
+        # job finished but the quiz is gone (e.g. deleted), queue it again
+        job.status = 'pending'
+        job.attempts = 0
+        job.next_attempt_at = datetime.utcnow()
+    else:
+        return job.status in ('pending', 'running')
+
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # another request queued it first
+        db.session.rollback()
+    return True
+
+# Marks due jobs as running so no other worker picks them up. Jobs stuck in
+# 'running' for longer than QUIZ_QUEUE_STALE_SECONDS (crashed worker) are reclaimed.
+def claim_quiz_jobs(limit):
+    now = datetime.utcnow()
+    stale_before = now - timedelta(seconds=current_app.config.get('QUIZ_QUEUE_STALE_SECONDS', 600))
+    claimable = or_(
+        and_(QuizJob.status == 'pending', QuizJob.next_attempt_at <= now),
+        and_(QuizJob.status == 'running', QuizJob.updated_at < stale_before)
+    )
+
+    candidates = db.session.query(QuizJob.id).filter(claimable) \
+        .order_by(QuizJob.next_attempt_at).limit(limit).all()
+
+    claimed = []
+    for (job_id,) in candidates:
+        # conditional update: only one worker can flip a given job to running
+        result = db.session.execute(
+            update(QuizJob).where(QuizJob.id == job_id, claimable)
+            .values(status='running', updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            claimed.append(job_id)
+    db.session.commit()
+    return claimed
+
+# Generates the quiz for one claimed job and records the outcome.
+# Failed attempts are retried with exponential backoff up to QUIZ_QUEUE_MAX_ATTEMPTS.
+def run_quiz_job(job_id):
+    # loaded here so that web processes, which only queue jobs, never import the LLM client
+    from app.quiz_generator import ensure_quiz
+
+    job = db.session.get(QuizJob, job_id)
+    article_id = job.article_id
+
+    try:
+        # single attempt here, retries are scheduled by the queue instead of sleeping
+        if ensure_quiz(article_id, retries=1) is None:
+            raise RuntimeError('quiz generation failed')
+
+        job = db.session.get(QuizJob, job_id)
+        job.status = 'done'
+        job.last_error = None
+        db.session.commit()
+        logger.info(f"Quiz job {job_id}: generated quiz for Article ID {article_id}")
+        return True
+
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(QuizJob, job_id)
+        job.attempts += 1
+        job.last_error = str(e)
+
+        max_attempts = current_app.config.get('QUIZ_QUEUE_MAX_ATTEMPTS', 5)
+        if job.attempts >= max_attempts:
+            job.status = 'failed'
+            logger.error(f"Quiz job {job_id}: giving up on Article ID {article_id} after {job.attempts} attempts: {e}")
+        else:
+            backoff = current_app.config.get('QUIZ_QUEUE_BACKOFF_SECONDS', 30) * 2 ** (job.attempts - 1)
+            job.status = 'pending'
+            job.next_attempt_at = datetime.utcnow() + timedelta(seconds=backoff)
+            logger.warning(f"Quiz job {job_id}: attempt {job.attempts} failed for Article ID {article_id}, "
+                           f"retrying in {backoff}s: {e}")
+        db.session.commit()
+        return False
+
+# Works through due jobs on a bounded thread pool (QUIZ_QUEUE_MAX_WORKERS)
+def process_quiz_jobs(limit=None):
+    app = current_app._get_current_object()
+    if limit is None:
+        limit = app.config.get('QUIZ_QUEUE_BATCH_SIZE', 20)
+
+    job_ids = claim_quiz_jobs(limit)
+    if not job_ids:
+        return {'done': 0, 'failed': 0}
+
+    # each worker thread needs its own app context (and so its own DB session)
+    def work(job_id):
+        with app.app_context():
+            return run_quiz_job(job_id)
+
+    max_workers = app.config.get('QUIZ_QUEUE_MAX_WORKERS', 2)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='quiz-queue') as executor:
+        results = list(executor.map(work, job_ids))
+
+    done = sum(results)
+    logger.info(f"Processed {len(results)} quiz jobs: {done} done, {len(results) - done} failed")
+
+    # keep the quiz cache within its size/age limits as new entries come in
+    if done:
+        prune_quiz_cache()
+    return {'done': done, 'failed': len(results) - done}
+
+@click.command('regenerate-quiz')
+@click.argument('article_id', type=int)
+@click.option('--force', is_flag=True, help="Ask the model again even if questions for the article's body are cached.")
+@with_appcontext
+def regenerate_quiz(article_id, force):
+    """Replace an article's quiz with newly generated questions."""
+    from app.quiz_generator import ensure_quiz
+    quiz = ensure_quiz(article_id, regenerate=True, force=force)
+    click.echo(f"Regenerated quiz {quiz.id}" if quiz else "Quiz generation failed")
@@ -1,30 +1,48 @@
 from datetime import datetime, timezone
 import json
+import re
 import logging  # Import the standard logging module
-from flask import render_template, jsonify, abort, redirect, url_for, flash, request
-from app import app, db, bcrypt
+from flask import Blueprint, current_app, render_template, jsonify, abort, redirect, url_for, flash, request, make_response, send_from_directory
+from app import db
 from app.forms import RegistrationForm, LoginForm
 from app.models import User, Article, Quiz, Comment, UserQuiz  # Updated import
-from app.quiz_generator import generate_quiz
-from app.helpers import user_has_passed_quiz, user_has_attempted_quiz
+from app.quiz_queue import request_quiz
+from app.passwords import hash_password, verify_password, rehash_if_needed
+from app.answer_keys import get_answer_key, score_responses, build_feedback, encode_results, stored_feedback, results_outdated
+from app.helpers import user_has_passed_quiz, quiz_access, quiz_access_batch, forget_quiz_access
+from app.search import search_articles
+from app.page_cache import cached_listing
+from app.thumbnails import thumbnail_dir, thumbnail_filename, FORMATS as THUMBNAIL_FORMATS
+from app.pagination import article_keyset_page, article_count, comment_keyset_page
 from flask_login import login_user, current_user, logout_user, login_required
+from sqlalchemy.orm import undefer
 
 # Initialize logger
 logger = logging.getLogger('app')
 
-@app.route('/')
-@app.route('/home')
+# content keys of card thumbnails (SHA-256 hex)
+THUMBNAIL_KEY = re.compile(r'[0-9a-f]{64}')
+
+# Every page of the site; registered on the app by create_app
+main = Blueprint('main', __name__)
+
+@main.app_context_processor
+def utility_processor():
+    return dict(user_has_passed_quiz=user_has_passed_quiz, quiz_access=quiz_access)
+
+@main.route('/')
+@main.route('/home')
 def home():
     return render_template('index.html')
 
 ################################################
 #   User Authentication Flow
 ################################################
-@app.route('/register', methods=['GET', 'POST'])
+@main.route('/register', methods=['GET', 'POST'])
 def register():
     # redirect user if already logged in
     if current_user.is_authenticated:
-        return redirect(url_for('home'))
+        return redirect(url_for('main.home'))
     
     # initialize registration form
     form = RegistrationForm()
@@ -32,7 +50,7 @@ def register():
     # if form is submitted and valid, hash password and add to db
     if form.validate_on_submit():
         # hash password 
-        hashed_password = bcrypt.generate_password_hash(form.password.data).decode('utf-8')
+        hashed_password = hash_password(form.password.data)
 
         # create user, add to database, and commit change to database
         user = User(username=form.username.data, email=form.email.data, password=hashed_password)
@@ -41,15 +59,15 @@ def register():
 
         # success message and redirect
         flash('Your account has been created! You may now login.', 'success')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     return render_template('register.html', title='Register', form=form)
 
-@app.route('/login', methods=['GET', 'POST'])
+@main.route('/login', methods=['GET', 'POST'])
 def login():
     # redirect user if already logged in
     if current_user.is_authenticated:
-        return redirect(url_for('home'))
+        return redirect(url_for('main.home'))
     
     # initialize login form
     form = LoginForm()
@@ -60,115 +78,161 @@ def login():
         user = User.query.filter_by(email=form.email.data).first()
 
         # if user with provided email exists AND password matches
-        if user and bcrypt.check_password_hash(user.password, form.password.data):
+        if user and verify_password(user.password, form.password.data):
             # logs in user
             login_user(user, remember=form.remember.data)
 
+            # upgrades the stored hash in the background if the hashing policy changed
+            rehash_if_needed(user, form.password.data)
+
             # flask success
             flash('Login successful', 'success')
 
             # redirects user to where they wanted to go
             next_page = request.args.get('next')
-            return redirect(next_page) if next_page else redirect(url_for('articles'))
+            return redirect(next_page) if next_page else redirect(url_for('main.articles'))
         else:
             flash('Login unsuccessful. Please check email and password.', 'danger')
     return render_template('login.html', title="Login", form=form)
 
-@app.route('/logout')
+@main.route('/logout')
 def logout():
     logout_user()
     flash('You have been logged out.', 'info')
-    return redirect(url_for('home'))
+    return redirect(url_for('main.home'))
 
 ################################################
 #   Articles
 ################################################
-@app.route('/articles')
+@main.route('/articles')
 def articles():
+    # anonymous listing pages are served from the page cache until new articles arrive
+    return cached_listing(render_articles)
+
+def render_articles():
+    # cursor pagination when asked for (?after=...), configured, or once the archive is too big for numbered pages
+    after = request.args.get('after')
+    mode = current_app.config.get('ARTICLES_PAGINATION', 'auto')
+    total = article_count()
+    if after is not None or mode == 'cursor' or (mode == 'auto' and total > current_app.config.get('ARTICLES_NUMBERED_MAX', 1200)):
+        articles = article_keyset_page(after, per_page=12)
+        return render_template('articles.html', articles=articles, cursor_pagination=True,
+                               quiz_states=listing_quiz_states(articles.items))
+
     # grabs page parameter, default = 1 if none is provided
     page = request.args.get('page', 1, type=int)
-    articles = Article.query.order_by(Article.date_posted.desc()).paginate(page=page, per_page=12)
-    return render_template('articles.html', articles=articles)
-
-@app.route('/article/<int:article_id>', methods=['GET'])
+    # only the card columns; article bodies are never loaded for the listing.
+    # the page count comes from the cached total rather than a COUNT(*) per request
+    articles = Article.card_query().order_by(Article.date_posted.desc(), Article.id.desc()) \
+        .paginate(page=page, per_page=12, count=False)
+    articles.total = total
+    return render_template('articles.html', articles=articles, cursor_pagination=False,
+                           quiz_states=listing_quiz_states(articles.items))
+
+@main.route('/search')
+def search():
+    # ranked full-text search over the archive, ?q=terms&page=N
+    query = request.args.get('q', '').strip()
+    page = request.args.get('page', 1, type=int)
+    results = search_articles(query, page=page, per_page=current_app.config.get('SEARCH_PER_PAGE', 10))
+    return render_template('search.html', query=query, results=results)
+
+@main.route('/thumbnails/<key>.<fmt>')
+def thumbnail(key, fmt):
+    # thumbnails are named by content, so a URL always serves the same bytes
+    if not THUMBNAIL_KEY.fullmatch(key) or fmt not in THUMBNAIL_FORMATS:
+        abort(404)
+    response = send_from_directory(thumbnail_dir(), thumbnail_filename(key, fmt), max_age=31536000)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+# Quiz badges for a page of article cards, fetched in one query
+def listing_quiz_states(articles):
+    if not current_user.is_authenticated:
+        return {}
+    return quiz_access_batch(current_user.id, [article.id for article in articles])
+
+@main.route('/article/<int:article_id>', methods=['GET'])
 @login_required
 def article(article_id):
-    # Retrieve the article
-    article = Article.query.get_or_404(article_id)
+    # Retrieve the article with its pre-rendered body (deferred everywhere else)
+    article = Article.query.options(undefer(Article.content_html)).get_or_404(article_id)
     
-    # Retrieve the associated quiz
-    quiz = Quiz.query.filter_by(article_id=article_id).first()
-    
-    generated_quiz = None
+    # The user's standing on the article's quiz, in one query shared with the templates
+    access = quiz_access(current_user.id, article_id)
+    quiz = access if access.quiz_id else None
+
+    # quizzes are generated in the background; make sure this one is queued and render right away
+    quiz_pending = False
     if not quiz:
-        logger.info(f"Article ID {article_id}: No quiz found. Generating quiz...")
-        generated_quiz = generate_quiz(article_id)
-        if generated_quiz:
-            db.session.add(generated_quiz)
-            try:
-                db.session.commit()
-                quiz = generated_quiz
-            except Exception as e:
-                db.session.rollback()
-                logger.error(f"Could not commit new quiz for Article {article_id}: {e}")
-                return render_template('article.html', article=article, quiz=None, quiz_attempted=False, quiz_passed=False, saved_score=None, saved_feedback=[])
-        else:
-            # If generated_quiz is None, we failed to create a quiz
-            logger.error(f"Article ID {article_id}: Failed to generate quiz.")
-            return render_template('article.html', article=article, quiz=None, quiz_attempted=False, quiz_passed=False, saved_score=None, saved_feedback=[])
-    
+        quiz_pending = request_quiz(article_id)
+        logger.info(f"Article ID {article_id}: No quiz found. Quiz pending: {quiz_pending}")
+
     quiz_questions = None
-    quiz_attempted = False
-    quiz_passed = False
+    quiz_attempted = access.attempted
+    quiz_passed = access.passed
     saved_score = None
     saved_feedback = []
+    quiz_updated = False
 
-    user_quiz_entry = None
     if quiz:
-        # creates UserQuiz object
-        user_quiz_entry = UserQuiz.query.filter_by(
-            user_id=current_user.id,
-            quiz_id=quiz.id
-        ).first()
-
-        quiz_attempted = user_quiz_entry.attempted if user_quiz_entry else False
-        quiz_passed = user_quiz_entry.passed if user_quiz_entry else False
-
-        # If user_quiz_entry has results saved
-        if user_quiz_entry and user_quiz_entry.results_json:
-            try:
-                saved_feedback = json.loads(user_quiz_entry.results_json)
-            except json.JSONDecodeError:
-                saved_feedback = []
-            saved_score = user_quiz_entry.score
+        # If the user has attempted the quiz, load their saved results
+        if quiz_attempted:
+            results_json = db.session.query(UserQuiz.results_json).filter_by(
+                user_id=current_user.id,
+                quiz_id=access.quiz_id
+            ).scalar()
+            if results_json:
+                try:
+                    key = get_answer_key(article_id)
+                except ValueError as e:
+                    logger.error(f"Article ID {article_id}: Invalid JSON in quiz.questions - {e}")
+                    key = None
+                # answers to a quiz that has since been regenerated don't match its questions
+                quiz_updated = results_outdated(key, results_json)
+                saved_feedback = stored_feedback(key, results_json)
+                saved_score = access.score
 
         # If user hasn't attempted or passed yet, show quiz questions
         if not quiz_attempted and not quiz_passed:
+            questions = db.session.query(Quiz.questions).filter_by(id=access.quiz_id).scalar()
             try:
-                quiz_questions = json.loads(quiz.questions)
+                quiz_questions = json.loads(questions)
                 logger.info(f"Article ID {article_id}: Parsed quiz_questions successfully.")
-            except json.JSONDecodeError as e:
+            except (TypeError, json.JSONDecodeError) as e:
                 logger.error(f"Article ID {article_id}: Invalid JSON in quiz.questions - {e}")
                 quiz_questions = None
 
+    # first page of comments (authors loaded with them), only shown once the quiz is passed
+    comments = None
+    if quiz_passed:
+        comments = comment_keyset_page(article_id, per_page=current_app.config.get('COMMENTS_PER_PAGE', 20))
+
     # Render the template with the parsed quiz_questions and saved results
     return render_template('article.html', 
                            article=article, 
+                           comments=comments, 
                            quiz=quiz, 
                            quiz_questions=quiz_questions, 
                            quiz_attempted=quiz_attempted, 
                            quiz_passed=quiz_passed,
+                           quiz_pending=quiz_pending,
                            saved_score=saved_score,
-                           saved_feedback=saved_feedback)
+                           saved_feedback=saved_feedback,
+                           quiz_updated=quiz_updated)
 
 ################################################
 #   Quiz Generation / Submission
 ################################################
-@app.route('/generate_quiz/<int:article_id>', methods=['POST'])
+@main.route('/generate_quiz/<int:article_id>', methods=['POST'])
 @login_required
 def generate_quiz_route(article_id):
-    # generate quiz
-    quiz = generate_quiz(article_id)
+    # the LLM client is only loaded by processes that generate quizzes
+    from app.quiz_generator import ensure_quiz
+
+    # generate the quiz if the article has none yet; concurrent requests for the same article share one generation.
+    # Regenerating an existing quiz is left to operators (flask regenerate-quiz)
+    quiz = ensure_quiz(article_id)
 
     # successful generation
     if quiz:
@@ -184,7 +248,7 @@ def generate_quiz_route(article_id):
             'message': 'Quiz generation failed'
         }), 500
     
-@app.route('/submit_quiz', methods=['POST'])
+@main.route('/submit_quiz', methods=['POST'])
 @login_required
 def submit_quiz():
     # grabs data sent to backend
@@ -197,38 +261,20 @@ def submit_quiz():
         logger.error("Invalid data received: Missing article_id or responses.")
         return jsonify({'status': 'failure', 'message': 'Invalid data.'}), 200
 
-    # Retrieve the quiz for the article
-    quiz = Quiz.query.filter_by(article_id=article_id).first()
-    if not quiz:
-        logger.error(f"No quiz found for Article ID {article_id}.")
-        return jsonify({'status': 'failure', 'message': 'Quiz not found.'}), 200
-
+    # Retrieve the cached answer key for the article's quiz
     try:
-        # Parse the quiz questions into a list
-        quiz_questions = json.loads(quiz.questions)
-    except json.JSONDecodeError as e:
+        key = get_answer_key(article_id)
+    except ValueError as e:
         logger.error(f"Invalid JSON in quiz.questions for Article ID {article_id}: {e}")
         return jsonify({'status': 'failure', 'message': 'Quiz data corrupted.'}), 200
-
-    # initialize scoring variables
-    score = 0
-    total = len(quiz_questions)
-    feedback = []
+    if not key:
+        logger.error(f"No quiz found for Article ID {article_id}.")
+        return jsonify({'status': 'failure', 'message': 'Quiz not found.'}), 200
 
     # score quiz results
-    for i, question in enumerate(quiz_questions):
-        q_text = question.get('question')
-        correct_answer = question.get('correct_answer')
-        user_answer = responses.get(f'question_{i}')
-        is_correct = user_answer == correct_answer
-        if is_correct:
-            score += 1
-        feedback.append({
-            'question': q_text,
-            'your_answer': user_answer,
-            'correct_answer': correct_answer,
-            'is_correct': is_correct
-        })
+    score, chosen, results = score_responses(key, responses)
+    total = len(key.correct)
+    feedback = build_feedback(key, chosen, results)
 
     # Determine if the user passed
     passing_score = 5 
@@ -238,28 +284,29 @@ def submit_quiz():
     # Update the user_quiz table using UserQuiz model
     user_quiz_entry = UserQuiz.query.filter_by(
         user_id=current_user.id,
-        quiz_id=quiz.id
+        quiz_id=key.quiz_id
     ).first()
 
     if user_quiz_entry:
         user_quiz_entry.passed = passed
         user_quiz_entry.attempted = True
         user_quiz_entry.score = score
-        user_quiz_entry.results_json = json.dumps(feedback)  # Store feedback as JSON
-        logger.info(f"Updated UserQuiz entry for User ID {current_user.id} and Quiz ID {quiz.id} to Passed: {passed}, Score: {score}")
+        user_quiz_entry.results_json = encode_results(chosen, results, key.version)  # feedback is rebuilt from the quiz
+        logger.info(f"Updated UserQuiz entry for User ID {current_user.id} and Quiz ID {key.quiz_id} to Passed: {passed}, Score: {score}")
     else:
         user_quiz_entry = UserQuiz(
             user_id=current_user.id,
-            quiz_id=quiz.id,
+            quiz_id=key.quiz_id,
             attempted=True,
             passed=passed,
             score=score,
-            results_json=json.dumps(feedback)
+            results_json=encode_results(chosen, results, key.version)
         )
         db.session.add(user_quiz_entry)
-        logger.info(f"Created new UserQuiz entry for User ID {current_user.id} and Quiz ID {quiz.id} with Passed: {passed}, Score: {score}")
+        logger.info(f"Created new UserQuiz entry for User ID {current_user.id} and Quiz ID {key.quiz_id} with Passed: {passed}, Score: {score}")
 
     db.session.commit()
+    forget_quiz_access(current_user.id, int(article_id))
 
     status = 'success' if passed else 'failure'
     message = 'Quiz passed.' if passed else 'Quiz not passed.'
@@ -275,7 +322,21 @@ def submit_quiz():
 ################################################
 #   Commenting
 ################################################
-@app.route('/article/<int:article_id>/comment', methods=['POST'])
+@main.route('/article/<int:article_id>/comments', methods=['GET'])
+@login_required
+def article_comments(article_id):
+    # "load more": the next page of comments as an HTML fragment
+    if not user_has_passed_quiz(current_user.id, article_id):
+        abort(403)
+
+    comments = comment_keyset_page(article_id, request.args.get('after'),
+                                   per_page=current_app.config.get('COMMENTS_PER_PAGE', 20))
+    response = make_response(render_template('_comments.html', comments=comments))
+    if comments.next_cursor:
+        response.headers['X-Next-Cursor'] = comments.next_cursor
+    return response
+
+@main.route('/article/<int:article_id>/comment', methods=['POST'])
 @login_required
 def post_comment(article_id):
     # grab article from DB
@@ -287,31 +348,31 @@ def post_comment(article_id):
     # comment validation
     if not content or content.strip() == '':
         flash('Comment cannot be empty', 'danger')
-        return redirect(url_for('article', article_id=article_id))
+        return redirect(url_for('main.article', article_id=article_id))
     
     # access control: must pass quiz to comment
     if not user_has_passed_quiz(current_user.id, article_id):
         flash('You must pass the quiz to comment', 'warning')
-        return redirect(url_for('article', article_id=article_id))
+        return redirect(url_for('main.article', article_id=article_id))
 
     # create and save comment to DB
-    comment = Comment(content=content, author=current_user, article=article)
+    comment = Comment(content=content, user_id=current_user.id, article=article)
     db.session.add(comment)
     db.session.commit()
 
     flash('Your comment has been posted!', 'success')
-    return redirect(url_for('article', article_id=article_id))
+    return redirect(url_for('main.article', article_id=article_id))
 
-@app.route('/comment/<int:comment_id>/edit', methods=['GET', 'POST'])
+@main.route('/comment/<int:comment_id>/edit', methods=['GET', 'POST'])
 @login_required
 def edit_comment(comment_id):
     # get comment from DB
     comment = Comment.query.get_or_404(comment_id)
 
     # validate that current user is comment author
-    if comment.author != current_user:
+    if comment.user_id != current_user.id:
         flash('You do not have permission to edit this comment')
-        return redirect(url_for('article', article_id=comment.article_id))
+        return redirect(url_for('main.article', article_id=comment.article_id))
     
     # post updated comment
     if request.method == 'POST':
@@ -321,7 +382,7 @@ def edit_comment(comment_id):
         # validate comment
         if not content or content.strip() == '':
             flash('Comment cannot be empty', 'danger')
-            return redirect(url_for('edit_comment', comment_id=comment_id))
+            return redirect(url_for('main.edit_comment', comment_id=comment_id))
         
         # update comment changes to db
         comment.content = content
@@ -329,26 +390,26 @@ def edit_comment(comment_id):
         db.session.commit()
 
         flash('Your comment has been updated!', 'success')
-        return redirect(url_for('article', article_id=comment.article_id))
+        return redirect(url_for('main.article', article_id=comment.article_id))
 
     return render_template('edit_comment.html', comment=comment)
 
-@app.route('/comment/<int:comment_id>/delete', methods=['POST'])
+@main.route('/comment/<int:comment_id>/delete', methods=['POST'])
 @login_required
 def delete_comment(comment_id):
     # get comment from DB
     comment = Comment.query.get_or_404(comment_id)
 
-    if current_user != comment.author:
+    if comment.user_id != current_user.id:
         flash('You do not have permission to delete this comment', 'danger')
-        return redirect(url_for('article', article_id=comment.article_id))
+        return redirect(url_for('main.article', article_id=comment.article_id))
     
     # delete comment from DB
     db.session.delete(comment)
     db.session.commit()
 
     flash('Your comment has been deleted!', 'success')
-    return redirect(url_for('article', article_id=comment.article_id))
+    return redirect(url_for('main.article', article_id=comment.article_id))
 
 
 
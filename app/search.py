@@ -0,0 +1,155 @@
+from app import db
+from app.models import Article
+from markupsafe import Markup, escape
+from sqlalchemy import DDL, event, inspect, or_, text
+import re
+
+# Full-text article search
+# On SQLite the archive is indexed in an FTS5 table, article_fts, whose rowid is
+# the article ID. It keeps its own copy of title and content so snippets come
+# straight from the index. Rows are added as fetch_articles() inserts articles
+# (index_articles) and as articles are written through the ORM (mapper events
+# below). Other databases fall back to a LIKE scan ordered by date.
+
+FTS_TABLE = 'article_fts'
+
+# snippet() wraps matches in these control characters; they are swapped for
+# <mark> tags after the rest of the snippet has been HTML-escaped
+MATCH_START = '\x02'
+MATCH_END = '\x03'
+SNIPPET_TOKENS = 24
+
+# title matches weigh more than body matches in the bm25 ranking
+TITLE_WEIGHT = 10.0
+CONTENT_WEIGHT = 1.0
+
+event.listen(Article.__table__, 'after_create', DDL(
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+    "USING fts5(title, content, tokenize='porter unicode61')"
+).execute_if(dialect='sqlite'))
+event.listen(Article.__table__, 'after_drop', DDL(
+    f"DROP TABLE IF EXISTS {FTS_TABLE}"
+).execute_if(dialect='sqlite'))
+
+def fts_enabled(connection=None):
+    bind = connection if connection is not None else db.session.get_bind()
+    return bind.dialect.name == 'sqlite'
+
+def _delete_rows(connection, article_ids):
+    connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({','.join(map(str, article_ids))})"))
+
+def _insert_rows(connection, article_ids):
+    connection.execute(text(
+        f"INSERT INTO {FTS_TABLE} (rowid, title, content) "
+        f"SELECT id, title, content FROM article WHERE id IN ({','.join(map(str, article_ids))})"
+    ))
+
+# (Re)indexes the given articles in the caller's transaction; the caller commits
+def index_articles(article_ids, batch_size=500):
+    article_ids = [int(article_id) for article_id in article_ids]
+    if not article_ids or not fts_enabled():
+        return
+    connection = db.session.connection()
+    for i in range(0, len(article_ids), batch_size):
+        batch = article_ids[i:i + batch_size]
+        _delete_rows(connection, batch)
+        _insert_rows(connection, batch)
+
+# Rebuilds the whole index from the article table, e.g. after a bulk import
+def rebuild_search_index():
+    if not fts_enabled():
+        return
+    db.session.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    db.session.execute(text(f"INSERT INTO {FTS_TABLE} (rowid, title, content) SELECT id, title, content FROM article"))
+    db.session.commit()
+
+# keep the index in step with articles written through the ORM
+@event.listens_for(Article, 'after_insert')
+def _article_inserted(mapper, connection, target):
+    if fts_enabled(connection):
+        _insert_rows(connection, [target.id])
+
+@event.listens_for(Article, 'after_update')
+def _article_updated(mapper, connection, target):
+    state = inspect(target)
+    if fts_enabled(connection) and (state.attrs.title.history.has_changes()
+                                    or state.attrs.content.history.has_changes()):
+        _delete_rows(connection, [target.id])
+        _insert_rows(connection, [target.id])
+
+@event.listens_for(Article, 'after_delete')
+def _article_deleted(mapper, connection, target):
+    if fts_enabled(connection):
+        _delete_rows(connection, [target.id])
+
+class SearchResult:
+    def __init__(self, id, title, source, date_posted, image_url, snippet):
+        self.id = id
+        self.title = title
+        self.source = source
+        self.date_posted = date_posted
+        self.image_url = image_url
+        self.snippet = snippet
+
+class SearchPage:
+    def __init__(self, items, page, has_next):
+        self.items = items
+        self.page = page
+        self.has_prev = page > 1
+        self.has_next = has_next
+        self.prev_num = page - 1 if self.has_prev else None
+        self.next_num = page + 1 if has_next else None
+
+# Words in the user's query; punctuation and FTS operators are dropped
+def query_terms(query):
+    return re.findall(r'\w+', query or '')[:16]
+
+# HTML-safe snippet with the matches marked
+def render_snippet(raw):
+    marked = str(escape(raw or ''))
+    return Markup(marked.replace(MATCH_START, '<mark>').replace(MATCH_END, '</mark>'))
+
+# Returns a SearchPage of articles matching every term in query, best match first
+def search_articles(query, page=1, per_page=10):
+    terms = query_terms(query)
+    page = max(page, 1)
+    if not terms:
+        return SearchPage([], page, False)
+
+    if fts_enabled():
+        rows = _fts_search(terms, (page - 1) * per_page, per_page + 1)
+    else:
+        rows = _like_search(terms, (page - 1) * per_page, per_page + 1)
+    return SearchPage(rows[:per_page], page, len(rows) > per_page)
+
+def _fts_search(terms, offset, limit):
+    # every term quoted so it is matched as a plain word, implicitly ANDed
+    match = ' '.join(f'"{term}"' for term in terms)
+    rows = db.session.execute(text(
+        f"SELECT article.id, article.title, article.source, article.date_posted, article.image_url, "
+        f"snippet({FTS_TABLE}, 1, :start, :end, '…', {SNIPPET_TOKENS}) "
+        f"FROM {FTS_TABLE} JOIN article ON article.id = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH :match "
+        f"ORDER BY bm25({FTS_TABLE}, {TITLE_WEIGHT}, {CONTENT_WEIGHT}) LIMIT :limit OFFSET :offset"
+    ).columns(date_posted=db.DateTime), dict(match=match, start=MATCH_START, end=MATCH_END, limit=limit, offset=offset))
+    return [SearchResult(*row[:5], render_snippet(row[5])) for row in rows]
+
+def _like_search(terms, offset, limit):
+    query = db.session.query(Article.id, Article.title, Article.source, Article.date_posted,
+                             Article.image_url, Article.content)
+    for term in terms:
+        pattern = f'%{term}%'
+        query = query.filter(or_(Article.title.ilike(pattern), Article.content.ilike(pattern)))
+    rows = query.order_by(Article.date_posted.desc(), Article.id.desc()).offset(offset).limit(limit).all()
+    return [SearchResult(*row[:5], render_snippet(_like_snippet(row[5], terms))) for row in rows]
+
+# Roughly what snippet() returns: a window of words around the first match
+def _like_snippet(content, terms):
+    words = (content or '').split()
+    lowered = [term.lower() for term in terms]
+    first = next((i for i, word in enumerate(words) if any(term in word.lower() for term in lowered)), 0)
+    start = max(first - SNIPPET_TOKENS // 2, 0)
+    window = words[start:start + SNIPPET_TOKENS]
+    marked = [f'{MATCH_START}{word}{MATCH_END}' if any(term in word.lower() for term in lowered) else word
+              for word in window]
+    return ('…' if start else '') + ' '.join(marked) + ('…' if start + SNIPPET_TOKENS < len(words) else '')
@@ -0,0 +1,84 @@
+from flask import current_app
+from functools import partial
+from io import BytesIO
+import hashlib
+import logging
+import os
+import threading
+
+# Article card thumbnails
+# The fetcher downloads each article's top image once and stores resized WebP and
+# JPEG copies under THUMBNAIL_DIR, named by the SHA-256 of the original image.
+# Identical images are only processed once, and a thumbnail's URL never changes
+# its content, so it can be served with a long-lived immutable cache header.
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {'webp': 'WEBP', 'jpg': 'JPEG'}
+MAX_PIXELS = 50_000_000  # refuse decompression bombs
+
+def thumbnail_dir():
+    return current_app.config.get('THUMBNAIL_DIR') or os.path.join(current_app.instance_path, 'thumbnails')
+
+# path of a thumbnail relative to the thumbnail directory, fanned out by key prefix
+def thumbnail_filename(key, fmt):
+    return f'{key[:2]}/{key}.{fmt}'
+
+def thumbnail_path(directory, key, fmt):
+    return os.path.join(directory, thumbnail_filename(key, fmt))
+
+# The ingest stage as a plain function of the image URL, so download workers can
+# run it without an app context
+def thumbnail_stage():
+    config = current_app.config
+    return partial(fetch_thumbnail, directory=thumbnail_dir(),
+                   width=config.get('THUMBNAIL_WIDTH', 640),
+                   timeout=config.get('THUMBNAIL_TIMEOUT', 10),
+                   max_bytes=config.get('THUMBNAIL_MAX_BYTES', 10 * 1024 * 1024))
+
+# Downloads image_url and returns its thumbnail key, or None if the image can't be
+# used; a missing thumbnail never stops the article itself from being stored
+def fetch_thumbnail(image_url, directory, width=640, timeout=10, max_bytes=10 * 1024 * 1024):
+    import requests  # only ingest needs it; web processes just serve the files
+
+    if not image_url:
+        return None
+    try:
+        with requests.get(image_url, timeout=timeout, stream=True) as response:
+            response.raise_for_status()
+            data = bytearray()
+            for chunk in response.iter_content(64 * 1024):
+                data += chunk
+                if len(data) > max_bytes:
+                    raise ValueError(f'image larger than {max_bytes} bytes')
+        return make_thumbnails(bytes(data), directory, width)
+    except Exception as e:
+        logger.warning(f"Could not make a thumbnail for {image_url}: {e}")
+        return None
+
+# Writes WebP and JPEG thumbnails of the image bytes in data (at most width pixels
+# wide) and returns their content key
+def make_thumbnails(data, directory, width=640):
+    from PIL import Image, ImageOps
+
+    key = hashlib.sha256(data).hexdigest()
+    paths = {fmt: thumbnail_path(directory, key, fmt) for fmt in FORMATS}
+    if all(os.path.exists(path) for path in paths.values()):
+        return key
+
+    with Image.open(BytesIO(data)) as image:
+        if image.width * image.height > MAX_PIXELS:
+            raise ValueError(f'image is {image.width}x{image.height}')
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        image.thumbnail((width, width * 4), Image.LANCZOS)
+
+        os.makedirs(os.path.dirname(paths['webp']), exist_ok=True)
+        for fmt, path in paths.items():
+            # write next to the final name, then swap in, so readers never see half a file
+            partial_path = f'{path}.{os.getpid()}-{threading.get_ident()}.tmp'
+            if fmt == 'webp':
+                image.save(partial_path, FORMATS[fmt], quality=75, method=4)
+            else:
+                image.save(partial_path, FORMATS[fmt], quality=80, optimize=True, progressive=True)
+            os.replace(partial_path, path)
+    return key
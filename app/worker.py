@@ -0,0 +1,136 @@
+from app import db
+from app.models import WorkerLease
+from datetime import datetime, timedelta
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import case, delete, or_, update
+from sqlalchemy.exc import IntegrityError
+import click
+import logging
+import os
+import signal
+import socket
+import threading
+import uuid
+
+# Background ingestion worker
+# Feed fetching and quiz generation run in their own process, started with
+# `flask ingest-worker`, never in the web processes. Any number of workers may be
+# started; they share a lease row in worker_lease and only the holder fetches
+# feeds, so each feed is polled once per interval per deployment. The others
+# stand by and take over once the holder stops renewing. Quiz jobs are claimed
+# row by row (see quiz_queue), so every worker helps with those.
+
+logger = logging.getLogger(__name__)
+
+INGEST_LEASE = 'ingest'
+
+# Identifies this process in the lease table
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+# Takes or renews the named lease for owner. Returns True if owner now holds it,
+# False while another worker holds an unexpired lease.
+def acquire_lease(name, owner, seconds):
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=seconds)
+    result = db.session.execute(
+        update(WorkerLease)
+        .where(WorkerLease.name == name, or_(WorkerLease.owner == owner, WorkerLease.expires_at < now))
+        .values(owner=owner, expires_at=expires_at,
+                acquired_at=case((WorkerLease.owner == owner, WorkerLease.acquired_at), else_=now))
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        db.session.commit()
+        return True
+
+    # nobody has held it yet, or someone else holds it
+    db.session.add(WorkerLease(name=name, owner=owner, acquired_at=now, expires_at=expires_at))
+    try:
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+        return False
+
+# Gives the lease up so a standby worker can take over without waiting for it to expire
+def release_lease(name, owner):
+    db.session.execute(
+        delete(WorkerLease).where(WorkerLease.name == name, WorkerLease.owner == owner)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+# Fetches the feeds that are due and starts on the quizzes they queued, if owner holds the ingest lease
+def run_ingest(owner):
+    # the fetcher pulls in newspaper and feedparser, which web processes never need
+    from app.news_fetcher import fetch_articles
+    from app.quiz_queue import process_quiz_jobs
+
+    if not acquire_lease(INGEST_LEASE, owner, current_app.config['INGEST_LEASE_SECONDS']):
+        logger.info("Another worker holds the ingest lease, skipping this fetch")
+        return False
+    # only feeds that are due are polled, so most runs are a single query
+    if fetch_articles()['added']:
+        process_quiz_jobs()
+    return True
+
+# Keeps the lease alive while a long fetch runs, and lets a standby pick it up
+# as soon as it expires
+def renew_ingest_lease(owner):
+    return acquire_lease(INGEST_LEASE, owner, current_app.config['INGEST_LEASE_SECONDS'])
+
+# Works through pending quiz jobs, including retries that have come due
+def run_quiz_jobs():
+    from app.quiz_queue import process_quiz_jobs
+    process_quiz_jobs()
+
+# scheduler threads have no app context of their own
+def _in_app_context(app, job, *args):
+    with app.app_context():
+        return job(*args)
+
+# Scheduler for one worker process. Each job runs at most once at a time, and
+# runs missed while the previous one was still busy are folded into one.
+def build_scheduler(app, owner):
+    from flask_apscheduler import APScheduler
+
+    scheduler = APScheduler()
+    scheduler.init_app(app)
+    scheduler.add_job(id='fetch_articles_job', func=_in_app_context, args=[app, run_ingest, owner],
+                      trigger='interval', seconds=app.config['FEED_CHECK_SECONDS'],
+                      next_run_time=datetime.now(), max_instances=1, coalesce=True)
+    scheduler.add_job(id='ingest_lease_job', func=_in_app_context, args=[app, renew_ingest_lease, owner],
+                      trigger='interval', seconds=max(1, app.config['INGEST_LEASE_SECONDS'] // 3),
+                      max_instances=1, coalesce=True)
+    scheduler.add_job(id='process_quiz_jobs_job', func=_in_app_context, args=[app, run_quiz_jobs],
+                      trigger='interval', seconds=app.config['QUIZ_QUEUE_POLL_SECONDS'],
+                      max_instances=1, coalesce=True)
+    return scheduler
+
+@click.command('ingest-worker')
+@click.option('--once', is_flag=True, help='Run one fetch now (unless another worker holds the lease) and exit.')
+@with_appcontext
+def ingest_worker(once):
+    """Fetch feeds and generate quizzes in the background."""
+    owner = worker_id()
+    if once:
+        ran = run_ingest(owner)
+        release_lease(INGEST_LEASE, owner)
+        click.echo('Fetch finished.' if ran else 'Another worker holds the ingest lease; nothing done.')
+        return
+
+    stopping = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *args: stopping.set())
+
+    scheduler = build_scheduler(current_app._get_current_object(), owner)
+    scheduler.start()
+    logger.info(f"Ingest worker {owner} started")
+    try:
+        stopping.wait()
+    finally:
+        scheduler.shutdown()
+        release_lease(INGEST_LEASE, owner)
+        logger.info(f"Ingest worker {owner} stopped")
@@ -0,0 +1,81 @@
+"""Compact user_quiz results
+
+Revision ID: 8c4f1e6a2b93
+Revises: 5d0e7b2c94a1
+Create Date: 2026-10-18 14:02:36.418205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import json
+
+
+# revision identifiers, used by Alembic.
+revision = '8c4f1e6a2b93'
+down_revision = '5d0e7b2c94a1'
+branch_labels = None
+depends_on = None
+
+ROWS = sa.text("SELECT user_quiz.user_id, user_quiz.quiz_id, user_quiz.results_json, quiz.questions FROM user_quiz "
+               "JOIN quiz ON quiz.id = user_quiz.quiz_id WHERE user_quiz.results_json IS NOT NULL")
+UPDATE = sa.text("UPDATE user_quiz SET results_json = :results_json WHERE user_id = :user_id AND quiz_id = :quiz_id")
+
+
+def _load(value):
+    try:
+        return json.loads(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _rewrite(convert):
+    bind = op.get_bind()
+    updates = []
+    for user_id, quiz_id, results_json, questions_json in bind.execute(ROWS).fetchall():
+        results, questions = _load(results_json), _load(questions_json)
+        if isinstance(questions, list):
+            converted = convert(results, questions)
+            if converted is not None:
+                updates.append({'user_id': user_id, 'quiz_id': quiz_id, 'results_json': converted})
+    for start in range(0, len(updates), 500):
+        bind.execute(UPDATE, updates[start:start + 500])
+
+
+# legacy feedback list -> {"c": chosen option indexes, "m": correctness bitmask}
+def _compact(results, questions):
+    if not isinstance(results, list):
+        return None
+    chosen = []
+    mask = 0
+    for i, (item, question) in enumerate(zip(results, questions)):
+        options = question.get('options') or []
+        answer = item.get('your_answer') if isinstance(item, dict) else None
+        chosen.append(options.index(answer) if answer in options else -1)
+        if isinstance(item, dict) and item.get('is_correct'):
+            mask |= 1 << i
+    return json.dumps({'c': chosen, 'm': mask}, separators=(',', ':'))
+
+
+def _expand(results, questions):
+    if not isinstance(results, dict) or 'c' not in results:
+        return None
+    feedback = []
+    for i, (index, question) in enumerate(zip(results['c'], questions)):
+        options = question.get('options') or []
+        feedback.append({
+            'question': question.get('question'),
+            'your_answer': options[index] if 0 <= index < len(options) else None,
+            'correct_answer': question.get('correct_answer'),
+            'is_correct': bool(results.get('m', 0) >> i & 1)
+        })
+    return json.dumps(feedback)
+
+
+def upgrade():
+    # results_json used to hold the full question text and answers for every
+    # attempt; keep only the chosen option indexes and a correctness bitmask
+    _rewrite(_compact)
+
+
+def downgrade():
+    _rewrite(_expand)
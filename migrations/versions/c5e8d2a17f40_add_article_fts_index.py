@@ -0,0 +1,31 @@
+"""Add article_fts full-text index
+
+Revision ID: c5e8d2a17f40
+Revises: 8c4f1e6a2b93
+Create Date: 2026-10-18 15:21:09.734518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e8d2a17f40'
+down_revision = '8c4f1e6a2b93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FTS5 is SQLite only; other databases search with LIKE (see app/search.py)
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS article_fts "
+               "USING fts5(title, content, tokenize='porter unicode61')")
+    op.execute("INSERT INTO article_fts (rowid, title, content) SELECT id, title, content FROM article")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("DROP TABLE IF EXISTS article_fts")
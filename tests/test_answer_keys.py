@@ -0,0 +1,117 @@
+import unittest
+from unittest.mock import patch
+from app import create_app, db, bcrypt
+from app import quiz_generator
+from app.answer_keys import get_answer_key, score_responses, encode_results, decode_results
+from app.models import User, Article, Quiz, UserQuiz
+from datetime import datetime
+import json
+
+app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+
+def make_questions(correct):
+    return json.dumps([
+        {'question': f'Question {i}', 'options': ['A', 'B', 'C', 'D'], 'correct_answer': correct}
+        for i in range(5)
+    ])
+
+class AnswerKeyTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.client = app.test_client()
+        with app.app_context():
+            db.create_all()
+            password_hash = bcrypt.generate_password_hash('password').decode('utf-8')
+            db.session.add(User(username='reader', email='reader@example.com', password=password_hash))
+            article = Article(title='Quizzed Article', content='Content here.',
+                              source='https://example.com', date_posted=datetime.utcnow())
+            db.session.add(article)
+            db.session.flush()
+            db.session.add(Quiz(article_id=article.id, questions=make_questions('B')))
+            db.session.commit()
+            self.article_id = article.id
+        self.client.post('/login', data=dict(email='reader@example.com', password='password'))
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def submit(self, answer, unanswered=0):
+        responses = {f'question_{i}': answer for i in range(unanswered, 5)}
+        return self.client.post('/submit_quiz', json={'article_id': self.article_id, 'responses': responses}).get_json()
+
+    # regenerates the quiz with every answer changed to correct
+    def regenerate(self, correct):
+        with app.app_context(), patch.object(quiz_generator, 'generate_quiz',
+                                             side_effect=lambda article_id, **kwargs: Quiz(
+                                                 article_id=article_id, questions=make_questions(correct).replace(
+                                                     'Question', 'New question'))):
+            quiz_generator.ensure_quiz(self.article_id, regenerate=True)
+
+    # Tests that responses are scored by option against the cached key
+    def test_score_responses(self):
+        with app.app_context():
+            key = get_answer_key(self.article_id)
+            self.assertIs(get_answer_key(self.article_id), key)
+            responses = {'question_0': 'B', 'question_1': 'A', 'question_2': 'not an option', 'question_4': 'B'}
+            score, chosen, results = score_responses(key, responses)
+        self.assertEqual(score, 2)
+        self.assertEqual(chosen, [1, 0, -1, -1, 1])
+        self.assertEqual(results, [True, False, False, False, True])
+
+    # Tests that submit_quiz scores and records attempts the same way as before
+    def test_submit_quiz(self):
+        data = self.submit('B', unanswered=1)
+        self.assertEqual((data['status'], data['score'], data['total']), ('failure', 4, 5))
+        self.assertEqual(data['feedback'][0], {'question': 'Question 0', 'your_answer': None,
+                                               'correct_answer': 'B', 'is_correct': False})
+        data = self.submit('B')
+        self.assertEqual((data['status'], data['score']), ('success', 5))
+        with app.app_context():
+            entry = UserQuiz.query.one()
+            self.assertEqual((entry.score, entry.passed, entry.attempted), (5, True, True))
+
+    # Tests that results are stored compactly and feedback is rebuilt from the quiz
+    def test_compact_results(self):
+        self.assertEqual(decode_results(encode_results([1, 0, -1], [True, False, False])), ([1, 0, -1], [True, False, False]))
+        self.submit('A', unanswered=1)
+        with app.app_context():
+            version = Quiz.query.one().date_generated.isoformat()
+            self.assertEqual(UserQuiz.query.one().results_json, '{"c":[-1,0,0,0,0],"m":0,"v":"%s"}' % version)
+        page = self.client.get(f'/article/{self.article_id}').get_data(as_text=True)
+        self.assertIn('You scored 0 out of 5.', page)
+        self.assertIn('Question 4', page)
+
+    # Tests that attempts stored with the old full feedback list still render
+    def test_legacy_results(self):
+        legacy = [{'question': f'Old question {i}', 'your_answer': 'B', 'correct_answer': 'B', 'is_correct': True}
+                  for i in range(5)]
+        with app.app_context():
+            db.session.add(UserQuiz(user_id=User.query.one().id, quiz_id=Quiz.query.one().id, attempted=True,
+                                    passed=True, score=5, results_json=json.dumps(legacy)))
+            db.session.commit()
+        page = self.client.get(f'/article/{self.article_id}').get_data(as_text=True)
+        self.assertIn('You scored 5 out of 5.', page)
+        self.assertIn('Old question 4', page)
+
+    # Tests that regenerating a quiz stops submissions being scored against the old key
+    def test_regeneration_invalidates_key(self):
+        self.assertEqual(self.submit('B')['score'], 5)
+        self.regenerate('C')
+        self.assertEqual(self.submit('B')['score'], 0)
+        self.assertEqual(self.submit('C')['score'], 5)
+
+    # Tests that an attempt made before the quiz was regenerated isn't shown against the new questions
+    def test_results_after_regeneration(self):
+        self.submit('B')
+        self.regenerate('C')
+        page = self.client.get(f'/article/{self.article_id}').get_data(as_text=True)
+        self.assertIn('This quiz has been updated since your attempt', page)
+        self.assertIn('You scored 5.', page)
+        self.assertNotIn('New question', page)
+        self.assertNotIn('stored-feedback-details', page)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+from app import create_app, db
+from app import assets
+from app.models import Article
+from app.page_cache import clear_page_cache
+from datetime import datetime
+import gzip
+import os
+import re
+import shutil
+import tempfile
+
+app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+
+class AssetTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.stamp_dir = tempfile.mkdtemp()
+        app.config['LISTING_STAMP_PATH'] = os.path.join(self.stamp_dir, 'listing.stamp')
+        clear_page_cache()
+        self.client = app.test_client()
+        with app.app_context():
+            db.create_all()
+            for i in range(12):
+                db.session.add(Article(title=f'Story {i}', content='Body.', source=f'https://example.com/{i}',
+                                       date_posted=datetime(2024, 1, 1, i)))
+            db.session.commit()
+
+    def tearDown(self):
+        app.config['LISTING_STAMP_PATH'] = None
+        shutil.rmtree(self.stamp_dir)
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def read_static(self, filename):
+        with open(os.path.join(app.static_folder, filename), 'rb') as f:
+            return f.read()
+
+    # Tests that pages link fingerprinted assets served immutable, precompressed when accepted
+    def test_fingerprinted_static_assets(self):
+        page = self.client.get('/home').get_data(as_text=True)
+        css_url = re.search(r'/static/css/style\.[0-9a-f]{12}\.css', page).group(0)
+        self.assertRegex(page, r'/static/js/script\.[0-9a-f]{12}\.js')
+        self.assertNotIn('/static/css/style.css', page)
+
+        original = self.read_static('css/style.css')
+        plain = self.client.get(css_url)
+        self.assertEqual(plain.data, original)
+        self.assertEqual(plain.headers['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertNotIn('Content-Encoding', plain.headers)
+        plain.close()
+
+        compressed = self.client.get(css_url, headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(compressed.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(compressed.headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(compressed.data), original)
+        print(f'style.css {len(original)} bytes, gzip {len(compressed.data)} bytes')
+        compressed.close()
+
+        # unfingerprinted URLs still work, without the long-lived caching
+        legacy = self.client.get('/static/css/style.css')
+        self.assertEqual(legacy.status_code, 200)
+        self.assertNotIn('immutable', legacy.headers.get('Cache-Control', ''))
+        legacy.close()
+
+    # Tests that dynamic HTML is compressed and still revalidates against the page cache
+    def test_dynamic_compression(self):
+        identity = self.client.get('/articles')
+        response = self.client.get('/articles', headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.data), identity.data)
+        print(f'/articles {len(identity.data)} bytes, gzip {len(response.data)} bytes')
+
+        etag = response.headers['ETag']
+        self.assertTrue(etag.startswith('W/'))
+        revalidated = self.client.get('/articles', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        self.assertEqual(revalidated.status_code, 304)
+
+        # small responses aren't worth compressing
+        small = self.client.get('/thumbnails/nope.webp', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', small.headers)
+
+if __name__ == '__main__':
+    unittest.main()
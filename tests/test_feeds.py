@@ -0,0 +1,166 @@
+import unittest
+from unittest.mock import patch
+from app import create_app, db
+from app import news_fetcher
+from app.feeds import due_feeds
+from app.models import Article, FeedState
+from datetime import datetime, timedelta
+import feedparser
+import time
+
+app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+
+class FeedRegistryTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        app.config['FEEDS'] = ['https://example.com/a.xml', {'url': 'https://example.com/b.xml', 'interval_minutes': 15}]
+        app.config['FEED_JITTER'] = 0.0
+        with app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        app.config['FEEDS'] = []
+        app.config['FEED_JITTER'] = 0.1
+        app.config['FEED_MAX_CONCURRENCY'] = 8
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    # Parsed feed whose entries are the given titles, the way feedparser returns it
+    @staticmethod
+    def fake_feed(feed_url, titles, bozo=False, status=200):
+        return feedparser.FeedParserDict(bozo=bozo, status=status, entries=[
+            feedparser.FeedParserDict(title=title, link=f'{feed_url}/{i}', published='Mon, 09 Dec 2024 10:00:00 GMT')
+            for i, title in enumerate(titles)
+        ])
+
+    @staticmethod
+    def fake_content(url, title, timeout=None):
+        return f'Body of {title}', None
+
+    # Tests that configured feeds are registered and only enabled, due feeds are returned
+    def test_due_feeds(self):
+        with app.app_context():
+            db.session.add(FeedState(feed_url='https://example.com/later.xml',
+                                     next_run_at=datetime.utcnow() + timedelta(minutes=5)))
+            db.session.add(FeedState(feed_url='https://example.com/off.xml', enabled=False))
+            db.session.add(FeedState(feed_url='https://example.com/overdue.xml',
+                                     next_run_at=datetime.utcnow() - timedelta(minutes=5)))
+            db.session.commit()
+
+            due = [state.feed_url for state in due_feeds()]
+            self.assertEqual(due, ['https://example.com/a.xml', 'https://example.com/b.xml',
+                                   'https://example.com/overdue.xml'])
+            self.assertEqual(FeedState.query.filter_by(feed_url='https://example.com/b.xml').one().interval_minutes, 15)
+
+    # Tests per-feed intervals, exponential backoff on errors and bozo feeds, and the reset on success
+    def test_schedule_and_backoff(self):
+        a, b = 'https://example.com/a.xml', 'https://example.com/b.xml'
+        responses = {a: self.fake_feed(a, ['A1']), b: self.fake_feed(b, [], bozo=True)}
+
+        def parse(url, etag=None, modified=None, timeout=None):
+            if isinstance(responses[url], Exception):
+                raise responses[url]
+            return responses[url]
+
+        with app.app_context(), patch.object(news_fetcher, 'download_feed', side_effect=parse) as poll, \
+             patch.object(news_fetcher, 'get_full_article_content', side_effect=self.fake_content):
+            start = datetime.utcnow()
+            stats = news_fetcher.fetch_articles()
+            self.assertEqual((stats['feeds'], stats['feed_errors'], stats['added']), (2, 1, 1))
+            state_a = FeedState.query.filter_by(feed_url=a).one()
+            state_b = FeedState.query.filter_by(feed_url=b).one()
+            self.assertAlmostEqual((state_a.next_run_at - start).total_seconds(), 3600, delta=5)
+            self.assertEqual(state_b.consecutive_failures, 1)
+            self.assertIn('malformed', state_b.last_error)
+            self.assertAlmostEqual((state_b.next_run_at - start).total_seconds(), 2 * 15 * 60, delta=5)
+
+            # neither feed is due yet, so nothing is polled
+            self.assertEqual(news_fetcher.fetch_articles()['feeds'], 0)
+            self.assertEqual(poll.call_count, 2)
+
+            # the second failure in a row doubles the wait again
+            responses[b] = OSError('connection reset')
+            state_b.next_run_at = datetime.utcnow()
+            db.session.commit()
+            start = datetime.utcnow()
+            news_fetcher.fetch_articles()
+            state_b = FeedState.query.filter_by(feed_url=b).one()
+            self.assertEqual(state_b.consecutive_failures, 2)
+            self.assertAlmostEqual((state_b.next_run_at - start).total_seconds(), 4 * 15 * 60, delta=5)
+
+            # a good poll resets the backoff
+            responses[b] = self.fake_feed(b, ['B1'])
+            state_b.next_run_at = datetime.utcnow()
+            db.session.commit()
+            start = datetime.utcnow()
+            self.assertEqual(news_fetcher.fetch_articles()['added'], 1)
+            state_b = FeedState.query.filter_by(feed_url=b).one()
+            self.assertEqual(state_b.consecutive_failures, 0)
+            self.assertIsNone(state_b.last_error)
+            self.assertAlmostEqual((state_b.next_run_at - start).total_seconds(), 15 * 60, delta=5)
+
+    # Tests that many feeds are polled concurrently and a story carried by two feeds is downloaded once
+    def test_feeds_polled_concurrently(self):
+        urls = [f'https://example.com/feed{i}.xml' for i in range(8)]
+        app.config['FEEDS'] = urls
+        app.config['FEED_MAX_CONCURRENCY'] = 8
+
+        def slow_parse(url, etag=None, modified=None, timeout=None):
+            time.sleep(0.3)
+            return self.fake_feed(url, [f'{url} story', 'Shared story'])
+
+        with app.app_context(), patch.object(news_fetcher, 'download_feed', side_effect=slow_parse), \
+             patch.object(news_fetcher, 'get_full_article_content', side_effect=self.fake_content) as download:
+            start = time.perf_counter()
+            stats = news_fetcher.fetch_articles()
+            duration = time.perf_counter() - start
+
+            self.assertLess(duration, 8 * 0.3 / 2)
+            self.assertEqual(stats['added'], 9)
+            self.assertEqual(stats['existing'], 7)
+            self.assertEqual(download.call_count, 9)
+            self.assertEqual(Article.query.count(), 9)
+            # every feed remembers its entries, including the shared one it didn't download itself
+            for state in FeedState.query:
+                self.assertEqual(len(state.get_seen_guids()), 2)
+
+    # Tests that a database error while storing one feed rolls back only that feed
+    def test_failed_feed_does_not_undo_others(self):
+        a, b = 'https://example.com/a.xml', 'https://example.com/b.xml'
+        insert_articles = news_fetcher.insert_articles
+
+        def insert_or_fail(rows):
+            if any(row['source'].startswith(b) for row in rows):
+                raise RuntimeError('database is locked')
+            return insert_articles(rows)
+
+        with app.app_context(), \
+             patch.object(news_fetcher, 'download_feed', side_effect=lambda url, **kwargs: self.fake_feed(url, [url])), \
+             patch.object(news_fetcher, 'get_full_article_content', side_effect=self.fake_content), \
+             patch.object(news_fetcher, 'insert_articles', side_effect=insert_or_fail):
+            stats = news_fetcher.fetch_articles()
+
+            self.assertEqual((stats['added'], stats['feed_errors']), (1, 1))
+            self.assertEqual([article.title for article in Article.query], [a])
+            self.assertEqual(FeedState.query.filter_by(feed_url=a).one().get_seen_guids(), [f'{a}/0'])
+            state_b = FeedState.query.filter_by(feed_url=b).one()
+            self.assertEqual((state_b.consecutive_failures, state_b.get_seen_guids()), (1, []))
+
+    # Tests adding, listing and removing feeds from the command line
+    def test_feeds_cli(self):
+        runner = app.test_cli_runner()
+        result = runner.invoke(args=['feeds', 'add', 'https://example.com/c.xml', '--interval', '5'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        result = runner.invoke(args=['feeds', 'list'])
+        self.assertIn('https://example.com/c.xml [enabled, every 5 min, next now]', result.output)
+        self.assertIn('https://example.com/a.xml', result.output)
+
+        result = runner.invoke(args=['feeds', 'remove', 'https://example.com/c.xml'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        with app.app_context():
+            self.assertNotIn('https://example.com/c.xml', [state.feed_url for state in due_feeds()])
+        self.assertNotEqual(runner.invoke(args=['feeds', 'remove', 'https://example.com/nope.xml']).exit_code, 0)
+
+if __name__ == '__main__':
+    unittest.main()
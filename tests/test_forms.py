@@ -1,7 +1,9 @@
 import unittest
-from app import app
+from app import create_app
 from app.forms import RegistrationForm
 
+app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+
 class FormTestCase(unittest.TestCase):
     # Initializes test environment before each test
     def setUp(self):
@@ -0,0 +1,75 @@
+import unittest
+from app import create_app, db
+from app.helpers import quiz_access, quiz_access_batch, user_has_passed_quiz, user_has_attempted_quiz, NO_QUIZ
+from app.models import User, Article, Quiz, UserQuiz
+from datetime import datetime
+from sqlalchemy import event
+
+app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+
+class HelpersTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+            user = User(username='reader', email='reader@example.com', password='hashed_password')
+            articles = [Article(title=f'Article {i}', content='Content here.', source='https://example.com',
+                                date_posted=datetime.utcnow()) for i in range(3)]
+            db.session.add(user)
+            db.session.add_all(articles)
+            db.session.flush()
+            passed_quiz = Quiz(article_id=articles[0].id, questions='[]')
+            failed_quiz = Quiz(article_id=articles[1].id, questions='[]')
+            db.session.add_all([passed_quiz, failed_quiz])
+            db.session.flush()
+            db.session.add(UserQuiz(user_id=user.id, quiz_id=passed_quiz.id, passed=True, attempted=True, score=5))
+            db.session.add(UserQuiz(user_id=user.id, quiz_id=failed_quiz.id, passed=False, attempted=True, score=2))
+            db.session.commit()
+            self.user_id = user.id
+            self.article_ids = [article.id for article in articles]
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    # Runs fn inside a request and returns (result, number of SQL statements issued)
+    def count_queries(self, fn):
+        statements = []
+        def count_statement(conn, cursor, statement, params, context, executemany):
+            statements.append(statement)
+        with app.test_request_context():
+            engine = db.engine
+            event.listen(engine, 'before_cursor_execute', count_statement)
+            try:
+                result = fn()
+            finally:
+                event.remove(engine, 'before_cursor_execute', count_statement)
+        return result, len(statements)
+
+    # Tests that pass/attempt checks share one memoized query per request
+    def test_quiz_access_single_query_memoized(self):
+        passed, attempted = self.article_ids[0], self.article_ids[1]
+
+        def checks():
+            return (user_has_passed_quiz(self.user_id, passed),
+                    user_has_attempted_quiz(self.user_id, passed),
+                    user_has_passed_quiz(self.user_id, attempted),
+                    quiz_access(self.user_id, passed))
+
+        (passed_first, attempted_first, passed_second, access), queries = self.count_queries(checks)
+        self.assertEqual((passed_first, attempted_first, passed_second), (True, True, False))
+        self.assertEqual(access.score, 5)
+        self.assertEqual(queries, 2)  # one per article, none repeated
+
+    # Tests that the batch variant answers a whole page of articles in one query
+    def test_quiz_access_batch(self):
+        states, queries = self.count_queries(lambda: quiz_access_batch(self.user_id, self.article_ids))
+        self.assertEqual(queries, 1)
+        self.assertTrue(states[self.article_ids[0]].passed)
+        self.assertTrue(states[self.article_ids[1]].attempted)
+        self.assertFalse(states[self.article_ids[1]].passed)
+        self.assertEqual(states[self.article_ids[2]], NO_QUIZ)
+
+if __name__ == '__main__':
+    unittest.main()
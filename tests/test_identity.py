@@ -0,0 +1,107 @@
+import unittest
+from app import create_app, db, bcrypt
+from app.identity import load_user, clear_identities, UserIdentity
+from app.models import User, Article, Quiz, UserQuiz, Comment
+from datetime import datetime
+from sqlalchemy import event
+import json
+
+app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+
+QUESTIONS = json.dumps([
+    {'question': f'Question {i}', 'options': ['A', 'B', 'C', 'D'], 'correct_answer': 'B'}
+    for i in range(5)
+])
+
+class IdentityCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        clear_identities()
+        self.client = app.test_client()
+        with app.app_context():
+            db.create_all()
+            password_hash = bcrypt.generate_password_hash('password').decode('utf-8')
+            user = User(username='reader', email='reader@example.com', password=password_hash)
+            article = Article(title='Quizzed Article', content='Content here.',
+                              source='https://example.com', date_posted=datetime.utcnow())
+            db.session.add_all([user, article])
+            db.session.flush()
+            quiz = Quiz(article_id=article.id, questions=QUESTIONS)
+            db.session.add(quiz)
+            db.session.flush()
+            db.session.add(UserQuiz(user_id=user.id, quiz_id=quiz.id, attempted=True, passed=True, score=5))
+            db.session.commit()
+            self.user_id = user.id
+            self.article_id = article.id
+        self.client.post('/login', data=dict(email='reader@example.com', password='password'))
+
+    def tearDown(self):
+        app.config['USER_CACHE_SECONDS'] = 60
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    # Runs request and returns the number of SQL statements it executed
+    def count_queries(self, request):
+        statements = []
+        with app.app_context():
+            listener = lambda conn, cursor, statement, *args: statements.append(statement)
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            try:
+                request()
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', listener)
+        return len(statements)
+
+    # Tests that cached identities save the user query on every authenticated request
+    def test_query_count_with_and_without_cache(self):
+        requests = {
+            'submit_quiz': lambda: self.client.post('/submit_quiz', json={
+                'article_id': self.article_id, 'responses': {f'question_{i}': 'B' for i in range(5)}}),
+            'post_comment': lambda: self.client.post(f'/article/{self.article_id}/comment', data={'content': 'Hi'}),
+        }
+        for request in requests.values():
+            request()  # warm the answer key and quiz access paths
+        counts = {}
+        for seconds in (0, 60):
+            app.config['USER_CACHE_SECONDS'] = seconds
+            clear_identities()
+            self.client.get('/articles')  # warm the cache (when enabled)
+            for name, request in requests.items():
+                counts[name, seconds] = self.count_queries(request)
+
+        for name in requests:
+            print(f'{name}: {counts[name, 0]} queries without the identity cache, {counts[name, 60]} with it')
+            self.assertEqual(counts[name, 60], counts[name, 0] - 1)
+
+    # Tests that renaming or deleting a user drops the cached identity
+    def test_update_and_delete_invalidate(self):
+        with app.app_context():
+            identity = load_user(str(self.user_id))
+            self.assertIsInstance(identity, UserIdentity)
+            self.assertIs(load_user(str(self.user_id)), identity)
+
+            db.session.get(User, self.user_id).username = 'renamed'
+            db.session.commit()
+            self.assertEqual(load_user(str(self.user_id)).username, 'renamed')
+
+            UserQuiz.query.delete()
+            db.session.delete(db.session.get(User, self.user_id))
+            db.session.commit()
+            self.assertIsNone(load_user(str(self.user_id)))
+
+    # Tests that comment ownership is checked by id against the cached identity
+    def test_comment_ownership(self):
+        self.client.post(f'/article/{self.article_id}/comment', data={'content': 'First!'})
+        with app.app_context():
+            comment = Comment.query.one()
+            self.assertEqual(comment.user_id, self.user_id)
+        page = self.client.get(f'/article/{self.article_id}').get_data(as_text=True)
+        self.assertIn(f'/comment/{comment.id}/edit', page)
+        self.client.post(f'/comment/{comment.id}/delete')
+        with app.app_context():
+            self.assertEqual(Comment.query.count(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
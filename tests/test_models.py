@@ -1,14 +1,15 @@
 import unittest
-from app import app, db
+from app import create_app, db
 from app.models import User, Article, Quiz, Comment
 from datetime import datetime
 import json
 
+app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+
 class ModelTestCase(unittest.TestCase):
     # Initializes test environment before each test
     def setUp(self):
         app.config['TESTING'] = True
-        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'  # In-memory database
         app.config['WTF_CSRF_ENABLED'] = False
         self.app = app.test_client()
         with app.app_context():
@@ -40,5 +41,22 @@ class ModelTestCase(unittest.TestCase):
             self.assertIsNotNone(retrieved_article)
             self.assertEqual(retrieved_article.source, 'https://example.com')
 
+    # Tests that the pre-rendered article body is escaped and follows content edits
+    def test_article_content_html(self):
+        with app.app_context():
+            article = Article(title='Rendered Article', content='First <b>line</b>\n\n  \nSecond line',
+                              source='https://example.com', date_posted=datetime.utcnow())
+            db.session.add(article)
+            db.session.commit()
+            self.assertEqual(article.content_html, '<p>First &lt;b&gt;line&lt;/b&gt;</p><p>Second line</p>')
+
+            article.content = 'Edited'
+            db.session.commit()
+            self.assertEqual(Article.query.get(article.id).content_html, '<p>Edited</p>')
+
+            # rows stored before content_html existed are rendered on the fly
+            article.content_html = None
+            self.assertEqual(str(article.body_html), '<p>Edited</p>')
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
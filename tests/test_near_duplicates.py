@@ -0,0 +1,155 @@
+import unittest
+from unittest.mock import patch
+from app import create_app, db
+from app import news_fetcher
+from app.models import Article, ArticleFingerprint, Quiz, QuizJob
+from app.near_duplicates import (FingerprintIndex, find_near_duplicate, hamming_distance, rebuild_fingerprints,
+                                 simhash, store_fingerprints)
+from datetime import datetime
+import feedparser
+import random
+
+app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+
+WORDS = ('government minister election talks economy climate border market court health police storm president '
+         'vote trade energy war peace report city country flood rescue bank rates').split()
+
+# A body of n random sentences
+def story(rng, n=30):
+    return '\n'.join(' '.join(rng.choice(WORDS) for _ in range(12)).capitalize() + '.' for _ in range(n))
+
+class NearDuplicateTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        app.config['FEEDS'] = ['https://example.com/a.xml', 'https://example.com/b.xml']
+        with app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        app.config['FEEDS'] = []
+        app.config['NEAR_DUPLICATE_MAX_DISTANCE'] = 6
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    # Tests that lightly edited bodies stay close, unrelated ones are far apart and stubs get no fingerprint
+    def test_simhash(self):
+        rng = random.Random(7)
+        body = story(rng)
+        edited = body.replace('.', ',', 1) + '\nThis story has been updated.'
+        self.assertEqual(simhash(body), simhash(body.upper()))
+        self.assertLessEqual(hamming_distance(simhash(body), simhash(edited)), 6)
+        self.assertGreater(hamming_distance(simhash(body), simhash(story(rng))), 6)
+        self.assertIsNone(simhash('Watch the video'))
+
+    # Tests the banded lookups, in the database and in memory, against fingerprints 0 to 8 bits away
+    def test_banded_lookup(self):
+        rng = random.Random(3)
+        # top bit set, so the signed column has to round-trip it
+        fingerprint = rng.getrandbits(64) | 1 << 63
+        near = {distance: fingerprint ^ sum(1 << bit for bit in rng.sample(range(64), distance)) for distance in range(9)}
+        with app.app_context():
+            db.session.add_all(Article(id=i + 1, title=f'A{i}', content='x', source='s') for i in near)
+            store_fingerprints({i + 1: value for i, value in near.items()})
+            db.session.commit()
+            index = FingerprintIndex()
+            for i, value in near.items():
+                index.add(i + 1, value)
+
+            for distance in range(8):
+                # the closest one wins; everything up to 7 bits is guaranteed to be found
+                self.assertEqual(find_near_duplicate(near[distance], distance), (distance + 1, 0))
+                self.assertEqual(index.find(near[distance], distance), (distance + 1, 0))
+            self.assertEqual(find_near_duplicate(fingerprint ^ 1, 6), (1, 1))
+            self.assertIsNone(find_near_duplicate(rng.getrandbits(64), 6))
+            self.assertIsNone(find_near_duplicate(fingerprint, -1))
+
+    # Tests that a retitled story and a copy from another feed are skipped without a quiz job or a thumbnail
+    def test_fetch_skips_near_duplicates(self):
+        rng = random.Random(11)
+        bodies = {'Storm hits coast': story(rng), 'Talks collapse': story(rng), 'Rates rise': story(rng)}
+        bodies['Coast hit by storm'] = bodies['Storm hits coast'] + '\nAdditional reporting by staff.'
+        bodies['Talks collapse, minister says'] = bodies['Talks collapse']
+        feeds = {
+            'https://example.com/a.xml': ['Coast hit by storm', 'Talks collapse', 'Rates rise'],
+            'https://example.com/b.xml': ['Talks collapse, minister says'],
+        }
+
+        def fake_parse(url, etag=None, modified=None, timeout=None):
+            return feedparser.FeedParserDict(bozo=False, status=200, entries=[
+                feedparser.FeedParserDict(title=title, link=f'{url}/{i}', published='Mon, 09 Dec 2024 10:00:00 GMT')
+                for i, title in enumerate(feeds[url])
+            ])
+
+        with app.app_context():
+            db.session.add(Article(title='Storm hits coast', content=bodies['Storm hits coast'], source='s',
+                                   date_posted=datetime.utcnow()))
+            db.session.commit()
+            self.assertEqual(rebuild_fingerprints(), 1)
+
+            thumbnailed = []
+
+            def thumbnail(image_url):
+                thumbnailed.append(image_url)
+                return 'key'
+
+            with patch.object(news_fetcher, 'download_feed', side_effect=fake_parse), \
+                 patch.object(news_fetcher, 'get_full_article_content',
+                              side_effect=lambda url, title, timeout=None: (bodies[title], f'{url}.jpg')), \
+                 patch.object(news_fetcher, 'thumbnail_stage', return_value=thumbnail):
+                stats = news_fetcher.fetch_articles()
+
+            self.assertEqual((stats['added'], stats['near_duplicates']), (2, 2))
+            titles = {title for (title,) in db.session.query(Article.title)}
+            self.assertEqual(titles, {'Storm hits coast', 'Talks collapse', 'Rates rise'})
+            self.assertEqual(ArticleFingerprint.query.count(), 3)
+            self.assertEqual(QuizJob.query.count(), 2)
+            self.assertEqual(sorted(thumbnailed), ['https://example.com/a.xml/1.jpg', 'https://example.com/a.xml/2.jpg'])
+            self.assertEqual(Quiz.query.count(), 0)
+
+    # Tests that an article from a feed that was rolled back doesn't make a later copy a near-duplicate
+    def test_rolled_back_feed_does_not_count(self):
+        body = story(random.Random(13))
+        feeds = {'https://example.com/a.xml': 'Talks collapse', 'https://example.com/b.xml': 'Talks collapse, minister says'}
+
+        def fake_parse(url, etag=None, modified=None, timeout=None):
+            return feedparser.FeedParserDict(bozo=False, status=200, entries=[
+                feedparser.FeedParserDict(title=feeds[url], link=f'{url}/0', published='Mon, 09 Dec 2024 10:00:00 GMT')
+            ])
+
+        calls = []
+
+        # the first feed to commit fails after inserting its article
+        def enqueue(article_ids):
+            calls.append(article_ids)
+            if len(calls) == 1:
+                raise RuntimeError('queue unavailable')
+            return len(article_ids)
+
+        # one worker per stage, so the feeds reach persist in order
+        app.config['FEED_MAX_CONCURRENCY'] = app.config['FETCH_MAX_WORKERS'] = 1
+        try:
+            with app.app_context(), patch.object(news_fetcher, 'download_feed', side_effect=fake_parse),                  patch.object(news_fetcher, 'get_full_article_content', return_value=(body, None)),                  patch.object(news_fetcher, 'enqueue_quiz_jobs', side_effect=enqueue):
+                stats = news_fetcher.fetch_articles()
+                self.assertEqual((stats['added'], stats['near_duplicates'], stats['feed_errors']), (1, 0, 1))
+                self.assertEqual([title for (title,) in db.session.query(Article.title)],
+                                 ['Talks collapse, minister says'])
+        finally:
+            app.config['FEED_MAX_CONCURRENCY'] = app.config['FETCH_MAX_WORKERS'] = 8
+
+    # Tests that the check can be turned off
+    def test_disabled(self):
+        app.config['NEAR_DUPLICATE_MAX_DISTANCE'] = -1
+        app.config['FEEDS'] = ['https://example.com/a.xml']
+        body = story(random.Random(5))
+        feed = feedparser.FeedParserDict(bozo=False, status=200, entries=[
+            feedparser.FeedParserDict(title=title, link=f'https://example.com/{i}', published='Mon, 09 Dec 2024 10:00:00 GMT')
+            for i, title in enumerate(['First', 'Second'])
+        ])
+        with app.app_context(), patch.object(news_fetcher, 'download_feed', return_value=feed), \
+             patch.object(news_fetcher, 'get_full_article_content', return_value=(body, None)):
+            stats = news_fetcher.fetch_articles()
+            self.assertEqual((stats['added'], stats['near_duplicates']), (2, 0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,353 @@
+import unittest
+from unittest.mock import patch
+from app import create_app, db
+from app import news_fetcher
+from app.feeds import feed_states
+from app.models import Article, ArticleFingerprint, FeedState, QuizJob
+from app.near_duplicates import rebuild_fingerprints
+from app.pipeline import Pipeline
+from app.search import search_articles
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from sqlalchemy import event
+import feedparser
+import hashlib
+import os
+import threading
+import time
+
+app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+# Local stand-in for an RSS host: serves a fixture feed with ETag/Last-Modified
+# and answers 304 when the client's validators still match
+class FixtureFeedHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = self.server.feed_body
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        modified = self.server.last_modified
+        self.server.requests.append(dict(self.headers))
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/rss+xml; charset=utf-8')
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', modified)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+# A feed host that accepts the connection and then doesn't answer for a while
+class StalledFeedHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(2)
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+class NewsFetcherTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    # Builds a parsed feed with the given titles, the way feedparser returns it
+    @staticmethod
+    def fake_feed(titles):
+        return feedparser.FeedParserDict(bozo=False, entries=[
+            feedparser.FeedParserDict(title=title, link=f'https://example.com/{i}',
+                                      published='Mon, 09 Dec 2024 10:00:00 GMT')
+            for i, title in enumerate(titles)
+        ])
+
+    # Stand-in for newspaper: sleeps longer for the 'slow' article
+    @staticmethod
+    def fake_content(url, title, timeout=None):
+        if 'slow' in url:
+            time.sleep(1.5)
+        elif 'broken' in url:
+            raise ValueError('download failed')
+        return f'Body of {title}', None
+
+    # Tests that articles download concurrently and a slow one does not hold up the rest
+    def test_download_stage_concurrent_with_timeout(self):
+        now = datetime.utcnow()
+        entries = [news_fetcher.Entry(None, f'Article {i}', f'https://example.com/{i}', now, None) for i in range(6)]
+        entries.append(news_fetcher.Entry(None, 'Slow', 'https://example.com/slow', now, None))
+        entries.append(news_fetcher.Entry(None, 'Broken', 'https://example.com/broken', now, None))
+
+        pipeline = Pipeline()
+        with patch.object(news_fetcher, 'get_full_article_content', side_effect=self.fake_content):
+            start = time.perf_counter()
+            results = list(news_fetcher.download_stage(pipeline, entries, workers=4, timeout=0.5))
+            duration = time.perf_counter() - start
+
+        by_title = {entry.title: entry for entry in results}
+        self.assertEqual(len(by_title), len(entries))
+        self.assertEqual((by_title['Article 0'].text, by_title['Article 0'].error), ('Body of Article 0', None))
+        self.assertEqual(by_title['Slow'].error, 'timeout')
+        self.assertIsInstance(by_title['Broken'].error, ValueError)
+        self.assertLess(duration, 1.5)
+        metrics = pipeline.report()['download']
+        self.assertEqual((metrics['in'], metrics['out'], metrics['errors']), (8, 8, 2))
+
+    # Tests that an entry whose download failed is downloaded on the next poll, though newer entries were stored
+    def test_failed_entry_retried_next_poll(self):
+        failing = {'Story B'}
+
+        def feed(titles):
+            return feedparser.FeedParserDict(bozo=False, status=200, etag='"v1"', entries=[
+                feedparser.FeedParserDict(title=title, link=f'https://example.com/{title[-1]}', id=title[-1],
+                                          published='Mon, 09 Dec 2024 10:00:00 GMT')
+                for title in titles
+            ])
+
+        def content(url, title, timeout=None):
+            if title in failing:
+                raise ValueError('download failed')
+            return f'Body of {title}', None
+
+        feed_url = app.config['FEEDS'][0]
+        with app.app_context(), patch.object(news_fetcher, 'get_full_article_content', side_effect=content):
+            with patch.object(news_fetcher, 'download_feed', return_value=feed(['Story A', 'Story B', 'Story C'])):
+                stats = news_fetcher.fetch_articles([feed_url])
+            self.assertEqual((stats['added'], stats['failed']), (2, 1))
+            state = FeedState.query.filter_by(feed_url=feed_url).one()
+            self.assertEqual(state.get_seen_guids(), ['C'])
+            self.assertIsNone(state.etag)
+
+            failing.clear()
+            with patch.object(news_fetcher, 'download_feed',
+                              return_value=feed(['Story D', 'Story A', 'Story B', 'Story C'])) as parse:
+                stats = news_fetcher.fetch_articles([feed_url])
+            self.assertIsNone(parse.call_args.kwargs['etag'])
+            self.assertEqual((stats['added'], stats['existing'], stats['failed']), (2, 1, 0))
+            self.assertEqual(Article.query.filter_by(title='Story B').count(), 1)
+            self.assertEqual(FeedState.query.filter_by(feed_url=feed_url).one().get_seen_guids(), ['D', 'A', 'B', 'C'])
+
+    # Tests that a slow thumbnail costs the thumbnail, not the article it belongs to
+    def test_slow_thumbnail_keeps_article(self):
+        def thumbnail(image_url):
+            time.sleep(1.0 if 'slow' in image_url else 0)
+            return 'key-' + image_url[-1]
+
+        now = datetime.utcnow()
+        entries = [news_fetcher.Entry(None, f'Article {i}', f'https://example.com/{i}', now, None) for i in range(2)]
+        images = {'Article 0': 'https://example.com/img/0', 'Article 1': 'https://example.com/img/slow'}
+        pipeline = Pipeline()
+        with patch.object(news_fetcher, 'get_full_article_content',
+                          side_effect=lambda url, title, timeout=None: (f'Body of {title}', images[title])):
+            # the image takes longer than the article timeout and the thumbnail timeout
+            downloaded = news_fetcher.download_stage(pipeline, entries, workers=2, timeout=0.5)
+            results = list(news_fetcher.image_stage(pipeline, downloaded, workers=2, timeout=0.5, thumbnail=thumbnail))
+
+        by_title = {entry.title: entry for entry in results}
+        self.assertEqual((by_title['Article 0'].error, by_title['Article 0'].thumbnail_key), (None, 'key-0'))
+        self.assertEqual((by_title['Article 1'].error, by_title['Article 1'].thumbnail_key), (None, None))
+        self.assertEqual(pipeline.report()['thumbnail']['errors'], 1)
+
+    # Tests that a feed that is slow to poll doesn't hold up committing a fast one
+    def test_fast_feed_commits_before_slow_poll(self):
+        slow_url, fast_url = 'https://example.com/late.xml', 'https://example.com/quick.xml'
+        fast_committed = threading.Event()
+        released = []
+        finished = []
+
+        def parse(url, etag=None, modified=None, timeout=None):
+            if url == slow_url:
+                # only returns early if the fast feed gets committed while this poll is still running
+                released.append(fast_committed.wait(3))
+            return feedparser.FeedParserDict(bozo=False, status=200, entries=[
+                feedparser.FeedParserDict(title=f'Story from {url}', link=f'{url}/1',
+                                          published='Mon, 09 Dec 2024 10:00:00 GMT')
+            ])
+
+        finish_feed_run = news_fetcher.finish_feed_run
+
+        def finish(run, *args, **kwargs):
+            finish_feed_run(run, *args, **kwargs)
+            finished.append(run.feed_url)
+            if run.feed_url == fast_url:
+                fast_committed.set()
+
+        with app.app_context(), patch.object(news_fetcher, 'download_feed', side_effect=parse), \
+             patch.object(news_fetcher, 'get_full_article_content', side_effect=self.fake_content), \
+             patch.object(news_fetcher, 'finish_feed_run', side_effect=finish):
+            stats = news_fetcher.fetch_articles([slow_url, fast_url])
+
+        self.assertEqual(stats['added'], 2)
+        self.assertEqual(finished, [fast_url, slow_url])
+        self.assertEqual(released, [True])
+
+    # Tests that databases without an insert-or-ignore statement skip duplicate titles row by row
+    def test_insert_articles_fallback(self):
+        now = datetime.utcnow()
+        rows = [{'title': title, 'content': 'Body', 'source': 'https://example.com', 'date_posted': now}
+                for title in ['Old news', 'Story 1', 'Story 2']]
+        with app.app_context():
+            db.session.add(Article(title='Old news', content='Old', source='https://example.com/old', date_posted=now))
+            db.session.commit()
+            with patch.object(news_fetcher, 'insert_ignore_statement', return_value=None):
+                self.assertEqual(set(news_fetcher.insert_articles(rows)), {'Story 1', 'Story 2'})
+            db.session.commit()
+            self.assertEqual(Article.query.count(), 3)
+
+    # Tests that a title someone else stored after dedup is skipped, not fingerprinted and queued as ours
+    def test_title_inserted_concurrently(self):
+        article_ids_by_title = news_fetcher.article_ids_by_title
+        words = 'storm coast rescue flood river bridge town council warning rain wind power school road'.split()
+        body = ' '.join(f'{word}{i}' for word in words for i in range(3))  # long enough to fingerprint
+        for returning in (True, False):
+            with self.subTest(returning=returning), app.app_context():
+                # stored (with its fingerprint) by another process, after dedup looked for it
+                theirs = Article(title='Story 0', content=body, source='https://example.com/x', date_posted=datetime.utcnow())
+                db.session.add(theirs)
+                db.session.commit()
+                rebuild_fingerprints()
+                lookups = []
+
+                # dedup's lookup misses it; later ones see it
+                def lookup(titles):
+                    lookups.append(titles)
+                    return {} if len(lookups) == 1 else article_ids_by_title(titles)
+
+                with patch.object(news_fetcher, 'download_feed', return_value=self.fake_feed(['Story 0', 'Story 1'])), \
+                     patch.object(news_fetcher, 'get_full_article_content', return_value=(body, None)), \
+                     patch.object(news_fetcher, 'article_ids_by_title', side_effect=lookup), \
+                     patch.object(news_fetcher, 'supports_insert_returning', return_value=returning), \
+                     patch.object(news_fetcher, 'near_duplicate_of', return_value=None):
+                    stats = news_fetcher.fetch_articles([app.config['FEEDS'][0]])
+
+                self.assertEqual((stats['added'], stats['feed_errors']), (1, 0))
+                ours = Article.query.filter_by(title='Story 1').one()
+                self.assertEqual(sorted(fingerprint.article_id for fingerprint in ArticleFingerprint.query),
+                                 sorted([theirs.id, ours.id]))
+                self.assertEqual([job.article_id for job in QuizJob.query], [ours.id])
+                db.session.remove()
+                db.drop_all()
+                db.create_all()
+
+    # Tests that a feed run dedups with one batched lookup and inserts in chunks with a single commit
+    def test_fetch_articles_batched_dedup_and_insert(self):
+        with app.app_context():
+            db.session.add(Article(title='Old news', content='Old', source='https://example.com/old',
+                                   date_posted=datetime.utcnow()))
+            # the feed is already registered; registering it is a commit of its own
+            feed_states(app.config['FEEDS'])
+            db.session.commit()
+
+            titles = ['Old news'] + [f'Story {i}' for i in range(5)] + ['Story 0']
+            statements = []
+            commits = []
+            engine = db.engine
+
+            def count_statement(conn, cursor, statement, params, context, executemany):
+                statements.append(statement)
+
+            def count_commit(conn):
+                commits.append(conn)
+
+            app.config['FETCH_INSERT_CHUNK_SIZE'] = 2
+            event.listen(engine, 'before_cursor_execute', count_statement)
+            event.listen(engine, 'commit', count_commit)
+            try:
+                with patch.object(news_fetcher, 'download_feed', return_value=self.fake_feed(titles)), \
+                     patch.object(news_fetcher, 'get_full_article_content', side_effect=self.fake_content):
+                    stats = news_fetcher.fetch_articles()
+            finally:
+                event.remove(engine, 'before_cursor_execute', count_statement)
+                event.remove(engine, 'commit', count_commit)
+                app.config['FETCH_INSERT_CHUNK_SIZE'] = 100
+
+            self.assertEqual(stats['added'], 5)
+            self.assertEqual(stats['existing'], 1)
+            self.assertEqual(Article.query.count(), 6)
+            selects = [s for s in statements if s.lstrip().startswith('SELECT article.title')]
+            inserts = [s for s in statements if s.lstrip().startswith('INSERT INTO article (')]
+            self.assertEqual(len(selects), 1)  # dedup lookup; the new rows' IDs come back from the insert
+            self.assertEqual(len(inserts), 3)  # chunks of 2, 2 and 1
+            self.assertEqual(len(commits), 1)
+            # new articles are searchable as soon as the feed run commits
+            self.assertEqual(len(search_articles('Body').items), 5)
+            self.assertEqual(Article.query.filter_by(title='Story 0').one().content_html, '<p>Body of Story 0</p>')
+            # every stage reports what went through it
+            self.assertEqual(list(stats['stages']), ['fetch', 'normalize', 'dedup', 'download', 'clean', 'thumbnail', 'persist'])
+            self.assertEqual(stats['stages']['dedup']['out'], 5)
+            self.assertEqual(stats['stages']['persist']['out'], 5)
+
+    # Tests that a feed host that never answers fails the poll after FEED_TIMEOUT instead of holding up the run
+    def test_feed_timeout(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), StalledFeedHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        feed_url = f'http://127.0.0.1:{server.server_port}/rss.xml'
+        app.config['FEED_TIMEOUT'] = 0.3
+        try:
+            with app.app_context():
+                start = time.perf_counter()
+                stats = news_fetcher.fetch_articles([feed_url])
+                duration = time.perf_counter() - start
+                self.assertEqual(stats['feed_errors'], 1)
+                self.assertLess(duration, 1.5)
+                self.assertEqual(FeedState.query.filter_by(feed_url=feed_url).one().consecutive_failures, 1)
+        finally:
+            app.config['FEED_TIMEOUT'] = 20
+            server.shutdown()
+            server.server_close()
+
+    # Tests conditional GET against a local feed server and stopping at already-seen entries
+    def test_fetch_articles_conditional_get_and_seen_guids(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureFeedHandler)
+        server.requests = []
+        server.last_modified = 'Mon, 09 Dec 2024 08:00:00 GMT'
+        with open(os.path.join(FIXTURES, 'bbc_world.xml'), 'rb') as f:
+            server.feed_body = f.read()
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        feed_url = f'http://127.0.0.1:{server.server_port}/news/world/rss.xml'
+
+        try:
+            with app.app_context(), \
+                 patch.object(news_fetcher, 'get_full_article_content', side_effect=self.fake_content) as download:
+                # first poll downloads everything and stores the validators
+                stats = news_fetcher.fetch_articles([feed_url])
+                self.assertEqual(stats['added'], 3)
+                state = FeedState.query.filter_by(feed_url=feed_url).first()
+                self.assertEqual(state.last_status, 200)
+                self.assertIsNotNone(state.etag)
+                self.assertEqual(state.get_seen_guids(), ['c0001', 'c0002', 'c0003'])
+
+                # second poll is answered with 304 and does no work
+                stats = news_fetcher.fetch_articles([feed_url])
+                self.assertEqual(stats['not_modified'], 1)
+                self.assertEqual(server.requests[-1].get('If-None-Match'), state.etag)
+                self.assertEqual(download.call_count, 3)
+
+                # a new item on top: processing stops at the first seen GUID
+                with open(os.path.join(FIXTURES, 'bbc_world_updated.xml'), 'rb') as f:
+                    server.feed_body = f.read()
+                with patch.object(news_fetcher, 'article_ids_by_title', wraps=news_fetcher.article_ids_by_title) as lookup:
+                    stats = news_fetcher.fetch_articles([feed_url])
+                self.assertEqual(stats['added'], 1)
+                self.assertEqual(list(lookup.call_args_list[0][0][0]), ['Central bank holds interest rates steady'])
+                self.assertEqual(download.call_count, 4)
+                self.assertEqual(FeedState.query.filter_by(feed_url=feed_url).first().get_seen_guids()[0], 'c0004')
+                self.assertEqual(Article.query.count(), 4)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+if __name__ == '__main__':
+    unittest.main()
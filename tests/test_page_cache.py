@@ -0,0 +1,103 @@
+import unittest
+from unittest.mock import patch
+from app import create_app, db, bcrypt
+from app import news_fetcher
+from app.models import User, Article
+from app.page_cache import clear_page_cache, listing_version
+from datetime import datetime
+from sqlalchemy import event
+import feedparser
+import shutil
+import tempfile
+import os
+
+app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+
+class PageCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.stamp_dir = tempfile.mkdtemp()
+        app.config['LISTING_STAMP_PATH'] = os.path.join(self.stamp_dir, 'listing.stamp')
+        clear_page_cache()
+        self.client = app.test_client()
+        with app.app_context():
+            db.create_all()
+            password_hash = bcrypt.generate_password_hash('password').decode('utf-8')
+            db.session.add(User(username='reader', email='reader@example.com', password=password_hash))
+            db.session.add(Article(title='First story', content='Body.', source='https://example.com/1',
+                                   date_posted=datetime(2024, 1, 1)))
+            db.session.commit()
+
+    def tearDown(self):
+        app.config['LISTING_STAMP_PATH'] = None
+        shutil.rmtree(self.stamp_dir)
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    # Runs request and returns (response, number of SQL statements it executed)
+    def count_queries(self, request):
+        statements = []
+        with app.app_context():
+            listener = lambda conn, cursor, statement, *args: statements.append(statement)
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            try:
+                response = request()
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', listener)
+        return response, len(statements)
+
+    # Tests that anonymous listing pages are cached and revalidated with 304s
+    def test_anonymous_pages_cached_and_revalidated(self):
+        first, _ = self.count_queries(lambda: self.client.get('/articles'))
+        self.assertEqual(first.status_code, 200)
+        self.assertIn(b'First story', first.data)
+        self.assertEqual(first.headers['Cache-Control'], 'public, no-cache')
+        etag = first.headers['ETag']
+
+        second, queries = self.count_queries(lambda: self.client.get('/articles'))
+        self.assertEqual((second.data, second.headers['ETag'], queries), (first.data, etag, 0))
+
+        revalidated, queries = self.count_queries(lambda: self.client.get('/articles', headers={'If-None-Match': etag}))
+        self.assertEqual((revalidated.status_code, revalidated.data, queries), (304, b'', 0))
+
+        since = self.client.get('/articles', headers={'If-Modified-Since': first.headers['Last-Modified']})
+        self.assertEqual(since.status_code, 304)
+
+        # other pages are cached under their own key
+        self.assertNotEqual(self.client.get('/articles?page=1').headers['ETag'], etag)
+
+    # Tests that a fetch run adding articles invalidates cached pages
+    def test_fetch_articles_invalidates(self):
+        etag = self.client.get('/articles').headers['ETag']
+        feed = feedparser.FeedParserDict(bozo=False, entries=[feedparser.FeedParserDict(
+            title='Breaking story', link='https://example.com/2', published='Mon, 09 Dec 2024 10:00:00 GMT')])
+        with app.app_context():
+            before = listing_version()
+            with patch.object(news_fetcher, 'download_feed', return_value=feed), \
+                 patch.object(news_fetcher, 'get_full_article_content', return_value=('Body.', None)):
+                news_fetcher.fetch_articles()
+            self.assertGreater(listing_version(), before)
+
+        response = self.client.get('/articles', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Breaking story', response.data)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    # Tests that signed-in users and pending flash messages bypass the cache
+    def test_bypass(self):
+        self.client.get('/articles')
+        with self.client.session_transaction() as session:
+            session['_flashes'] = [('info', 'Hello there')]
+        response = self.client.get('/articles')
+        self.assertIn(b'Hello there', response.data)
+        self.assertEqual(response.headers['Cache-Control'], 'private, no-cache')
+
+        self.client.post('/login', data=dict(email='reader@example.com', password='password'))
+        response = self.client.get('/articles')
+        self.assertNotIn('ETag', response.headers)
+        self.assertIn(b'Logout', response.data)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+from app import create_app, db, bcrypt
+from app.models import Article, Comment, Quiz, User, UserQuiz
+from app.pagination import article_keyset_page, decode_cursor, invalidate_article_count
+from datetime import datetime, timedelta
+from sqlalchemy import event
+
+app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+
+class PaginationTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.app = app.test_client()
+        with app.app_context():
+            db.create_all()
+            # pairs of articles share a timestamp, so the id tie-breaker matters
+            start = datetime(2024, 12, 1)
+            for i in range(30):
+                db.session.add(Article(title=f'Article {i}', content='Content here.', source='https://example.com',
+                                       date_posted=start + timedelta(hours=i // 2)))
+            db.session.commit()
+        invalidate_article_count()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+        invalidate_article_count()
+
+    # Tests that following cursors visits every article exactly once, newest first
+    def test_keyset_pages_cover_all_articles(self):
+        with app.app_context():
+            expected = [a.id for a in Article.query.order_by(Article.date_posted.desc(), Article.id.desc())]
+            seen = []
+            cursor = None
+            while True:
+                page = article_keyset_page(cursor, per_page=12)
+                seen.extend(article.id for article in page.items)
+                if not page.has_next:
+                    break
+                cursor = page.next_cursor
+            self.assertEqual(seen, expected)
+            self.assertEqual(page.total, 30)
+
+    # Tests the ?after= route and that bad cursors fall back to the first page
+    def test_articles_route_cursor_mode(self):
+        first = self.app.get('/articles?after=')
+        self.assertEqual(first.status_code, 200)
+        self.assertIn(b'Article 29', first.data)
+        self.assertIn(b'Older', first.data)
+
+        with app.app_context():
+            cursor = article_keyset_page(None, per_page=12).next_cursor
+        second = self.app.get(f'/articles?after={cursor}')
+        self.assertNotIn(b'Article 29', second.data)
+        self.assertIn(b'Article 17', second.data)
+
+        self.assertIsNone(decode_cursor('not-a-cursor'))
+        self.assertEqual(self.app.get('/articles?after=garbage').status_code, 200)
+
+    # Tests that numbered pages are still used for small tables
+    def test_articles_route_numbered_mode(self):
+        response = self.app.get('/articles?page=3')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Article 0', response.data)
+        self.assertIn(b'page=2', response.data)
+
+    # Tests that the comment thread loads in a constant number of queries and pages with "load more"
+    def test_comment_thread_eager_loaded_and_paginated(self):
+        app.config['WTF_CSRF_ENABLED'] = False
+        with app.app_context():
+            password_hash = bcrypt.generate_password_hash('password').decode('utf-8')
+            users = [User(username=f'user{i}', email=f'user{i}@example.com', password=password_hash) for i in range(5)]
+            db.session.add_all(users)
+            article = Article.query.filter_by(title='Article 0').first()
+            quiz = Quiz(article_id=article.id, questions='[]')
+            db.session.add(quiz)
+            db.session.flush()
+            db.session.add(UserQuiz(user_id=users[0].id, quiz_id=quiz.id, passed=True, attempted=True, score=5))
+            start = datetime(2024, 12, 2)
+            for i in range(45):
+                db.session.add(Comment(content=f'Comment number {i:02d}', author=users[i % 5], article_id=article.id,
+                                       date_posted=start + timedelta(minutes=i)))
+            db.session.commit()
+            article_id = article.id
+
+        self.app.post('/login', data=dict(email='user0@example.com', password='password'))
+
+        statements = []
+        def count_statement(conn, cursor, statement, params, context, executemany):
+            statements.append(statement)
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', count_statement)
+        try:
+            response = self.app.get(f'/article/{article_id}')
+        finally:
+            event.remove(engine, 'before_cursor_execute', count_statement)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Comment number 19', response.data)
+        self.assertNotIn(b'Comment number 20', response.data)
+        comment_queries = [s for s in statements if 'FROM comment' in s]
+        self.assertEqual(len(comment_queries), 1)
+        self.assertIn('JOIN user', comment_queries[0])
+        # no per-comment author lookups
+        self.assertLessEqual(len([s for s in statements if s.lstrip().startswith('SELECT user.')]), 1)
+
+        cursor = response.data.split(b'data-next-cursor="')[1].split(b'"')[0].decode()
+        more = self.app.get(f'/article/{article_id}/comments?after={cursor}')
+        self.assertIn(b'Comment number 20', more.data)
+        self.assertNotIn(b'Comment number 19', more.data)
+        last = self.app.get(f'/article/{article_id}/comments?after={more.headers["X-Next-Cursor"]}')
+        self.assertIn(b'Comment number 44', last.data)
+        self.assertNotIn('X-Next-Cursor', last.headers)
+
+if __name__ == '__main__':
+    unittest.main()
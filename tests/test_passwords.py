@@ -0,0 +1,71 @@
+import unittest
+from unittest.mock import patch
+from app import create_app, db, bcrypt
+from app import passwords
+from app.models import User
+from app.passwords import hash_password, verify_password, needs_rehash, rehash_if_needed
+
+app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+
+class PasswordHashingTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['BCRYPT_LOG_ROUNDS'] = 5
+        self.client = app.test_client()
+        with app.app_context():
+            db.create_all()
+            # stored under an older, cheaper policy
+            password_hash = bcrypt.generate_password_hash('password', rounds=4).decode('utf-8')
+            db.session.add(User(username='reader', email='reader@example.com', password=password_hash))
+            db.session.commit()
+
+    def tearDown(self):
+        app.config['BCRYPT_LOG_ROUNDS'] = 12
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    # Tests that new hashes use the configured cost and old ones still verify
+    def test_hash_and_verify(self):
+        with app.app_context():
+            stored = hash_password('secret')
+            self.assertTrue(stored.startswith('$2b$05$'))
+            self.assertTrue(verify_password(stored, 'secret'))
+            self.assertFalse(verify_password(stored, 'wrong'))
+            self.assertFalse(verify_password('not a hash', 'secret'))
+            self.assertFalse(needs_rehash(stored))
+            self.assertTrue(needs_rehash(User.query.one().password))
+
+    # Tests that logging in upgrades an out of date hash without locking the user out
+    def test_login_rehashes_to_current_cost(self):
+        with app.app_context():
+            user = User.query.one()
+            old_hash = user.password
+            future = rehash_if_needed(user, 'password')
+        self.assertTrue(future.result(timeout=10))
+        with app.app_context():
+            new_hash = User.query.one().password
+        self.assertNotEqual(new_hash, old_hash)
+        self.assertTrue(new_hash.startswith('$2b$05$'))
+
+        response = self.client.post('/login', data=dict(email='reader@example.com', password='password'),
+                                    follow_redirects=True)
+        self.assertIn(b'Login successful', response.data)
+        with app.app_context():
+            self.assertIsNone(rehash_if_needed(User.query.one(), 'password'))
+
+    # Tests that a failed background rehash is logged and leaves the old hash in place
+    def test_failed_rehash_is_logged(self):
+        with app.app_context():
+            user = User.query.one()
+            old_hash = user.password
+            with patch.object(passwords, 'hash_password', side_effect=RuntimeError('hasher unavailable')), \
+                 self.assertLogs(app.logger, 'ERROR') as logs:
+                self.assertFalse(rehash_if_needed(user, 'password').result(timeout=10))
+        self.assertIn('hasher unavailable', logs.output[0])
+        with app.app_context():
+            self.assertEqual(User.query.one().password, old_hash)
+
+if __name__ == '__main__':
+    unittest.main()
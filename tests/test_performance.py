@@ -1,12 +1,61 @@
 import unittest
-from app import app, db, bcrypt
-from app.models import User
-from time import time
+from app import create_app, db, bcrypt
+from app.models import User, Article, ArticleFingerprint, Quiz, UserQuiz, render_paragraphs
+from app.passwords import hash_password
+from app.search import search_articles, rebuild_search_index
+from app.near_duplicates import find_near_duplicate, hamming_distance, rebuild_fingerprints, simhash
+from app import search
+from unittest.mock import patch
+from app.answer_keys import get_answer_key, score_responses, build_answer_key, build_feedback, encode_results
+from app.pagination import article_keyset_page, encode_cursor
+from datetime import datetime, timedelta
+from sqlalchemy import event, text
+from sqlalchemy.orm import undefer
+from time import time, perf_counter
+import json
+import os
+import random
+import subprocess
+import sys
+
+app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+
+# Size of the synthetic archive used by the benchmarks below. The defaults keep a
+# plain test run quick; the figures in the README are measured at 100000, e.g.
+# BENCH_ARTICLES=100000 BENCH_USERS=100000 python -m pytest tests/test_performance.py -s
+BENCH_ARTICLES = int(os.getenv('BENCH_ARTICLES', 2000))
+# Number of synthetic users with a stored quiz attempt
+BENCH_USERS = int(os.getenv('BENCH_USERS', 2000))
+
+WORDS = ('government minister election talks economy climate border market court health '
+         'police storm president vote trade energy war peace report city country').split()
+
+# Bulk inserts a synthetic archive of n articles with roughly body_size bytes of text each
+def seed_articles(n, body_size=3000, seed=1):
+    rng = random.Random(seed)
+    sentences = [' '.join(rng.choice(WORDS) for _ in range(12)).capitalize() + '.' for _ in range(500)]
+    per_body = body_size // 90 + 1
+    start = datetime(2020, 1, 1)
+    batch = []
+    for i in range(n):
+        body = rng.sample(sentences, per_body)
+        batch.append({
+            'title': f'Synthetic article {i}',
+            'content': '\n'.join(body),
+            'source': f'https://example.com/news/{i}',
+            'date_posted': start + timedelta(minutes=i),
+            'image_url': f'https://example.com/images/{i}.jpg',
+        })
+        if len(batch) == 5000:
+            db.session.execute(Article.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(Article.__table__.insert(), batch)
+    db.session.commit()
 
 class PerformanceTestCase(unittest.TestCase):
     def setUp(self):
         app.config['TESTING'] = True
-        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
         app.config['WTF_CSRF_ENABLED'] = False
         self.app = app.test_client()
         with app.app_context():
@@ -31,10 +80,328 @@ class PerformanceTestCase(unittest.TestCase):
                 password='password'
             ), follow_redirects=True)
             self.assertEqual(response.status_code, 200)
-            self.assertIn(b'You have been logged in!', response.data)
+            self.assertIn(b'Login successful', response.data)
+            self.app.get('/logout')
         end_time = time()
         duration = end_time - start_time
         print(f'Time taken for {login_attempts} login attempts: {duration:.2f} seconds')
 
+    # Reports login throughput for each bcrypt work factor in BENCH_BCRYPT_COSTS
+    def test_logins_per_second_by_cost(self):
+        costs = [int(cost) for cost in os.getenv('BENCH_BCRYPT_COSTS', '4,8,10,12').split(',')]
+        login_attempts = 20
+        try:
+            for cost in costs:
+                app.config['BCRYPT_LOG_ROUNDS'] = cost
+                with app.app_context():
+                    user = User.query.filter_by(email='test@example.com').first()
+                    user.password = hash_password('password')
+                    db.session.commit()
+
+                start = perf_counter()
+                for _ in range(login_attempts):
+                    response = self.app.post('/login', data=dict(email='test@example.com', password='password'),
+                                             follow_redirects=True)
+                    self.assertIn(b'Login successful', response.data)
+                    self.app.get('/logout')
+                print(f'bcrypt cost {cost}: {login_attempts / (perf_counter() - start):.1f} logins/s')
+        finally:
+            app.config['BCRYPT_LOG_ROUNDS'] = 12
+
+class ArticleListingBenchmark(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+            seed_articles(BENCH_ARTICLES)
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    # Loads listing pages and returns (bytes fetched per page, seconds per page)
+    @staticmethod
+    def measure_pages(query, pages=20, per_page=12):
+        total_bytes = 0
+        start = perf_counter()
+        for page in range(1, pages + 1):
+            articles = query.limit(per_page).offset((page - 1) * per_page).all()
+            # size of the column values actually loaded onto each object
+            total_bytes += sum(len(str(value)) for article in articles
+                               for key, value in vars(article).items() if not key.startswith('_'))
+            db.session.expunge_all()
+        return total_bytes / pages, (perf_counter() - start) / pages
+
+    # Compares the /articles listing query with and without loading article bodies
+    def test_listing_defers_article_content(self):
+        with app.app_context():
+            ordered = Article.date_posted.desc()
+            full_bytes, full_time = self.measure_pages(Article.query.options(undefer(Article.content)).order_by(ordered))
+            card_bytes, card_time = self.measure_pages(Article.card_query().order_by(ordered))
+
+        print(f'Listing page at {BENCH_ARTICLES} articles: '
+              f'full rows {full_bytes / 1024:.1f} KiB in {full_time * 1000:.1f} ms, '
+              f'card columns {card_bytes / 1024:.1f} KiB in {card_time * 1000:.1f} ms')
+        self.assertLess(card_bytes, full_bytes / 5)
+
+    # Compares a deep numbered page (OFFSET + COUNT) with the equivalent keyset page
+    def test_deep_page_keyset_vs_offset(self):
+        per_page = 12
+        page = BENCH_ARTICLES // per_page - 1
+        ordered = (Article.date_posted.desc(), Article.id.desc())
+        with app.app_context():
+            start = perf_counter()
+            numbered = Article.card_query().order_by(*ordered).paginate(page=page, per_page=per_page)
+            offset_time = perf_counter() - start
+
+            # cursor of the last article on the previous page
+            previous = Article.card_query().order_by(*ordered).offset((page - 1) * per_page - 1).first()
+            cursor = encode_cursor(previous)
+            article_keyset_page(cursor, per_page)  # warm the cached count
+            start = perf_counter()
+            keyset = article_keyset_page(cursor, per_page)
+            keyset_time = perf_counter() - start
+
+        print(f'Page {page} of {BENCH_ARTICLES} articles: OFFSET + COUNT {offset_time * 1000:.1f} ms, '
+              f'keyset {keyset_time * 1000:.1f} ms')
+        self.assertEqual([a.id for a in keyset.items], [a.id for a in numbered.items])
+
+    # Times first-page search latency with the FTS5 index and with the LIKE fallback
+    def test_search_latency(self):
+        queries = ['election', 'storm border', f'{BENCH_ARTICLES // 2}']
+
+        def median_ms(query, runs=5):
+            times = []
+            for _ in range(runs):
+                start = perf_counter()
+                search_articles(query)
+                times.append(perf_counter() - start)
+            return sorted(times)[runs // 2] * 1000
+
+        with app.app_context():
+            start = perf_counter()
+            rebuild_search_index()
+            index_time = perf_counter() - start
+            fts = {query: median_ms(query) for query in queries}
+            with patch.object(search, 'fts_enabled', return_value=False):
+                like = {query: median_ms(query, runs=3) for query in queries}
+            self.assertEqual(len(search_articles(queries[-1]).items), 1)
+
+        print(f'Search at {BENCH_ARTICLES} articles (index built in {index_time:.1f}s): ' +
+              ', '.join(f'"{query}" FTS5 {fts[query]:.1f} ms / LIKE {like[query]:.1f} ms' for query in queries))
+
+    # Fingerprints the archive, then times near-duplicate lookups for edited copies of stored
+    # articles and for unrelated new ones, against scanning every fingerprint
+    def test_near_duplicate_lookup(self, probes=200):
+        rng = random.Random(2)
+        with app.app_context():
+            start = perf_counter()
+            rebuild_fingerprints()
+            fingerprint_time = perf_counter() - start
+
+            # a stored body with a word changed and a line added, as a retitled or syndicated copy would be
+            originals = db.session.query(Article.id, Article.content).filter(
+                Article.id.in_(rng.sample(range(1, BENCH_ARTICLES + 1), probes))).all()
+            copies = [(article_id, simhash(content.replace(' ', ' said ', 1) + '\nAdditional reporting by staff.'))
+                      for article_id, content in originals]
+            sentences = [' '.join(rng.choice(WORDS) for _ in range(12)).capitalize() + '.' for _ in range(500)]
+            fresh = [simhash('\n'.join(rng.sample(sentences, 34))) for _ in range(probes)]
+
+            start = perf_counter()
+            found = [find_near_duplicate(fingerprint) for _, fingerprint in copies]
+            false_matches = [find_near_duplicate(fingerprint) for fingerprint in fresh]
+            lookup_time = (perf_counter() - start) / (2 * probes)
+
+            # the same check without the band index
+            distance = app.config['NEAR_DUPLICATE_MAX_DISTANCE']
+            start = perf_counter()
+            stored = [value % 2 ** 64 for (value,) in db.session.query(ArticleFingerprint.simhash)]
+            scanned = [any(hamming_distance(fresh[0], value) <= distance for value in stored)]
+            scan_time = perf_counter() - start
+
+        recall = sum(match is not None and match[0] == article_id for (article_id, _), match in zip(copies, found)) / probes
+        print(f'Near-duplicates at {BENCH_ARTICLES} articles: fingerprinted in {fingerprint_time:.1f}s '
+              f'({fingerprint_time / BENCH_ARTICLES * 1000:.2f} ms each), banded lookup {lookup_time * 1000:.2f} ms, '
+              f'full scan {scan_time * 1000:.0f} ms, recall {recall:.0%}, '
+              f'{sum(match is not None for match in false_matches)} of {probes} unrelated matched')
+        self.assertGreaterEqual(recall, 0.95)
+        self.assertFalse(any(false_matches) or any(scanned))
+
+class QuizScoringBenchmark(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.questions = [
+            {'question': f'Question {i} about ' + ' '.join(WORDS[:8]) + '?',
+             'options': [f'Option {c} for question {i}' for c in 'ABCD'],
+             'correct_answer': f'Option B for question {i}'}
+            for i in range(5)
+        ]
+        self.responses = {f'question_{i}': f'Option B for question {i}' for i in range(5)}
+        with app.app_context():
+            db.create_all()
+            article = Article(title='Scored article', content='Body.', source='https://example.com',
+                              date_posted=datetime.utcnow())
+            db.session.add(article)
+            db.session.flush()
+            db.session.add(Quiz(article_id=article.id, questions=json.dumps(self.questions)))
+            db.session.commit()
+            self.article_id = article.id
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    # Scoring as submit_quiz used to do it: load the quiz row and parse every question
+    def legacy_score(self):
+        quiz = Quiz.query.filter_by(article_id=self.article_id).first()
+        score = 0
+        for i, question in enumerate(json.loads(quiz.questions)):
+            if self.responses.get(f'question_{i}') == question.get('correct_answer'):
+                score += 1
+        db.session.expunge_all()
+        return score
+
+    def cached_score(self):
+        return score_responses(get_answer_key(self.article_id), self.responses)[0]
+
+    # Compares submissions scored per second with and without the cached answer key
+    def test_cached_answer_key_scoring(self):
+        submissions = 2000
+        with app.app_context():
+            self.assertEqual(self.legacy_score(), self.cached_score())
+            # best of several interleaved rounds, so a noisy moment doesn't decide the comparison
+            rates = {'legacy': 0.0, 'cached key': 0.0}
+            for _ in range(5):
+                for name, score in (('legacy', self.legacy_score), ('cached key', self.cached_score)):
+                    start = perf_counter()
+                    for _ in range(submissions // 5):
+                        score()
+                    rates[name] = max(rates[name], submissions // 5 / (perf_counter() - start))
+
+        print('Quiz scoring: ' + ', '.join(f'{name} {rate:.0f} submissions/s' for name, rate in rates.items()))
+
+    # Tests that scoring with a cached key reads only the quiz version, never the questions
+    def test_cached_key_queries(self):
+        statements = []
+
+        def count_statement(conn, cursor, statement, params, context, executemany):
+            statements.append(statement)
+
+        with app.app_context():
+            self.cached_score()
+            event.listen(db.engine, 'before_cursor_execute', count_statement)
+            try:
+                for _ in range(10):
+                    self.cached_score()
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', count_statement)
+
+        self.assertEqual(len(statements), 10)
+        self.assertFalse(any('questions' in statement for statement in statements))
+
+    # Compares the on-disk size of user_quiz with full feedback and with compact results
+    def test_compact_results_size(self):
+        rng = random.Random(1)
+        key = build_answer_key(1, None, json.dumps(self.questions))
+
+        def database_size():
+            db.session.commit()
+            db.session.execute(text('VACUUM'))
+            return db.session.execute(text('PRAGMA page_count')).scalar() * \
+                db.session.execute(text('PRAGMA page_size')).scalar()
+
+        with app.app_context():
+            quiz_id = Quiz.query.one().id
+            attempts = []
+            for user_id in range(1, BENCH_USERS + 1):
+                chosen = [rng.randrange(4) for _ in key.options]
+                results = [index == correct for index, correct in zip(chosen, key.correct)]
+                attempts.append((user_id, sum(results), chosen, results))
+
+            empty = database_size()
+            rows = [{'user_id': user_id, 'quiz_id': quiz_id, 'attempted': True, 'passed': score == 5, 'score': score,
+                     'results_json': json.dumps(build_feedback(key, chosen, results))}
+                    for user_id, score, chosen, results in attempts]
+            db.session.execute(UserQuiz.__table__.insert(), rows)
+            legacy = database_size() - empty
+
+            for row, (_, _, chosen, results) in zip(rows, attempts):
+                row['results_json'] = encode_results(chosen, results)
+            db.session.execute(UserQuiz.__table__.delete())
+            db.session.execute(UserQuiz.__table__.insert(), rows)
+            compact = database_size() - empty
+
+        print(f'user_quiz for {BENCH_USERS} users: full feedback {legacy / 2 ** 20:.1f} MiB, '
+              f'compact results {compact / 2 ** 20:.1f} MiB')
+        self.assertLess(compact, legacy / 4)
+
+class ArticleRenderBenchmark(unittest.TestCase):
+    # the article body markup article.html used to build on every view
+    SPLIT_TEMPLATE = """{% for paragraph in article.content.split('\\n') %}
+        {% if paragraph.strip() %}
+            <p>{{ paragraph }}</p>
+        {% endif %}
+    {% endfor %}"""
+    PRERENDERED_TEMPLATE = "{{ article.body_html }}"
+
+    # Compares rendering a long article body from content with emitting the stored content_html
+    def test_prerendered_body(self):
+        rng = random.Random(1)
+        paragraphs = [' '.join(rng.choice(WORDS) for _ in range(70)).capitalize() + ' "quoted" & <tagged>.'
+                      for _ in range(300)]
+        content = '\n\n'.join(paragraphs)
+        article = Article(title='Long read', content=content, content_html=render_paragraphs(content))
+        renders = 300
+        with app.app_context():
+            timings = {}
+            for name, source in (('split per view', self.SPLIT_TEMPLATE), ('pre-rendered', self.PRERENDERED_TEMPLATE)):
+                template = app.jinja_env.from_string(source)
+                template.render(article=article)
+                start = perf_counter()
+                for _ in range(renders):
+                    html = template.render(article=article)
+                timings[name] = (perf_counter() - start) / renders
+                self.assertEqual(html.count('<p>'), len(paragraphs))
+
+        print(f'Article body with {len(paragraphs)} paragraphs ({len(content) / 1024:.0f} KiB): ' +
+              ', '.join(f'{name} {seconds * 1000:.2f} ms/render' for name, seconds in timings.items()))
+
+class StartupBenchmark(unittest.TestCase):
+    # measured in a fresh interpreter; prints one JSON line
+    STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+web = app.create_app({'TESTING': True})
+created = time.perf_counter()
+with web.app_context():
+    app.db.create_all()
+response = web.test_client().get('/articles')
+served = time.perf_counter()
+print(json.dumps({'import': imported - start, 'create_app': created - imported, 'first_request': served - created,
+                  'status': response.status_code, 'modules': sorted(sys.modules)}))
+"""
+    # only the ingest worker and quiz generation need these
+    WORKER_ONLY_MODULES = ('newspaper', 'feedparser', 'dateutil', 'openai', 'apscheduler', 'flask_apscheduler',
+                           'PIL', 'requests')
+
+    # Tests cold start of a web process: import app, create_app() and the first page served
+    def test_cold_start(self):
+        env = dict(os.environ, SQLALCHEMY_DATABASE_URI='sqlite:///:memory:')
+        runs = []
+        for _ in range(3):
+            output = subprocess.run([sys.executable, '-c', self.STARTUP_SCRIPT], env=env, check=True,
+                                    capture_output=True, text=True).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+
+        self.assertEqual(runs[0]['status'], 200)
+        loaded = [name for name in self.WORKER_ONLY_MODULES if name in runs[0]['modules']]
+        self.assertEqual(loaded, [])
+        best = {phase: min(run[phase] for run in runs) for phase in ('import', 'create_app', 'first_request')}
+        print('Cold start (best of 3): ' + ', '.join(f'{phase} {seconds * 1000:.0f} ms' for phase, seconds in best.items()))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
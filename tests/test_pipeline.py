@@ -0,0 +1,76 @@
+import unittest
+from app.pipeline import Pipeline
+import time
+
+class PipelineTestCase(unittest.TestCase):
+    # Tests that serial stages can drop items and fan one item out to several
+    def test_serial_drop_and_fan_out(self):
+        pipeline = Pipeline()
+        evens = pipeline.serial('evens', range(6), lambda n: [n] if n % 2 == 0 else [])
+        pairs = pipeline.serial('pairs', evens, lambda n: [n, n + 1])
+        self.assertEqual(list(pairs), [0, 1, 2, 3, 4, 5])
+
+        report = pipeline.report()
+        self.assertEqual(list(report), ['evens', 'pairs'])
+        self.assertEqual((report['evens']['in'], report['evens']['out']), (6, 3))
+        self.assertEqual((report['pairs']['in'], report['pairs']['out']), (3, 6))
+
+    # Tests that errors go to on_error and are counted, and propagate without it
+    def test_errors(self):
+        def parse(value):
+            return [int(value)]
+
+        pipeline = Pipeline()
+        parsed = pipeline.serial('parse', ['1', 'x', '3'], parse, on_error=lambda value, e: [0])
+        self.assertEqual(list(parsed), [1, 0, 3])
+        self.assertEqual(pipeline.report()['parse']['errors'], 1)
+
+        with self.assertRaises(ValueError):
+            list(Pipeline().serial('parse', ['x'], parse))
+        with self.assertRaises(ValueError):
+            list(Pipeline().concurrent('parse', ['x'], int, workers=2))
+
+    # Tests that a concurrent stage never pulls more than queue_size items ahead of its consumer
+    def test_concurrent_backpressure(self):
+        pulled = []
+
+        def source():
+            for n in range(20):
+                pulled.append(n)
+                yield n
+
+        pipeline = Pipeline()
+        doubled = pipeline.concurrent('double', source(), lambda n: n * 2, workers=2, queue_size=3)
+        consumed = []
+        for value in doubled:
+            consumed.append(value)
+            # the item just consumed plus at most a full queue behind it
+            self.assertLessEqual(len(pulled) - len(consumed), 3)
+            time.sleep(0.01)
+
+        self.assertEqual(sorted(consumed), [n * 2 for n in range(20)])
+        metrics = pipeline.report()['double']
+        self.assertEqual((metrics['in'], metrics['out'], metrics['errors']), (20, 20, 0))
+        self.assertLessEqual(metrics['max_queued'], 3)
+
+    # Tests that a concurrent stage runs items in parallel and gives up on slow ones
+    def test_concurrent_timeout(self):
+        def work(seconds):
+            time.sleep(seconds)
+            return seconds
+
+        pipeline = Pipeline()
+        start = time.perf_counter()
+        results = list(pipeline.concurrent('sleep', [0.2] * 4 + [3], work, workers=5, timeout=0.5,
+                                           on_error=lambda seconds, e: [type(e).__name__]))
+        duration = time.perf_counter() - start
+
+        self.assertEqual(sorted(map(str, results)), ['0.2'] * 4 + ['TimeoutError'])
+        self.assertLess(duration, 1.5)
+        metrics = pipeline.report()['sleep']
+        self.assertEqual((metrics['out'], metrics['errors']), (5, 1))
+        self.assertGreater(metrics['throughput'], 0)
+        self.assertGreaterEqual(metrics['max_latency'], 0.5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from app import create_app, db
+from app.models import Article, ArticleFingerprint, Quiz, Comment, UserQuiz, QuizJob, FeedState
+from app.near_duplicates import band_probes
+from app.pagination import decode_cursor
+from sqlalchemy import or_, text, tuple_
+import re
+
+app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+
+# A plan step like "SCAN article" (no index) means the lookup reads the whole table
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+class QueryPlanTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    # Returns the EXPLAIN QUERY PLAN detail lines for an ORM query
+    @staticmethod
+    def plan(query):
+        sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+        return [row[3] for row in db.session.execute(text('EXPLAIN QUERY PLAN ' + sql))]
+
+    def assertIndexed(self, query):
+        details = self.plan(query)
+        scans = [detail for detail in details if FULL_SCAN.match(detail)]
+        self.assertEqual(scans, [], f'full table scan in plan: {details}')
+
+    # Tests that every hot lookup is served by an index
+    def test_hot_lookups_use_indexes(self):
+        with app.app_context():
+            if db.engine.dialect.name != 'sqlite':
+                self.skipTest('query plans are checked on SQLite')
+
+            cursor = decode_cursor('20241209100000000000-42')
+            bands = [ArticleFingerprint.band0, ArticleFingerprint.band1, ArticleFingerprint.band2, ArticleFingerprint.band3]
+            hot_queries = {
+                'quiz by article': Quiz.query.filter_by(article_id=1),
+                'user quiz entry': UserQuiz.query.filter_by(user_id=1, quiz_id=1),
+                'article comments': Comment.query.filter_by(article_id=1),
+                'user comments': Comment.query.filter_by(user_id=1),
+                'article listing': Article.card_query().order_by(Article.date_posted.desc(), Article.id.desc()).limit(12),
+                'article keyset page': Article.card_query()
+                    .filter(tuple_(Article.date_posted, Article.id) < tuple_(*cursor))
+                    .order_by(Article.date_posted.desc(), Article.id.desc()).limit(12),
+                'feed dedup': db.session.query(Article.title, Article.id).filter(Article.title.in_(['a', 'b'])),
+                'quiz job by article': QuizJob.query.filter_by(article_id=1),
+                'feed state': FeedState.query.filter_by(feed_url='https://example.com/rss.xml'),
+                'near-duplicate bands': db.session.query(ArticleFingerprint.article_id, ArticleFingerprint.simhash)
+                    .filter(or_(*[band.in_(values) for band, values in zip(bands, band_probes(0x1234, 6))])),
+            }
+            for name, query in hot_queries.items():
+                with self.subTest(name):
+                    self.assertIndexed(query)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+import unittest
+from unittest.mock import patch
+from app import create_app, db, bcrypt
+from app import quiz_generator, quiz_cache
+from app.models import User, Article, Quiz, QuizCache
+from datetime import datetime
+import json
+import threading
+import time
+
+app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+
+QUESTIONS = json.dumps([
+    {'question': f'Question {i}', 'options': ['A', 'B', 'C', 'D'], 'correct_answer': 'B'}
+    for i in range(5)
+])
+
+class QuizGeneratorTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        with app.app_context():
+            db.create_all()
+            password_hash = bcrypt.generate_password_hash('password').decode('utf-8')
+            db.session.add(User(username='reader', email='reader@example.com', password=password_hash))
+            article = Article(title='Popular Article', content='Content here.',
+                              source='https://example.com', date_posted=datetime.utcnow())
+            db.session.add(article)
+            db.session.commit()
+            self.article_id = article.id
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    # Tests that N concurrent requests for the same article share a single generation
+    def test_concurrent_requests_generate_once(self):
+        calls = []
+
+        # slow stand-in for the LLM round trip so every request overlaps with it
+        def slow_generate_quiz(article_id, retries=3, delay=5, use_cache=True):
+            calls.append(article_id)
+            time.sleep(0.5)
+            return Quiz(article_id=article_id, questions=QUESTIONS)
+
+        clients = []
+        for _ in range(8):
+            client = app.test_client()
+            client.post('/login', data=dict(email='reader@example.com', password='password'))
+            clients.append(client)
+
+        barrier = threading.Barrier(len(clients))
+        responses = []
+
+        def fire(client):
+            barrier.wait()
+            responses.append(client.post(f'/generate_quiz/{self.article_id}'))
+
+        with patch.object(quiz_generator, 'generate_quiz', side_effect=slow_generate_quiz):
+            threads = [threading.Thread(target=fire, args=(client,)) for client in clients]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([response.status_code for response in responses], [200] * len(clients))
+        quiz_ids = {response.get_json()['quiz_id'] for response in responses}
+        self.assertEqual(len(quiz_ids), 1)
+        with app.app_context():
+            self.assertEqual(Quiz.query.filter_by(article_id=self.article_id).count(), 1)
+
+    # Tests that readers can't regenerate an existing quiz; only the CLI does
+    def test_route_keeps_existing_quiz(self):
+        with app.app_context():
+            db.session.add(Quiz(article_id=self.article_id, questions=QUESTIONS))
+            db.session.commit()
+        client = app.test_client()
+        client.post('/login', data=dict(email='reader@example.com', password='password'))
+        new_questions = QUESTIONS.replace('Question', 'New question')
+
+        with patch.object(quiz_generator, 'generate_quiz',
+                          side_effect=lambda article_id, **kwargs: Quiz(article_id=article_id, questions=new_questions)) as generate:
+            response = client.post(f'/generate_quiz/{self.article_id}')
+            self.assertEqual(response.get_json()['questions'], QUESTIONS)
+            self.assertEqual(generate.call_count, 0)
+
+            result = app.test_cli_runner().invoke(args=['regenerate-quiz', str(self.article_id)])
+            self.assertIn('Regenerated quiz', result.output)
+            self.assertEqual(generate.call_count, 1)
+        with app.app_context():
+            self.assertEqual(Quiz.query.one().questions, new_questions)
+
+    # Tests that identical article bodies are quizzed once and served from the cache afterwards
+    def test_generate_quiz_uses_content_cache(self):
+        response = {'choices': [{'message': {'content': QUESTIONS}}]}
+        with app.app_context():
+            # same body as the setUp article apart from whitespace, under a new title
+            duplicate = Article(title='Syndicated copy', content='  Content \n here. ',
+                                source='https://example.com/copy', date_posted=datetime.utcnow())
+            db.session.add(duplicate)
+            db.session.commit()
+
+            before = quiz_cache.quiz_cache_stats()
+            with patch.object(quiz_generator.openai.ChatCompletion, 'create', return_value=response) as create:
+                first = quiz_generator.ensure_quiz(self.article_id)
+                second = quiz_generator.ensure_quiz(duplicate.id)
+                # regeneration still uses the cache; only forcing it asks the model again
+                quiz_generator.ensure_quiz(duplicate.id, regenerate=True)
+                self.assertEqual(create.call_count, 1)
+                quiz_generator.ensure_quiz(duplicate.id, regenerate=True, force=True)
+            after = quiz_cache.quiz_cache_stats()
+
+            self.assertEqual(create.call_count, 2)
+            self.assertEqual(first.questions, second.questions)
+            self.assertEqual(after['hits'] - before['hits'], 2)
+            self.assertEqual(after['misses'] - before['misses'], 1)
+            self.assertEqual(QuizCache.query.count(), 1)
+            self.assertEqual(QuizCache.query.first().hits, 2)
+
+    # Tests that asking for an article's quiz again doesn't call the model again
+    def test_second_request_makes_no_llm_call(self):
+        response = {'choices': [{'message': {'content': QUESTIONS}}]}
+        client = app.test_client()
+        client.post('/login', data=dict(email='reader@example.com', password='password'))
+        with patch.object(quiz_generator.openai.ChatCompletion, 'create', return_value=response) as create:
+            first = client.post(f'/generate_quiz/{self.article_id}').get_json()
+            second = client.post(f'/generate_quiz/{self.article_id}').get_json()
+        self.assertEqual(create.call_count, 1)
+        self.assertEqual(first['quiz_id'], second['quiz_id'])
+
+    # Tests that the cache evicts the least recently used entries beyond its size limit
+    def test_prune_quiz_cache(self):
+        app.config['QUIZ_CACHE_MAX_ENTRIES'] = 2
+        try:
+            with app.app_context():
+                for i in range(4):
+                    quiz_cache.store_questions(f'key{i}', 'test-model', QUESTIONS)
+                    db.session.commit()
+                    time.sleep(0.01)
+                self.assertEqual(quiz_cache.prune_quiz_cache(), 2)
+                self.assertEqual(sorted(entry.key for entry in QuizCache.query.all()), ['key2', 'key3'])
+        finally:
+            app.config['QUIZ_CACHE_MAX_ENTRIES'] = 5000
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+from unittest.mock import patch
+from app import create_app, db, bcrypt
+from app import quiz_queue, quiz_generator
+from app.models import User, Article, Quiz, QuizJob
+from datetime import datetime, timedelta
+import json
+
+app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+
+QUESTIONS = json.dumps([
+    {'question': f'Question {i}', 'options': ['A', 'B', 'C', 'D'], 'correct_answer': 'B'}
+    for i in range(5)
+])
+
+class QuizQueueTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.app = app.test_client()
+        with app.app_context():
+            db.create_all()
+            article = Article(title='Queued Article', content='Content here.',
+                              source='https://example.com', date_posted=datetime.utcnow())
+            db.session.add(article)
+            db.session.commit()
+            self.article_id = article.id
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    # Stand-in for generate_quiz that returns an unsaved Quiz like the real one
+    @staticmethod
+    def fake_generate_quiz(article_id, retries=3, delay=5, use_cache=True):
+        return Quiz(article_id=article_id, questions=QUESTIONS)
+
+    # Tests that queued jobs are processed into quizzes and not queued twice
+    def test_enqueue_and_process(self):
+        with app.app_context():
+            self.assertEqual(quiz_queue.enqueue_quiz_jobs([self.article_id]), 1)
+            db.session.commit()
+            self.assertEqual(quiz_queue.enqueue_quiz_jobs([self.article_id]), 0)
+
+            with patch.object(quiz_generator, 'generate_quiz', side_effect=self.fake_generate_quiz):
+                result = quiz_queue.process_quiz_jobs()
+
+            self.assertEqual(result, {'done': 1, 'failed': 0})
+            self.assertIsNotNone(Quiz.query.filter_by(article_id=self.article_id).first())
+            self.assertEqual(QuizJob.query.filter_by(article_id=self.article_id).first().status, 'done')
+
+    # Tests that a failed attempt is rescheduled with backoff and gives up after max attempts
+    def test_retry_with_backoff(self):
+        app.config['QUIZ_QUEUE_MAX_ATTEMPTS'] = 2
+        try:
+            with app.app_context():
+                quiz_queue.enqueue_quiz_jobs([self.article_id])
+                db.session.commit()
+
+                with patch.object(quiz_generator, 'generate_quiz', return_value=None):
+                    self.assertEqual(quiz_queue.process_quiz_jobs(), {'done': 0, 'failed': 1})
+                    job = QuizJob.query.filter_by(article_id=self.article_id).first()
+                    self.assertEqual((job.status, job.attempts), ('pending', 1))
+                    self.assertGreater(job.next_attempt_at, datetime.utcnow() + timedelta(seconds=20))
+
+                    # not due yet, so nothing is claimed
+                    self.assertEqual(quiz_queue.process_quiz_jobs(), {'done': 0, 'failed': 0})
+
+                    job.next_attempt_at = datetime.utcnow()
+                    db.session.commit()
+                    quiz_queue.process_quiz_jobs()
+                    db.session.refresh(job)
+                    self.assertEqual((job.status, job.attempts), ('failed', 2))
+        finally:
+            app.config['QUIZ_QUEUE_MAX_ATTEMPTS'] = 5
+
+    # Tests that the article page renders a pending state instead of generating inline
+    def test_article_page_does_not_block_on_generation(self):
+        with app.app_context():
+            password_hash = bcrypt.generate_password_hash('password').decode('utf-8')
+            db.session.add(User(username='reader', email='reader@example.com', password=password_hash))
+            db.session.commit()
+
+        self.app.post('/login', data=dict(email='reader@example.com', password='password'))
+        with patch.object(quiz_generator, 'generate_quiz') as generate:
+            response = self.app.get(f'/article/{self.article_id}')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'The quiz for this article is being generated', response.data)
+        generate.assert_not_called()
+        with app.app_context():
+            self.assertEqual(QuizJob.query.filter_by(article_id=self.article_id).first().status, 'pending')
+
+if __name__ == '__main__':
+    unittest.main()
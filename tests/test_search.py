@@ -0,0 +1,92 @@
+import unittest
+from app import create_app, db
+from app import search
+from app.models import Article
+from app.news_fetcher import insert_articles
+from app.search import search_articles, index_articles
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+
+class SearchTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        with app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def add_article(self, title, content, minutes=0):
+        article = Article(title=title, content=content, source='https://example.com',
+                          date_posted=datetime(2024, 1, 1) + timedelta(minutes=minutes))
+        db.session.add(article)
+        db.session.commit()
+        return article
+
+    # Tests that ORM writes keep the index in step and title matches rank first
+    def test_orm_writes_are_indexed(self):
+        with app.app_context():
+            body = self.add_article('Markets rally', 'Storm clouds gathered over the harbour.')
+            title = self.add_article('Storm warning issued', 'Residents were told to stay indoors.', minutes=1)
+            self.assertEqual([r.id for r in search_articles('storm').items], [title.id, body.id])
+
+            body.content = 'Nothing to see here.'
+            db.session.commit()
+            self.assertEqual([r.id for r in search_articles('storm').items], [title.id])
+
+            db.session.delete(title)
+            db.session.commit()
+            self.assertEqual(search_articles('storm').items, [])
+
+    # Tests that articles bulk inserted by the fetcher become searchable once indexed
+    def test_fetcher_inserts_are_indexed(self):
+        with app.app_context():
+            insert_articles([{'title': 'Harvest report', 'content': 'Wheat yields rose sharply.',
+                              'source': 'https://example.com/wheat', 'date_posted': datetime(2024, 1, 1)}])
+            self.assertEqual(search_articles('wheat').items, [])
+            index_articles([Article.query.one().id])
+            db.session.commit()
+            result = search_articles('WHEAT yield').items[0]
+            self.assertEqual(result.title, 'Harvest report')
+            self.assertIn('<mark>Wheat</mark>', result.snippet)
+
+    # Tests that snippets are escaped and query syntax can't break the MATCH expression
+    def test_snippets_escaped(self):
+        with app.app_context():
+            self.add_article('Script kiddies', 'The <script>alert(1)</script> payload was blocked.')
+        response = self.client.get('/search', query_string={'q': 'payload" * ^('})
+        page = response.get_data(as_text=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('&lt;script&gt;', page)
+        self.assertIn('<mark>payload</mark>', page)
+        self.assertNotIn('<script>alert', page)
+
+    # Tests that results are paginated
+    def test_pagination(self):
+        with app.app_context():
+            for i in range(25):
+                self.add_article(f'Election update {i}', 'Votes are being counted.', minutes=i)
+            pages = [search_articles('election', page=page, per_page=10) for page in (1, 2, 3)]
+        self.assertEqual([len(page.items) for page in pages], [10, 10, 5])
+        self.assertEqual([page.has_next for page in pages], [True, True, False])
+        self.assertEqual(len({r.id for page in pages for r in page.items}), 25)
+        response = self.client.get('/search?q=election&page=2')
+        self.assertIn(b'page=3', response.data)
+
+    # Tests the LIKE fallback used on databases without FTS5
+    def test_like_fallback(self):
+        with app.app_context():
+            self.add_article('Older flood story', 'The river flooded the town centre.')
+            self.add_article('Newer flood story', 'Flood defences held overnight.', minutes=1)
+            with patch.object(search, 'fts_enabled', return_value=False):
+                results = search_articles('flood').items
+        self.assertEqual([r.title for r in results], ['Newer flood story', 'Older flood story'])
+        self.assertIn('<mark>flooded</mark>', results[1].snippet)
+
+if __name__ == '__main__':
+    unittest.main()
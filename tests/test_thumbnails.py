@@ -0,0 +1,101 @@
+import unittest
+from app import create_app, db
+from app.models import Article
+from app.thumbnails import fetch_thumbnail, make_thumbnails, thumbnail_path
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from PIL import Image
+import os
+import random
+import shutil
+import tempfile
+import threading
+
+app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+
+# A noisy 2000x1200 JPEG, about the size of a full-width news photo
+def sample_image():
+    rng = random.Random(1)
+    image = Image.effect_noise((2000, 1200), 40).convert('RGB')
+    image.paste((rng.randrange(256), 90, 160), (0, 0, 1000, 600))
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+class ImageHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(len(self.server.image)))
+        self.end_headers()
+        self.wfile.write(self.server.image)
+
+    def log_message(self, format, *args):
+        pass
+
+class ThumbnailTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.directory = tempfile.mkdtemp()
+        app.config['THUMBNAIL_DIR'] = self.directory
+        self.client = app.test_client()
+        with app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        app.config['THUMBNAIL_DIR'] = None
+        shutil.rmtree(self.directory)
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    # Tests that a downloaded top image becomes small WebP and JPEG thumbnails, stored once per content
+    def test_fetch_thumbnail(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), ImageHandler)
+        server.image = sample_image()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            url = f'http://127.0.0.1:{server.server_port}/photo.jpg'
+            key = fetch_thumbnail(url, self.directory, width=640)
+            self.assertEqual(fetch_thumbnail(url + '?copy', self.directory, width=640), key)
+            self.assertIsNone(fetch_thumbnail(url, self.directory, max_bytes=1024))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        sizes = {}
+        for fmt in ('webp', 'jpg'):
+            path = thumbnail_path(self.directory, key, fmt)
+            with Image.open(path) as image:
+                self.assertEqual(image.size, (640, 384))
+            sizes[fmt] = os.path.getsize(path)
+        print(f'Top image {len(server.image) / 1024:.0f} KiB -> thumbnails: ' +
+              ', '.join(f'{fmt} {size / 1024:.0f} KiB' for fmt, size in sizes.items()))
+        self.assertLess(sizes['webp'], len(server.image) / 5)
+        self.assertEqual(sorted(os.listdir(os.path.join(self.directory, key[:2]))), [f'{key}.jpg', f'{key}.webp'])
+
+    # Tests that thumbnails are served with immutable caching and cards fall back to the placeholder
+    def test_serve_and_render(self):
+        key = make_thumbnails(sample_image(), self.directory)
+        response = self.client.get(f'/thumbnails/{key}.webp')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'image/webp')
+        self.assertEqual(response.headers['Cache-Control'], 'public, max-age=31536000, immutable')
+        response.close()
+        self.assertEqual(self.client.get(f'/thumbnails/{key}.png').status_code, 404)
+        self.assertEqual(self.client.get('/thumbnails/..%2Fsecret.webp').status_code, 404)
+
+        with app.app_context():
+            db.session.add(Article(title='With thumbnail', content='Body.', source='https://example.com/1',
+                                   date_posted=datetime(2024, 1, 2), thumbnail_key=key))
+            db.session.add(Article(title='Without image', content='Body.', source='https://example.com/2',
+                                   date_posted=datetime(2024, 1, 1)))
+            db.session.commit()
+        page = self.client.get('/articles').get_data(as_text=True)
+        self.assertIn(f'/thumbnails/{key}.webp', page)
+        self.assertRegex(page, r'/static/images/placeholder\.[0-9a-f]{12}\.jpg')
+        self.assertEqual(self.client.get('/static/images/placeholder.jpg').status_code, 200)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,7 @@
 import unittest
-from app import app, bcrypt
+from app import create_app, bcrypt
+
+app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
 
 class UtilsTestCase(unittest.TestCase):
     def test_password_hashing_and_verification(self):
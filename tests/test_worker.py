@@ -0,0 +1,103 @@
+import unittest
+from unittest.mock import patch
+from app import create_app, db
+from app import worker, news_fetcher, quiz_queue
+from app.models import WorkerLease
+from datetime import datetime, timedelta
+import threading
+
+app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+
+class WorkerTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    # Tests that importing the app does not start a scheduler in the web process
+    def test_web_process_has_no_scheduler(self):
+        self.assertFalse(getattr(app, 'apscheduler', None) and app.apscheduler.running)
+        self.assertFalse(any('APScheduler' in thread.name for thread in threading.enumerate()))
+
+    # Tests that only one owner holds the lease until it is released or expires
+    def test_lease_is_exclusive_until_released_or_expired(self):
+        with app.app_context():
+            self.assertTrue(worker.acquire_lease('ingest', 'a', 60))
+            self.assertFalse(worker.acquire_lease('ingest', 'b', 60))
+            # the holder renews without losing it
+            acquired_at = db.session.get(WorkerLease, 'ingest').acquired_at
+            self.assertTrue(worker.acquire_lease('ingest', 'a', 60))
+            db.session.expire_all()
+            self.assertEqual(db.session.get(WorkerLease, 'ingest').acquired_at, acquired_at)
+
+            worker.release_lease('ingest', 'a')
+            self.assertTrue(worker.acquire_lease('ingest', 'b', 60))
+
+            # a holder that stopped renewing is taken over once the lease runs out
+            lease = db.session.get(WorkerLease, 'ingest')
+            lease.expires_at = datetime.utcnow() - timedelta(seconds=1)
+            db.session.commit()
+            self.assertTrue(worker.acquire_lease('ingest', 'a', 60))
+            db.session.expire_all()
+            self.assertEqual(db.session.get(WorkerLease, 'ingest').owner, 'a')
+
+    # Tests that concurrent workers never both win the lease
+    def test_concurrent_acquire_has_one_winner(self):
+        barrier = threading.Barrier(4)
+        winners = []
+
+        def contend(owner):
+            with app.app_context():
+                barrier.wait()
+                if worker.acquire_lease('ingest', owner, 60):
+                    winners.append(owner)
+                db.session.remove()
+
+        threads = [threading.Thread(target=contend, args=(f'worker-{i}',)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(winners), 1)
+
+    # Tests that the fetch is skipped while another worker holds the lease
+    def test_run_ingest_only_on_leader(self):
+        with app.app_context():
+            worker.acquire_lease(worker.INGEST_LEASE, 'other', 60)
+        with patch.object(news_fetcher, 'fetch_articles', return_value={'added': 1}) as fetch, \
+             patch.object(quiz_queue, 'process_quiz_jobs') as process, app.app_context():
+            self.assertFalse(worker.run_ingest('me'))
+            fetch.assert_not_called()
+            worker.release_lease(worker.INGEST_LEASE, 'other')
+            self.assertTrue(worker.run_ingest('me'))
+            fetch.assert_called_once()
+            process.assert_called_once()
+
+    # Tests the one-shot command fetches once and hands the lease back
+    def test_ingest_worker_once(self):
+        runner = app.test_cli_runner()
+        with patch.object(news_fetcher, 'fetch_articles', return_value={'added': 0}) as fetch, \
+             patch.object(quiz_queue, 'process_quiz_jobs'):
+            result = runner.invoke(args=['ingest-worker', '--once'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('Fetch finished', result.output)
+        fetch.assert_called_once()
+        with app.app_context():
+            self.assertEqual(WorkerLease.query.count(), 0)
+
+    # Tests that every worker job is limited to one run at a time with missed runs coalesced
+    def test_scheduler_jobs_do_not_overlap(self):
+        scheduler = worker.build_scheduler(app, 'me')
+        jobs = {job.id: job for job in scheduler.get_jobs()}
+        self.assertEqual(set(jobs), {'fetch_articles_job', 'ingest_lease_job', 'process_quiz_jobs_job'})
+        for job in jobs.values():
+            self.assertEqual(job.max_instances, 1)
+            self.assertTrue(job.coalesce)
+
+if __name__ == '__main__':
+    unittest.main()